@@ -1,6 +1,7 @@
 # SPDX-FileCopyrightText: 2022 geisserml <geisserml@gmail.com>
 # SPDX-License-Identifier: Apache-2.0 OR BSD-3-Clause
 
+import sys
 import os.path
 from pypdfium2 import _namespace as pdfium
 from pypdfium2._cli._parsers import pagetext_type
@@ -8,6 +9,7 @@ from pypdfium2._cli._parsers import pagetext_type
 
 STRATEGY_RANGE = "range"
 STRATEGY_BOUNDED = "bounded"
+FORMAT_TEXT = "text"
 
 
 def attach_parser(subparsers):
@@ -36,27 +38,52 @@ def attach_parser(subparsers):
         default = STRATEGY_RANGE,
         help = "PDFium text extraction strategy.",
     )
+    parser.add_argument(
+        "--format",
+        type = str,
+        choices = (FORMAT_TEXT, *pdfium.TextExportFormats),
+        default = FORMAT_TEXT,
+        help = "Output format: plain text, or structured text with boxes and fonts as JSON lines (one page per line), hOCR or ALTO XML. Structured formats require NumPy.",
+    )
+    parser.add_argument(
+        "--chars",
+        action = "store_true",
+        help = "Include the individual characters of each word in structured output.",
+    )
+    parser.add_argument(
+        "--processes",
+        default = 1,
+        type = int,
+        help = "The number of processes to use for text extraction (defaults to 1).",
+    )
 
 
 def main(args):
     
     doc = pdfium.PdfDocument(args.input, password=args.password)
-    if args.pages is None:
-        args.pages = [i for i in range(len(doc))]
+    
+    if args.format != FORMAT_TEXT:
+        # pages are written as soon as they are ready, so memory usage does not grow with the document
+        sys.stdout.write( pdfium.get_export_header(args.format, title=os.path.basename(args.input)) )
+        exporter = doc.export_text(
+            format = args.format,
+            page_indices = args.pages,
+            chars = args.chars,
+            n_processes = args.processes,
+        )
+        for index, fragment in exporter:
+            sys.stdout.write(fragment)
+        sys.stdout.write( pdfium.get_export_footer(args.format) )
+        return
+    
+    # TODO let caller pass in possible range/boundary parameters
+    extractor = doc.extract_text(
+        page_indices = args.pages,
+        strategy = args.strategy,
+        n_processes = args.processes,
+    )
     
     sep = ""
-    for index in args.pages:
-        
-        page = doc.get_page(index)
-        textpage = page.get_textpage()
-        
-        # TODO let caller pass in possible range/boundary parameters
-        if args.strategy == STRATEGY_RANGE:
-            text = textpage.get_text_range()
-        elif args.strategy == STRATEGY_BOUNDED:
-            text = textpage.get_text_bounded()
-        else:
-            assert False
-        
+    for index, text in extractor:
         print(sep + "# Page %s\n" % (index+1) + text)
         sep = "\n"
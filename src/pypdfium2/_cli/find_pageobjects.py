@@ -40,6 +40,13 @@ def attach_parser(subparsers):
         default = 2,
         help = "Maximum recursion depth to consider when descending into Form XObjects.",
     )
+    parser.add_argument(
+        "--bbox",
+        nargs = 4,
+        type = float,
+        metavar = ("L", "B", "R", "T"),
+        help = "Only consider objects intersecting this rectangle (left, bottom, right, top in PDF canvas units).",
+    )
 
 
 def main(args):
@@ -51,6 +58,10 @@ def main(args):
     
     for index in args.pages:
         page = doc.get_page(index)
-        for obj in page.get_objects(max_depth=args.max_depth):
-            if obj.type in args.types:
-                print("    "*obj.level + pdfium.ObjectTypeToStr[obj.type], obj.get_pos())
+        objects = page.get_objects(
+            max_depth = args.max_depth,
+            types = args.types,
+            bbox = args.bbox,
+        )
+        for obj in objects:
+            print("    "*obj.level + pdfium.ObjectTypeToStr[obj.type], obj.get_pos())
@@ -0,0 +1,119 @@
+# SPDX-FileCopyrightText: 2022 geisserml <geisserml@gmail.com>
+# SPDX-License-Identifier: Apache-2.0 OR BSD-3-Clause
+
+import os.path
+from pypdfium2 import _namespace as pdfium
+from pypdfium2._cli.tile import Units, units_to_pt
+
+
+Layouts = ("grid", "step-repeat", "booklet")
+
+
+def attach_parser(subparsers):
+    parser = subparsers.add_parser(
+        "impose",
+        help = "Perform page imposition (N-up grids, step and repeat, booklets)",
+    )
+    parser.add_argument(
+        "input",
+        help = "PDF file to impose",
+    )
+    parser.add_argument(
+        "--password",
+        help = "Password to unlock the PDF, if encrypted"
+    )
+    parser.add_argument(
+        "--output", "-o",
+        required = True,
+        type = os.path.abspath,
+        help = "Target path for the new document",
+    )
+    parser.add_argument(
+        "--layout", "-l",
+        default = "grid",
+        choices = Layouts,
+        help = "Kind of imposition",
+    )
+    parser.add_argument(
+        "--width",
+        type = float,
+        required = True,
+        help = "Sheet width",
+    )
+    parser.add_argument(
+        "--height",
+        type = float,
+        required = True,
+        help = "Sheet height",
+    )
+    parser.add_argument(
+        "--unit", "-u",
+        default = Units.MM,
+        type = lambda string: Units[string.upper()],
+        help = "Unit for sizes and distances (pt, mm, cm, in)",
+    )
+    parser.add_argument(
+        "--rows", "-r",
+        type = int,
+        default = 1,
+        help = "Number of rows per sheet (grid and step-repeat)",
+    )
+    parser.add_argument(
+        "--cols", "-c",
+        type = int,
+        default = 1,
+        help = "Number of columns per sheet (grid and step-repeat)",
+    )
+    parser.add_argument(
+        "--rotation",
+        type = int,
+        nargs = "+",
+        default = [0],
+        help = "Clockwise rotation of the pages (grid and step-repeat). Either one value for all cells, or one value per cell in reading order.",
+    )
+    parser.add_argument(
+        "--signature-size",
+        type = int,
+        help = "Number of pages per signature (booklet). By default, the whole document is one signature.",
+    )
+    parser.add_argument(
+        "--margin",
+        type = float,
+        default = 0,
+        help = "Distance between pages and sheet edges",
+    )
+    parser.add_argument(
+        "--gutter",
+        type = float,
+        default = 0,
+        help = "Distance between adjacent pages",
+    )
+    parser.add_argument(
+        "--bleed",
+        type = float,
+        default = 0,
+        help = "Bleed to show around the trim box of each page",
+    )
+
+
+def main(args):
+    
+    sheet_size = (units_to_pt(args.width, args.unit), units_to_pt(args.height, args.unit))
+    margin = units_to_pt(args.margin, args.unit)
+    gutter = units_to_pt(args.gutter, args.unit)
+    bleed = units_to_pt(args.bleed, args.unit)
+    rotations = args.rotation[0] if len(args.rotation) == 1 else args.rotation
+    
+    src_pdf = pdfium.PdfDocument(args.input, password=args.password)
+    n_pages = len(src_pdf)
+    
+    if args.layout == "grid":
+        sheets = pdfium.grid_layout(n_pages, sheet_size, args.rows, args.cols, margin=margin, gutter=gutter, rotations=rotations, bleed=bleed)
+    elif args.layout == "step-repeat":
+        sheets = pdfium.step_repeat_layout(n_pages, sheet_size, args.rows, args.cols, margin=margin, gutter=gutter, rotations=rotations, bleed=bleed)
+    else:
+        sheets = pdfium.booklet_layout(n_pages, sheet_size, signature_size=args.signature_size, margin=margin, gutter=gutter, bleed=bleed)
+    
+    dest_pdf = pdfium.impose(src_pdf, sheets)
+    with open(args.output, "wb") as buffer:
+        dest_pdf.save(buffer)
@@ -8,12 +8,12 @@ from pypdfium2 import _namespace as pdfium
 def attach_parser(subparsers):
     parser = subparsers.add_parser(
         "jpegtopdf",
-        help = "Convert JPEG images to PDF",
+        help = "Convert images to PDF (JPEGs are embedded without re-encoding)",
     )
     parser.add_argument(
         "images",
         nargs = "+",
-        help = "Input JPEG images",
+        help = "Input images (JPEG, or any other format supported by Pillow)",
         type = os.path.abspath,
     )
     parser.add_argument(
@@ -26,32 +26,45 @@ def attach_parser(subparsers):
         action = "store_true",
         help = "Whether to use FPDFImageObj_LoadJpegFileInline() rather than FPDFImageObj_LoadJpegFile()."
     )
+    parser.add_argument(
+        "--dpi",
+        type = float,
+        help = "Resolution to use for all images (defaults to the resolution in each image's header).",
+    )
+    parser.add_argument(
+        "--default-dpi",
+        type = float,
+        default = 72,
+        help = "Resolution to use for images that do not specify one.",
+    )
+    parser.add_argument(
+        "--max-open-files",
+        type = int,
+        default = 32,
+        help = "Maximum number of input JPEG files to keep open at a time.",
+    )
+    parser.add_argument(
+        "--n-threads",
+        type = int,
+        help = "Number of threads to prepare images with (defaults to the number of CPUs).",
+    )
 
 
 def main(args):
     
-    # Very rudimentary JPEG to PDF conversion, mostly for testing
-    # The implementation could certainly be more sophisticated (e. g. configurable DPI, default DPI based on image metadata via Pillow, margins, crop, positioning, ...)
-    
-    pdf = pdfium.PdfDocument.new()
-    
-    for file in args.images:
-        
-        # Simple check if the input files are actually JPEGs
-        # A better implementation could use mimetypes or python-magic instead
-        assert any(file.lower().endswith(ext) for ext in (".jpg", ".jpeg"))
-        
-        image = pdfium.PdfImageObject.new(pdf)
-        
-        buffer = open(file, "rb")
-        width, height = image.load_jpeg(buffer, inline=args.inline, autoclose=True)
-        
-        page = pdf.new_page(width, height)
-        page.insert_object(image)
-        page.generate_content()
-    
     if os.path.exists(args.output):
         raise FileExistsError("Refusing to overwrite '%s'" % args.output)
     
+    pdf = pdfium.images_to_pdf(
+        args.images,
+        dpi = args.dpi,
+        default_dpi = args.default_dpi,
+        inline = args.inline,
+        max_open_files = args.max_open_files,
+        n_threads = args.n_threads,
+    )
+    
+    # JPEG data is read from the input files while saving
     with open(args.output, "wb") as buffer:
         pdf.save(buffer)
+    pdf.close()
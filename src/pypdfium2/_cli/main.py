@@ -15,6 +15,7 @@ from pypdfium2._cli import (
     toc,
     merge,
     tile,
+    impose,
     extract_text,
     find_pageobjects,
     jpegtopdf,
@@ -31,6 +32,7 @@ Subcommands = {
     "toc": toc,
     "merge": merge,
     "tile": tile,
+    "impose": impose,
     "extract-text": extract_text,
     "find-pageobjects": find_pageobjects,
     "jpegtopdf": jpegtopdf,
@@ -8,3 +8,8 @@ from pypdfium2._helpers.document import *
 from pypdfium2._helpers.page import *
 from pypdfium2._helpers.pageobject import *
 from pypdfium2._helpers.textpage import *
+from pypdfium2._helpers.layout import *
+from pypdfium2._helpers.search import *
+from pypdfium2._helpers.textexport import *
+from pypdfium2._helpers.imagetopdf import *
+from pypdfium2._helpers.imposition import *
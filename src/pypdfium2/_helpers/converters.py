@@ -140,6 +140,8 @@ class BitmapConvAliases:
     Consider using the :meth:`.PdfPage.render_to` / :meth:`.PdfDocument.render_to` APIs instead.
     """
     
+    __slots__ = ()
+    
     def render_to(self):
         """ Method to be implemented by the inheriting class. """
         raise NotImplementedError("Inheriting class must provide render_to() method.")
@@ -1,22 +1,31 @@
 # SPDX-FileCopyrightText: 2022 geisserml <geisserml@gmail.com>
 # SPDX-License-Identifier: Apache-2.0 OR BSD-3-Clause
 
-import io
 import os
+import math
 import os.path
+import shutil
+import hashlib
 import weakref
 import ctypes
 import logging
+import tempfile
+import threading
 import functools
+import contextlib
+import collections
 from concurrent.futures import ProcessPoolExecutor
 
 import pypdfium2._pypdfium as pdfium
 from pypdfium2._helpers.misc import (
     OutlineItem,
+    DocumentInfo,
     FileAccess,
+    MetadataKeys,
     PdfiumError,
     ErrorToStr,
     ViewmodeToStr,
+    RotationToDegrees,
     get_functype,
     get_fileaccess,
     is_input_buffer,
@@ -26,12 +35,18 @@ from pypdfium2._helpers.pageobject import (
 )
 from pypdfium2._helpers.converters import BitmapConvAliases
 from pypdfium2._helpers.page import PdfPage
+from pypdfium2._helpers.textexport import TextExportFormats, export_page
 
 try:
     import uharfbuzz as harfbuzz
 except ImportError:
     harfbuzz = None
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 logger = logging.getLogger(__name__)
 
 
@@ -78,6 +93,10 @@ class PdfDocument (BitmapConvAliases):
         self._data_holder = []
         self._data_closer = []
         self._rendering_input = None
+        self._rendering_access = None
+        self._rendering_generation = None
+        self._rendering_finalizer = None
+        self._generation = 0
         
         self._password = password
         self._file_access = file_access
@@ -86,6 +105,9 @@ class PdfDocument (BitmapConvAliases):
         self._form_env = None
         self._form_config = None
         self._form_finalizer = None
+        self._arena = None
+        self._arenas = []
+        self._xobject_cache = {}
         
         if isinstance(self._orig_input, str):
             
@@ -116,7 +138,7 @@ class PdfDocument (BitmapConvAliases):
         
         self._finalizer = weakref.finalize(
             self, self._static_close,
-            self.raw, self._data_holder, self._data_closer,
+            self.raw, self._data_holder, self._data_closer, self._xobject_cache,
         )
     
     
@@ -153,7 +175,13 @@ class PdfDocument (BitmapConvAliases):
     
     
     @staticmethod
-    def _static_close(raw, data_holder, data_closer):
+    def _static_close(raw, data_holder, data_closer, xobject_cache):
+        
+        # cached XObjects have no finalizer of their own, so they are closed here, before the document
+        for xobject in xobject_cache.values():
+            pdfium.FPDF_CloseXObject(xobject.raw)
+            xobject.raw = None
+        xobject_cache.clear()
         
         # logger.debug("Closing document")
         pdfium.FPDF_CloseDocument(raw)
@@ -181,7 +209,11 @@ class PdfDocument (BitmapConvAliases):
         if self.raw is None:
             logger.warning("Duplicate close call suppressed on document %s" % self)
             return
+        # children of open arenas have no finalizer, so they must be closed before the document handle is freed
+        for arena in reversed(self._arenas):
+            self._close_arena(arena)
         self.exit_formenv()
+        self._release_rendering_input()
         self._finalizer()
         self.raw = None
         self._data_holder = []
@@ -192,6 +224,48 @@ class PdfDocument (BitmapConvAliases):
         return (self.raw is None)
     
     
+    @contextlib.contextmanager
+    def arena(self):
+        """
+        Context manager for cheap handling of many short-lived pages and text pages.
+        
+        Pages and text pages loaded from this document within the ``with``-block do not register an individual finalizer.
+        Instead, they are tracked by the arena and closed in reverse order of creation when the block is left.
+        This saves the cost of :class:`weakref.finalize` objects when iterating through large numbers of pages.
+        
+        To also avoid the instance dictionaries of pages, text pages, page objects and matrices, set the environment variable ``PYPDFIUM_LEAN_HELPERS=1`` before importing pypdfium2 (lean mode).
+        The helper classes are then declared with ``__slots__``, so arbitrary attributes cannot be set on their instances.
+        
+        Note:
+            Helper objects created within the block must not be used after it was left.
+            They may still be closed explicitly before, in which case the arena skips them.
+            If the document is closed within the block, the children of its open arenas are closed first.
+        
+        Example:
+            .. code-block:: python
+            
+                with pdf.arena():
+                    for page in pdf:
+                        text = page.get_textpage().get_text_range()
+        """
+        
+        self._arena = arena = []
+        self._arenas.append(arena)
+        try:
+            yield
+        finally:
+            self._arenas.pop()
+            self._arena = self._arenas[-1] if self._arenas else None
+            self._close_arena(arena)
+    
+    
+    @staticmethod
+    def _close_arena(arena):
+        for child in reversed(arena):
+            if child.raw is not None:
+                child.close()
+    
+    
     def init_formenv(self):
         """
         Initialise a form environment handle for this document.
@@ -239,33 +313,91 @@ class PdfDocument (BitmapConvAliases):
         return int(version.value)
     
     
+    def get_metadata_value(self, key):
+        """
+        Parameters:
+            key (str): A key of the document information dictionary (see :data:`.MetadataKeys`).
+        Returns:
+            str: The value for *key*, or an empty string if the key is not defined.
+        """
+        enc_key = key.encode("ascii")
+        n_bytes = pdfium.FPDF_GetMetaText(self.raw, enc_key, None, 0)
+        buffer = ctypes.create_string_buffer(n_bytes)
+        pdfium.FPDF_GetMetaText(self.raw, enc_key, buffer, n_bytes)
+        return buffer.raw[:n_bytes-2].decode("utf-16-le")
+    
+    
+    def get_metadata_dict(self, skip_empty=False):
+        """
+        Parameters:
+            skip_empty (bool): If :data:`True`, keys without value will be omitted.
+        Returns:
+            typing.Dict[str, str]: The document information dictionary, covering the keys listed in :data:`.MetadataKeys`.
+        """
+        metadata = {}
+        for key in MetadataKeys:
+            value = self.get_metadata_value(key)
+            if skip_empty and not value:
+                continue
+            metadata[key] = value
+        return metadata
+    
+    
+    def is_encrypted(self):
+        """
+        Returns:
+            bool: Whether the document is protected by a security handler.
+        """
+        return pdfium.FPDF_GetSecurityHandlerRevision(self.raw) != -1
+    
+    
     def save(self, buffer, version=None):
         """
         Save the document into an output buffer, at its current state.
         
+        Data blocks emitted by PDFium are gathered in a staging buffer and passed on to the target in large chunks.
+        
         Parameters:
-            buffer (typing.BinaryIO):
-                A byte buffer to capture the data.
-                It may be any object implementing the ``write()`` method.
+            buffer (typing.BinaryIO | bytearray | int):
+                The target to capture the data.
+                It may be any object implementing the ``write()`` method (e. g. a file, :class:`io.BytesIO` or :class:`mmap.mmap`),
+                a :class:`bytearray` that will be extended in place, or a raw file descriptor given as :class:`int`.
             version (int | None):
                  The PDF version to use, given as an integer (14 for 1.4, 15 for 1.5, ...).
                  If :data:`None`, PDFium will set a version automatically.
         """
         
+        writer = _writer_class(buffer)
         filewrite = pdfium.FPDF_FILEWRITE()
         filewrite.version = 1
-        filewrite.WriteBlock = get_functype(pdfium.FPDF_FILEWRITE, "WriteBlock")( _writer_class(buffer) )
+        filewrite.WriteBlock = get_functype(pdfium.FPDF_FILEWRITE, "WriteBlock")(writer)
         
         saveargs = (self.raw, filewrite, pdfium.FPDF_NO_INCREMENTAL)
         if version is None:
             success = pdfium.FPDF_SaveAsCopy(*saveargs)
         else:
             success = pdfium.FPDF_SaveWithVersion(*saveargs, version)
+        writer.flush()
         
         if not success:
             raise PdfiumError("Saving the document failed")
     
     
+    def save_to_bytes(self, version=None):
+        """
+        Save the document into memory, at its current state.
+        
+        Parameters:
+            version (int | None):
+                The PDF version to use (see :meth:`.save`).
+        Returns:
+            bytes: The serialised document.
+        """
+        buffer = bytearray()
+        self.save(buffer, version=version)
+        return bytes(buffer)
+    
+    
     def _handle_index(self, index):
         n_pages = len(self)
         if index < 0:
@@ -290,27 +422,166 @@ class PdfDocument (BitmapConvAliases):
         return (size.width, size.height)
     
     
-    def page_as_xobject(self, index, dest_pdf):
+    def _get_page_size_list(self):
+        # widths and heights of all pages, retrieved without loading pages
+        size = pdfium.FS_SIZEF()
+        page_sizes = []
+        for index in range(len(self)):
+            success = pdfium.FPDF_GetPageSizeByIndexF(self.raw, index, size)
+            if not success:
+                raise PdfiumError("Getting page size by index failed.")
+            page_sizes.append( (size.width, size.height) )
+        return page_sizes
+    
+    
+    def get_page_sizes(self, rotations=False, cropboxes=False):
+        """
+        *Requires* :mod:`numpy`
+        
+        Get the dimensions of all pages at once.
+        
+        Parameters:
+            rotations (bool):
+                If :data:`True`, include the clockwise page rotation in degrees.
+            cropboxes (bool):
+                If :data:`True`, include the CropBox (falling back to MediaBox and ANSI A, like :meth:`.PdfPage.get_cropbox`).
+        Returns:
+            numpy.ndarray:
+            A structured array with one record per page and the fields ``width`` and ``height``,
+            as well as ``rotation`` and ``cropbox`` (left, bottom, right, top) if requested.
+        
+        Note:
+            Widths and heights are retrieved without loading pages.
+            PDFium has no index-based functions for rotation and boxes, so pages are loaded transiently if *rotations* or *cropboxes* are requested.
+        """
+        
+        if numpy is None:
+            raise RuntimeError("NumPy library needs to be installed for get_page_sizes().")
+        
+        fields = [("width", numpy.float32), ("height", numpy.float32)]
+        if rotations:
+            fields.append( ("rotation", numpy.uint16) )
+        if cropboxes:
+            fields.append( ("cropbox", numpy.float32, (4, )) )
+        
+        n_pages = len(self)
+        sizes = numpy.empty(n_pages, dtype=fields)
+        sizes[["width", "height"]] = self._get_page_size_list()
+        
+        if rotations or cropboxes:
+            box = (ctypes.c_float(), ctypes.c_float(), ctypes.c_float(), ctypes.c_float())
+            for index in range(n_pages):
+                raw_page = pdfium.FPDF_LoadPage(self.raw, index)
+                if not raw_page:
+                    raise PdfiumError("Failed to load page %s." % index)
+                try:
+                    if rotations:
+                        sizes["rotation"][index] = RotationToDegrees[ pdfium.FPDFPage_GetRotation(raw_page) ]
+                    if cropboxes:
+                        if pdfium.FPDFPage_GetCropBox(raw_page, *box) or pdfium.FPDFPage_GetMediaBox(raw_page, *box):
+                            sizes["cropbox"][index] = [c.value for c in box]
+                        else:
+                            sizes["cropbox"][index] = (0, 0, 612, 792)
+                finally:
+                    pdfium.FPDF_ClosePage(raw_page)
+        
+        return sizes
+    
+    
+    @classmethod
+    def probe(cls, input_data, password=None):
+        """
+        Gather summary information about a document without loading any pages.
+        
+        Parameters:
+            input_data (str | bytes | typing.BinaryIO):
+                The input PDF (see :class:`.PdfDocument`).
+            password (str | bytes | None):
+                A password to unlock the PDF, if encrypted.
+        Returns:
+            DocumentInfo: Page count, page sizes, version, encryption status and metadata.
+        """
+        
+        pdf = cls(input_data, password=password)
+        try:
+            info = DocumentInfo(
+                n_pages = len(pdf),
+                page_sizes = pdf._get_page_size_list(),
+                version = pdf.get_version(),
+                is_encrypted = pdf.is_encrypted(),
+                metadata = pdf.get_metadata_dict(),
+            )
+        finally:
+            pdf.close()
+        
+        return info
+    
+    
+    @classmethod
+    def probe_many(cls, inputs, password=None, n_processes=os.cpu_count()):
+        """
+        Concurrently probe multiple documents, using a process pool executor.
+        
+        Parameters:
+            inputs (typing.Iterable[str | bytes]):
+                The input PDFs, given as file paths or bytes.
+            password (str | bytes | None):
+                A password to use for all documents.
+            n_processes (int):
+                Target number of parallel processes.
+        Yields:
+            :class:`.DocumentInfo`: The information for each input, in the order of *inputs*.
+        """
+        
+        # the executor submits all tasks at once anyway, so a list costs nothing extra and provides the length
+        inputs = list(inputs)
+        probe_func = functools.partial(cls.probe, password=password)
+        chunksize = max(1, len(inputs) // (n_processes*4))
+        
+        with ProcessPoolExecutor(n_processes) as pool:
+            yield from pool.map(probe_func, inputs, chunksize=chunksize)
+    
+    
+    def page_as_xobject(self, index, dest_pdf, cache=False):
         """
         Capture a page as XObject and attach it to a document's resources.
         
         Parameters:
             index (int): Zero-based index of the page. Reverse indexing is allowed.
             dest_pdf (PdfDocument): Target document to which the XObject shall be added.
+            cache (bool):
+                If :data:`True`, re-use the XObject of a previous cached capture of the same page into the same target document, if any.
+                Pages placed many times are then stored only once in the target document. Cached XObjects are reference counted:
+                each call must be matched by a call to :meth:`.PdfXObject.close`, and the XObject is only closed with the last one (or with the target document).
+                Changes to the source page after the first capture are not reflected by cached XObjects.
+                Cached XObjects only hold a weak reference to the target document, so they do not keep it alive.
         Returns:
             PdfXObject: The page as XObject.
         """
         
         index = self._handle_index(index)
         
+        if cache:
+            # the weak reference compares equal to other references to this document while it is alive, but never to a later document at the same address
+            cache_key = (weakref.ref(self), index)
+            xobject = dest_pdf._xobject_cache.get(cache_key)
+            if xobject is not None:
+                xobject._n_refs += 1
+                return xobject
+        
         raw_xobject = pdfium.FPDF_NewXObjectFromPage(dest_pdf.raw, self.raw, index)
         if raw_xobject is None:
             raise PdfiumError("Failed to capture page %s as FPDF_XOBJECT" % index)
         
-        return PdfXObject(
-            raw = raw_xobject,
-            pdf = dest_pdf,
-        )
+        if not cache:
+            return PdfXObject(
+                raw = raw_xobject,
+                pdf = dest_pdf,
+            )
+        
+        xobject = PdfXObject(raw_xobject, dest_pdf, cache_key=cache_key)
+        dest_pdf._xobject_cache[cache_key] = xobject
+        return xobject
     
     
     def new_page(self, width, height, index=None):
@@ -335,6 +606,7 @@ class PdfDocument (BitmapConvAliases):
         elif index < 0:
             index += len(self)
         raw_page = pdfium.FPDFPage_New(self.raw, index, width, height)
+        self._generation += 1
         return PdfPage(raw_page, self)
     
     
@@ -344,6 +616,7 @@ class PdfDocument (BitmapConvAliases):
         """
         index = self._handle_index(index)
         pdfium.FPDFPage_Delete(self.raw, index)
+        self._generation += 1
     
     
     def get_page(self, index):
@@ -501,17 +774,83 @@ class PdfDocument (BitmapConvAliases):
             )
     
     
-    def update_rendering_input(self):
+    def update_rendering_input(self, skip_unchanged=False):
         """
         Update the input sources for concurrent rendering to the document's current state
-        by saving to bytes and setting the result as new input.
+        by saving to bytes and publishing the result as a temporary file.
         If you modified the document, you may want to call this method before :meth:`.render_to`.
+        
+        Parameters:
+            skip_unchanged (bool):
+                If True, do not save the document again if no changes were counted since the input sources were last published.
+                Only page insertion and deletion, :meth:`.PdfPage.set_rotation`, the box setters and :meth:`.PdfPage.generate_content` are counted.
+                Other modifications (e. g. through raw PDFium calls, :meth:`.add_font` or changes to image objects) are not detected, so only use this if you know that none were made.
         """
-        buffer = io.BytesIO()
-        self.save(buffer)
-        buffer.seek(0)
-        self._rendering_input = buffer.read()
-        buffer.close()
+        if skip_unchanged and self._rendering_input is not None and self._rendering_generation == self._generation:
+            return
+        data = self.save_to_bytes()
+        self._publish_rendering_input(lambda fh: fh.write(data))
+    
+    
+    def _publish_rendering_input(self, write_func):
+        
+        # Worker processes only receive the path of the temporary file, so the data need not be pickled for each task.
+        
+        generation = self._generation
+        self._release_rendering_input()
+        
+        fd, path = tempfile.mkstemp(prefix="pypdfium2_", suffix=".pdf")
+        with open(fd, "wb") as fh:
+            write_func(fh)
+        
+        self._rendering_input = path
+        self._rendering_access = FileAccess.NATIVE
+        self._rendering_generation = generation
+        self._rendering_finalizer = weakref.finalize(self, os.remove, path)
+    
+    
+    def _release_rendering_input(self):
+        if self._rendering_finalizer is not None:
+            self._rendering_finalizer()
+        self._rendering_input = None
+        self._rendering_access = None
+        self._rendering_generation = None
+        self._rendering_finalizer = None
+    
+    
+    def _check_page_indices(self, page_indices):
+        n_pages = len(self)
+        if not page_indices:
+            return [i for i in range(n_pages)]
+        if not all(0 <= i < n_pages for i in page_indices):
+            raise ValueError("Out-of-bounds page index")
+        if len(page_indices) != len(set(page_indices)):
+            raise ValueError("Duplicate page index")
+        return page_indices
+    
+    
+    def _get_worker_input(self):
+        if self._rendering_input is None:
+            if isinstance(self._orig_input, pdfium.FPDF_DOCUMENT):
+                logger.warning("Cannot perform concurrent processing without input sources - saving the document implicitly to get a file for the worker processes.")
+                self.update_rendering_input()
+            elif is_input_buffer(self._orig_input):
+                logger.warning("Cannot perform concurrent processing with buffer input - copying the buffer to a temporary file implicitly.")
+                cursor = self._orig_input.tell()
+                self._orig_input.seek(0)
+                self._publish_rendering_input(lambda fh: shutil.copyfileobj(self._orig_input, fh))
+                self._orig_input.seek(cursor)
+                # the copy reflects the original input, not changes made since loading
+                self._rendering_generation = 0
+            elif isinstance(self._orig_input, bytes):
+                self._publish_rendering_input(lambda fh: fh.write(self._orig_input))
+                self._rendering_generation = 0
+            else:
+                self._rendering_input = self._orig_input
+                self._rendering_access = self._file_access
+                self._rendering_generation = 0
+        
+        return self._rendering_input, self._rendering_access
     
     
     @classmethod
@@ -551,14 +890,7 @@ class PdfDocument (BitmapConvAliases):
             :data:`typing.Any`: Implementation-specific result object.
         """
         
-        n_pages = len(self)
-        if not page_indices:
-            page_indices = [i for i in range(n_pages)]
-        else:
-            if not all(0 <= i < n_pages for i in page_indices):
-                raise ValueError("Out-of-bounds page index")
-            if len(page_indices) != len(set(page_indices)):
-                raise ValueError("Duplicate page index")
+        page_indices = self._check_page_indices(page_indices)
         
         # shortcut: if we're rendering just a single page, don't waste time setting up a process pool
         if len(page_indices) == 1:
@@ -567,25 +899,14 @@ class PdfDocument (BitmapConvAliases):
             yield result
             return
         
-        if self._rendering_input is None:
-            if isinstance(self._orig_input, pdfium.FPDF_DOCUMENT):
-                logger.warning("Cannot perform concurrent processing without input sources - saving the document implicitly to get picklable data.")
-                self.update_rendering_input()
-            elif is_input_buffer(self._orig_input):
-                logger.warning("Cannot perform concurrent rendering with buffer input - reading the whole buffer into memory implicitly.")
-                cursor = self._orig_input.tell()
-                self._orig_input.seek(0)
-                self._rendering_input = self._orig_input.read()
-                self._orig_input.seek(cursor)
-            else:
-                self._rendering_input = self._orig_input
+        input_data, file_access = self._get_worker_input()
         
         invoke_renderer = functools.partial(
             PdfDocument._process_page,
             converter = converter,
-            input_data = self._rendering_input,
+            input_data = input_data,
             password = self._password,
-            file_access = self._file_access,
+            file_access = file_access,
             **kwargs
         )
         
@@ -598,6 +919,406 @@ class PdfDocument (BitmapConvAliases):
         
         assert len(page_indices) == i
 
+    
+    
+    @staticmethod
+    def _get_page_text(page, index, strategy):
+        textpage = page.get_textpage()
+        if strategy == "range":
+            text = textpage.get_text_range()
+        elif strategy == "bounded":
+            text = textpage.get_text_bounded()
+        else:
+            raise ValueError("Invalid text extraction strategy '%s'" % strategy)
+        textpage.close()
+        return text
+    
+    
+    @classmethod
+    def _process_page_chunk(cls, page_indices, page_func, input_data, password, file_access):
+        pdf = cls(
+            input_data,
+            password = password,
+            file_access = file_access,
+        )
+        results = []
+        for index in page_indices:
+            page = pdf.get_page(index)
+            results.append( (index, page_func(page, index)) )
+            page.close()
+        return results
+    
+    
+    def _map_pages(self, page_indices, page_func, n_processes, chunk_size):
+        
+        # page_func(page, index) must be picklable (i. e. a module level function, or a partial object thereof)
+        
+        if len(page_indices) == 1 or n_processes == 1:
+            for index in page_indices:
+                page = self.get_page(index)
+                yield index, page_func(page, index)
+                page.close()
+            return
+        
+        input_data, file_access = self._get_worker_input()
+        
+        if chunk_size is None:
+            chunk_size = max(1, math.ceil( len(page_indices) / (n_processes*4) ))
+        chunks = [page_indices[i:i+chunk_size] for i in range(0, len(page_indices), chunk_size)]
+        
+        invoke_worker = functools.partial(
+            PdfDocument._process_page_chunk,
+            page_func = page_func,
+            input_data = input_data,
+            password = self._password,
+            file_access = file_access,
+        )
+        
+        # only keep a limited number of chunks in flight, so that results do not pile up if the caller consumes them slowly
+        with ProcessPoolExecutor(n_processes) as pool:
+            pending = collections.deque()
+            for chunk in chunks:
+                pending.append( pool.submit(invoke_worker, chunk) )
+                if len(pending) >= n_processes*2:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+    
+    
+    def extract_text(
+            self,
+            page_indices = None,
+            strategy = "range",
+            n_processes = os.cpu_count(),
+            chunk_size = None,
+        ):
+        """
+        Concurrently extract the text of multiple pages, using a process pool executor.
+        Pages are distributed to the workers in chunks, and the caller does not load any pages.
+        
+        If extracting only a single page or if *n_processes* is 1, the text is extracted in the current process instead.
+        
+        Parameters:
+            page_indices (typing.Sequence[int] | None):
+                A sequence of zero-based indices of the pages to process, as in :meth:`.render_to`. If :data:`None`, all pages will be included.
+            strategy (str):
+                ``range`` to use :meth:`.PdfTextPage.get_text_range`, or ``bounded`` to use :meth:`.PdfTextPage.get_text_bounded`.
+            n_processes (int):
+                Target number of parallel processes.
+            chunk_size (int | None):
+                Number of pages a worker processes at once. If :data:`None`, pages are split in four chunks per process.
+        
+        Yields:
+            (int, str): Page index and text, in the order of *page_indices*.
+        """
+        
+        if strategy not in ("range", "bounded"):
+            raise ValueError("Invalid text extraction strategy '%s'" % strategy)
+        page_indices = self._check_page_indices(page_indices)
+        page_func = functools.partial(PdfDocument._get_page_text, strategy=strategy)
+        yield from self._map_pages(page_indices, page_func, n_processes, chunk_size)
+    
+    
+    def export_text(
+            self,
+            format = "json",
+            page_indices = None,
+            chars = False,
+            n_processes = os.cpu_count(),
+            chunk_size = None,
+        ):
+        """
+        *Requires* :mod:`numpy`
+        
+        Concurrently export the text of multiple pages with words, lines, blocks, boxes and fonts, using a process pool executor.
+        Pages are yielded as soon as they are ready, so documents of any size can be written incrementally.
+        Use :func:`.get_export_header` and :func:`.get_export_footer` to enclose the page fragments in a complete file.
+        
+        Parameters:
+            format (str):
+                One of :data:`.TextExportFormats` (``json`` for JSON lines, ``hocr`` or ``alto``).
+            page_indices (typing.Sequence[int] | None):
+                A sequence of zero-based indices of the pages to process. If :data:`None`, all pages will be included.
+            chars (bool):
+                Whether to include the individual characters of each word.
+            n_processes (int):
+                Target number of parallel processes.
+            chunk_size (int | None):
+                Number of pages a worker processes at once, as in :meth:`.extract_text`.
+        
+        Yields:
+            (int, str): Page index and formatted page fragment, in the order of *page_indices*.
+        """
+        
+        if format not in TextExportFormats:
+            raise ValueError("Invalid text export format '%s'" % format)
+        page_indices = self._check_page_indices(page_indices)
+        page_func = functools.partial(export_page, format=format, chars=chars)
+        yield from self._map_pages(page_indices, page_func, n_processes, chunk_size)
+    
+    
+    @staticmethod
+    def _get_page_weblinks(page, index):
+        textpage = page.get_textpage()
+        links = textpage.get_weblinks()
+        textpage.close()
+        return links
+    
+    
+    def get_weblinks(self, page_indices=None, n_processes=os.cpu_count(), chunk_size=None):
+        """
+        Concurrently detect web links on multiple pages, using a process pool executor (see :meth:`.extract_text`).
+        
+        Parameters:
+            page_indices (typing.Sequence[int] | None):
+                A sequence of zero-based indices of the pages to process. If :data:`None`, all pages will be included.
+            n_processes (int):
+                Target number of parallel processes.
+            chunk_size (int | None):
+                Number of pages a worker processes at once, as in :meth:`.extract_text`.
+        Yields:
+            (int, typing.List[WebLink]): Page index and links (see :meth:`.PdfTextPage.get_weblinks`), in the order of *page_indices*.
+        """
+        page_indices = self._check_page_indices(page_indices)
+        yield from self._map_pages(page_indices, PdfDocument._get_page_weblinks, n_processes, chunk_size)
+    
+    
+    @classmethod
+    def _get_document_weblinks(cls, input_data, password):
+        pdf = cls(input_data, password=password)
+        try:
+            return [(index, links) for index, links in pdf.get_weblinks(n_processes=1) if len(links) > 0]
+        finally:
+            pdf.close()
+    
+    
+    @classmethod
+    def get_weblinks_many(cls, inputs, password=None, n_processes=os.cpu_count()):
+        """
+        Concurrently detect the web links of multiple documents, using a process pool executor.
+        This is suitable to crawl the link graph of a collection of PDFs.
+        
+        Parameters:
+            inputs (typing.Iterable[str | bytes]):
+                The input PDFs, given as file paths or bytes.
+            password (str | bytes | None):
+                A password to use for all documents.
+            n_processes (int):
+                Target number of parallel processes.
+        Yields:
+            typing.List[typing.Tuple[int, typing.List[WebLink]]]:
+            Page index and links of each page that contains links, for each input in the order of *inputs*.
+        """
+        
+        # as in probe_many(), a list provides the length at no extra cost
+        inputs = list(inputs)
+        links_func = functools.partial(cls._get_document_weblinks, password=password)
+        chunksize = max(1, len(inputs) // (n_processes*4))
+        
+        with ProcessPoolExecutor(n_processes) as pool:
+            yield from pool.map(links_func, inputs, chunksize=chunksize)
+    
+    
+    @staticmethod
+    def _extract_page_images(page, index, dest_dir, max_depth, fb_render):
+        
+        paths = []
+        images = page.get_objects(types=[pdfium.FPDF_PAGEOBJ_IMAGE], max_depth=max_depth)
+        
+        for image in images:
+            
+            # identify images by their stream content, so that images shared across pages are only written once
+            stem = os.path.join(dest_dir, image.get_hash()[:32])
+            
+            existing = [stem+ext for ext in (".jpg", ".jp2", ".png") if os.path.exists(stem+ext)]
+            if existing:
+                paths.append(existing[0])
+                continue
+            
+            # write to a temporary name first, as other workers might extract the same image concurrently
+            tmp_path = image.extract("%s.%s.tmp" % (stem, os.getpid()), fb_render=fb_render)
+            path = stem + os.path.splitext(tmp_path)[1]
+            os.replace(tmp_path, path)
+            paths.append(path)
+        
+        return paths
+    
+    
+    def extract_images(
+            self,
+            dest_dir,
+            page_indices = None,
+            max_depth = 15,
+            fb_render = False,
+            n_processes = os.cpu_count(),
+            chunk_size = None,
+        ):
+        """
+        Concurrently extract the images of multiple pages to a directory, using a process pool executor (see :meth:`.extract_text`).
+        
+        Images are written with :meth:`.PdfImageObject.extract`, so JPEG and JPEG 2000 streams are copied without re-encoding.
+        Files are named after a hash of the image stream, which dedupes images that are used several times.
+        
+        Parameters:
+            dest_dir (str):
+                Path of the output directory.
+            page_indices (typing.Sequence[int] | None):
+                A sequence of zero-based indices of the pages to process. If :data:`None`, all pages will be included.
+            max_depth (int):
+                Maximum recursion depth to consider when descending into Form XObjects.
+            fb_render (bool):
+                If images need to be re-encoded, whether to use the rendered rather than the decoded bitmap.
+            n_processes (int):
+                Target number of parallel processes.
+            chunk_size (int | None):
+                Number of pages a worker processes at once, as in :meth:`.extract_text`.
+        Yields:
+            (int, typing.List[str]): Page index and paths of the files for the images on the page, in the order of *page_indices*.
+        """
+        
+        if not os.path.isdir(dest_dir):
+            raise FileNotFoundError("Output directory does not exist: '%s'" % dest_dir)
+        
+        page_indices = self._check_page_indices(page_indices)
+        page_func = functools.partial(
+            PdfDocument._extract_page_images,
+            dest_dir = os.path.abspath(dest_dir),
+            max_depth = max_depth,
+            fb_render = fb_render,
+        )
+        yield from self._map_pages(page_indices, page_func, n_processes, chunk_size)
+    
+    
+    @staticmethod
+    def _get_page_image_hashes(page, index, max_depth, perceptual):
+        hashes = []
+        for image in page.get_objects(types=[pdfium.FPDF_PAGEOBJ_IMAGE], max_depth=max_depth):
+            hashes.append( (image.get_hash(), image.get_perceptual_hash() if perceptual else None) )
+        return hashes
+    
+    
+    def get_image_hashes(self, page_indices=None, max_depth=15, perceptual=False, n_processes=os.cpu_count(), chunk_size=None):
+        """
+        Concurrently hash the images of multiple pages, using a process pool executor (see :meth:`.extract_text`).
+        Images with the same stream hash are duplicates, and images with a small perceptual hash distance look alike.
+        
+        Parameters:
+            page_indices (typing.Sequence[int] | None):
+                A sequence of zero-based indices of the pages to process. If :data:`None`, all pages will be included.
+            max_depth (int):
+                Maximum recursion depth to consider when descending into Form XObjects.
+            perceptual (bool):
+                Whether to compute perceptual hashes as well (*requires* :mod:`numpy`).
+            n_processes (int):
+                Target number of parallel processes.
+            chunk_size (int | None):
+                Number of pages a worker processes at once, as in :meth:`.extract_text`.
+        Yields:
+            (int, typing.List[typing.Tuple[str, int | None]]):
+            Page index and, for each image on the page in the order of :meth:`.PdfPage.get_objects`,
+            the stream hash (see :meth:`.PdfImageObject.get_hash`) and the perceptual hash (see :meth:`.PdfImageObject.get_perceptual_hash`) or :data:`None`.
+        """
+        page_indices = self._check_page_indices(page_indices)
+        page_func = functools.partial(
+            PdfDocument._get_page_image_hashes,
+            max_depth = max_depth,
+            perceptual = perceptual,
+        )
+        yield from self._map_pages(page_indices, page_func, n_processes, chunk_size)
+
+
+class PdfDocumentCache:
+    """
+    Least-recently-used cache of documents opened from file paths.
+    This avoids parsing frequently used files over and over again.
+    
+    A cached document is identified by its absolute path, a hash of the password, the file access mode, and the modification time and size of the file.
+    If the file changes on disk, it will be loaded anew on the next request.
+    The cache may be shared among threads. :data:`.default_document_cache` is a process-wide instance.
+    
+    Note:
+        Cached documents are shared among all callers and should be treated as read-only.
+        When a document is evicted (or the cache is cleared), the cache drops its reference without calling :meth:`.PdfDocument.close`,
+        so that pages or other child objects still in use remain valid. From then on, the document is owned by whoever still refers to it:
+        its finalizer closes it as soon as the last reference is gone, or callers may close it explicitly once they are done.
+        Documents that are still referenced elsewhere thus do not count towards *max_handles*.
+    
+    Parameters:
+        max_handles (int):
+            Maximum number of documents held by the cache.
+    """
+    
+    def __init__(self, max_handles=8):
+        if max_handles < 1:
+            raise ValueError("max_handles must be >0, but %s was given." % max_handles)
+        self.max_handles = max_handles
+        self._documents = collections.OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._documents)
+    
+    @staticmethod
+    def _get_key(path, password, file_access):
+        # the first three items identify an entry, the remaining ones whether it is up to date
+        stat = os.stat(path)
+        if password is None:
+            pw_hash = None
+        else:
+            if isinstance(password, str):
+                password = password.encode("utf-8")
+            pw_hash = hashlib.sha256(password).digest()
+        return (path, pw_hash, file_access, stat.st_mtime_ns, stat.st_size)
+    
+    def get(self, path, password=None, file_access=FileAccess.NATIVE):
+        """
+        Get the document at *path*, loading it if not cached yet.
+        
+        Parameters:
+            path (str):
+                File path of the PDF.
+            password (str | bytes | None):
+                A password to unlock the PDF, if encrypted.
+            file_access (FileAccess):
+                How to open the file if it needs to be loaded.
+        Returns:
+            PdfDocument: The cached document.
+        """
+        
+        path = os.path.abspath( os.path.expanduser(path) )
+        if not os.path.isfile(path):
+            raise FileNotFoundError("File does not exist: '%s'" % path)
+        key = self._get_key(path, password, file_access)
+        
+        with self._lock:
+            
+            pdf = self._documents.get(key, None)
+            if pdf is not None and pdf.raw is not None:
+                self._documents.move_to_end(key)
+                return pdf
+            
+            # drop outdated entries for the same file, password and access mode
+            for old_key in [k for k in self._documents.keys() if k[:3] == key[:3]]:
+                del self._documents[old_key]
+            
+            pdf = PdfDocument(path, password=password, file_access=file_access)
+            self._documents[key] = pdf
+            while len(self._documents) > self.max_handles:
+                self._documents.popitem(last=False)
+        
+        return pdf
+    
+    def clear(self):
+        """
+        Drop all cached documents.
+        """
+        with self._lock:
+            self._documents.clear()
+
+
+#: Process-wide :class:`.PdfDocumentCache` with the default number of handles.
+default_document_cache = PdfDocumentCache()
+
 
 def _open_pdf(input_data, password=None):
     
@@ -626,15 +1347,48 @@ def _open_pdf(input_data, password=None):
 
 class _writer_class:
     
+    # Size of the staging buffer in which small blocks from PDFium are gathered before being passed on to the target.
+    # Larger blocks bypass the staging buffer.
+    CHUNK_SIZE = 2**20
+    
     def __init__(self, buffer):
-        self.buffer = buffer
-        if not callable( getattr(self.buffer, "write", None) ):
-            raise ValueError("Output buffer must implement the write() method.")
+        
+        if isinstance(buffer, int) and not isinstance(buffer, bool):
+            self._write = functools.partial(_write_fd, buffer)
+        elif isinstance(buffer, bytearray):
+            # the staging buffer is kept separate from the target, so that the target can be grown while no ctypes object refers to its memory
+            self._write = buffer.extend
+        elif callable( getattr(buffer, "write", None) ):
+            self._write = buffer.write
+        else:
+            raise ValueError("Output buffer must implement the write() method, or be a bytearray or file descriptor.")
+        
+        self._staging = bytearray(self.CHUNK_SIZE)
+        self._staging_view = memoryview(self._staging)
+        self._staging_addr = ctypes.addressof( (ctypes.c_ubyte * self.CHUNK_SIZE).from_buffer(self._staging) )
+        self._pos = 0
     
     def __call__(self, _, data, size):
-        block = ctypes.cast(data, ctypes.POINTER(ctypes.c_ubyte * size))
-        self.buffer.write(block.contents)
+        if self._pos + size > self.CHUNK_SIZE:
+            self.flush()
+            if size > self.CHUNK_SIZE:
+                self._write( ctypes.string_at(data, size) )
+                return 1
+        ctypes.memmove(self._staging_addr + self._pos, data, size)
+        self._pos += size
         return 1
+    
+    def flush(self):
+        if self._pos > 0:
+            self._write(self._staging_view[:self._pos])
+            self._pos = 0
+
+
+def _write_fd(fd, data):
+    view = memoryview(data)
+    while len(view) > 0:
+        n_written = os.write(fd, view)
+        view = view[n_written:]
 
 
 class PdfXObject:
@@ -646,13 +1400,27 @@ class PdfXObject:
         pdf (PdfDocument): Reference to the document this XObject belongs to.
     """
     
-    def __init__(self, raw, pdf):
+    def __init__(self, raw, pdf, cache_key=None):
         self.raw = raw
-        self.pdf = pdf
-        self._finalizer = weakref.finalize(
-            self, self._static_close,
-            self.raw, self.pdf,
-        )
+        self._cache_key = cache_key
+        self._n_refs = 1
+        if cache_key is None:
+            self._pdf = pdf
+            self._finalizer = weakref.finalize(
+                self, self._static_close,
+                self.raw, self._pdf,
+            )
+        else:
+            # owned by the document's XObject cache, which closes it with the document
+            # the back-reference is weak, as the cache would otherwise form a reference cycle with the document
+            self._pdf = weakref.ref(pdf)
+            self._finalizer = None
+    
+    @property
+    def pdf(self):
+        if self._cache_key is None:
+            return self._pdf
+        return self._pdf()
     
     def _tree_closed(self):
         if self.raw is None:
@@ -670,11 +1438,21 @@ class PdfXObject:
         """
         Free memory by applying the finalizer for the underlying PDFium XObject.
         Please refer to the generic note on ``close()`` methods for details.
+        
+        For XObjects from a cached capture (see :meth:`.PdfDocument.page_as_xobject`), this releases one reference, and the XObject is only closed with the last one.
         """
         if self.raw is None:
             logger.warning("Duplicate close call suppressed on XObject %s" % self)
             return
-        self._finalizer()
+        if self._cache_key is None:
+            self._finalizer()
+        else:
+            self._n_refs -= 1
+            if self._n_refs > 0:
+                return
+            pdf = self.pdf
+            del pdf._xobject_cache[self._cache_key]
+            self._static_close(self.raw, pdf)
         self.raw = None
     
     def as_pageobject(self):
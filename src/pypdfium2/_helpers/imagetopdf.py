@@ -0,0 +1,339 @@
+# SPDX-FileCopyrightText: 2022 geisserml <geisserml@gmail.com>
+# SPDX-License-Identifier: Apache-2.0 OR BSD-3-Clause
+
+import os
+import ctypes
+import struct
+import collections
+from concurrent.futures import ThreadPoolExecutor
+from pypdfium2._helpers.matrix import PdfMatrix
+from pypdfium2._helpers.document import PdfDocument
+from pypdfium2._helpers.pageobject import PdfImageObject, _pil_to_raw
+
+try:
+    import PIL.Image
+    import PIL.ImageSequence
+except ImportError:
+    PIL = None
+
+
+# start of frame markers (excluding DHT, JPG and DAC, which share the range)
+_SofMarkers = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+class JpegInfo:
+    """
+    Class to store information from the header of a JPEG file, as gathered by :func:`.read_jpeg_info`.
+    
+    Parameters:
+        path (str):
+            Path of the file.
+        width (int):
+            Image width in pixels.
+        height (int):
+            Image height in pixels.
+        n_components (int):
+            Number of colour components (1 for greyscale, 3 for YCbCr/RGB, 4 for CMYK).
+        dpi (typing.Tuple[float, float] | None):
+            Horizontal and vertical resolution from the JFIF header, or :data:`None` if not specified.
+    """
+    
+    __slots__ = ("path", "width", "height", "n_components", "dpi")
+    
+    def __init__(self, path, width, height, n_components, dpi):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.n_components = n_components
+        self.dpi = dpi
+
+
+def read_jpeg_info(path):
+    """
+    Read the header of a JPEG file, without decoding the image. Only the segments up to the frame header are read.
+    
+    Parameters:
+        path (str): Path of the JPEG file.
+    Returns:
+        JpegInfo: Dimensions, number of components and resolution of the image.
+    Raises:
+        ValueError: If the file is not a JPEG file, or its header is truncated or malformed.
+    """
+    
+    with open(path, "rb") as fh:
+        
+        if fh.read(2) != b"\xff\xd8":
+            raise ValueError("Not a JPEG file: '%s'" % path)
+        
+        dpi = None
+        while True:
+            
+            byte = fh.read(1)
+            if not byte:
+                raise ValueError("No frame header found in JPEG file: '%s'" % path)
+            if byte != b"\xff":
+                continue
+            marker = fh.read(1)
+            while marker == b"\xff":
+                marker = fh.read(1)
+            if not marker:
+                continue
+            marker = marker[0]
+            if marker in (0x00, 0x01, 0xD8) or 0xD0 <= marker <= 0xD7:
+                continue  # no segment follows
+            
+            length_bytes = fh.read(2)
+            if len(length_bytes) < 2:
+                raise ValueError("Truncated JPEG file: '%s'" % path)
+            length = struct.unpack(">H", length_bytes)[0]
+            if length < 2:
+                raise ValueError("Invalid segment length %s in JPEG file: '%s'" % (length, path))
+            segment = fh.read(length - 2)
+            if len(segment) < length - 2:
+                raise ValueError("Truncated JPEG file: '%s'" % path)
+            
+            if marker == 0xE0 and segment[:5] == b"JFIF\x00" and len(segment) >= 12:
+                units, x_density, y_density = struct.unpack(">BHH", segment[7:12])
+                if x_density > 0 and y_density > 0:
+                    if units == 1:
+                        dpi = (float(x_density), float(y_density))
+                    elif units == 2:
+                        dpi = (x_density * 2.54, y_density * 2.54)
+            elif marker in _SofMarkers:
+                if len(segment) < 6:
+                    raise ValueError("Invalid frame header in JPEG file: '%s'" % path)
+                _, height, width, n_components = struct.unpack(">BHHB", segment[:6])
+                return JpegInfo(path, width, height, n_components, dpi)
+
+
+def read_jpeg_infos(paths, n_threads=None):
+    """
+    Concurrently read the headers of multiple JPEG files (see :func:`.read_jpeg_info`), using a thread pool executor.
+    Threads rather than processes are used since the work is bound by file access.
+    
+    Parameters:
+        paths (typing.Sequence[str]):
+            Paths of the JPEG files.
+        n_threads (int | None):
+            Number of threads to use. If :data:`None`, the default of :class:`concurrent.futures.ThreadPoolExecutor` applies.
+    Returns:
+        typing.List[JpegInfo]: The information for each file, in the order of *paths*.
+    """
+    with ThreadPoolExecutor(n_threads) as pool:
+        return list( pool.map(read_jpeg_info, paths) )
+
+
+class _FileHandlePool:
+    
+    # Least-recently-used set of open read-only file handles, closing the oldest one if the limit is exceeded.
+    
+    def __init__(self, max_open):
+        self.max_open = max_open
+        self._handles = collections.OrderedDict()
+    
+    def get(self, path):
+        if path in self._handles:
+            self._handles.move_to_end(path)
+            return self._handles[path]
+        fh = open(path, "rb")
+        self._handles[path] = fh
+        if len(self._handles) > self.max_open:
+            self._handles.popitem(last=False)[1].close()
+        return fh
+    
+    def close(self):
+        for fh in self._handles.values():
+            fh.close()
+        self._handles.clear()
+
+
+class _PooledFile:
+    
+    # Read-only file-like object that borrows a handle from a pool on each access,
+    # so that any number of files can be referenced by a document with a bounded number of open handles.
+    
+    def __init__(self, path, pool):
+        self.path = path
+        self._pool = pool
+        self._pos = 0
+        self._size = os.path.getsize(path)
+    
+    def seek(self, offset, whence=0):
+        if whence == 0:
+            self._pos = offset
+        elif whence == 1:
+            self._pos += offset
+        else:
+            self._pos = self._size + offset
+        return self._pos
+    
+    def tell(self):
+        return self._pos
+    
+    def read(self, size=-1):
+        fh = self._pool.get(self.path)
+        fh.seek(self._pos)
+        data = fh.read(size)
+        self._pos += len(data)
+        return data
+    
+    def readinto(self, buffer):
+        fh = self._pool.get(self.path)
+        fh.seek(self._pos)
+        n_bytes = fh.readinto(buffer)
+        self._pos += n_bytes
+        return n_bytes
+    
+    def close(self):
+        pass
+
+
+class _RawImage:
+    
+    # Decoded image frame, ready to be set as bitmap of an image object.
+    
+    __slots__ = ("path", "width", "height", "cl_format", "data", "dpi")
+    
+    def __init__(self, path, width, height, cl_format, data, dpi):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.cl_format = cl_format
+        self.data = data
+        self.dpi = dpi
+
+
+def _prepare_image(path):
+    
+    # JPEGs are passed through, so only their header is read. Other formats are decoded with PIL, one entry per frame.
+    
+    with open(path, "rb") as fh:
+        is_jpeg = (fh.read(2) == b"\xff\xd8")
+    if is_jpeg:
+        return [read_jpeg_info(path)]
+    
+    if PIL is None:
+        raise RuntimeError("Pillow library needs to be installed to convert non-JPEG images.")
+    
+    prepared = []
+    with PIL.Image.open(path) as pil_image:
+        for frame in PIL.ImageSequence.Iterator(pil_image):
+            dpi = frame.info.get("dpi")
+            if dpi is not None:
+                # TIFFs without resolution unit are reported as 1 DPI, which is a placeholder rather than a meaningful value
+                dpi = tuple(float(v) for v in dpi)
+                if not all(v > 1 for v in dpi):
+                    dpi = None
+            data, width, height, cl_format = _pil_to_raw(frame)
+            prepared.append( _RawImage(path, width, height, cl_format, data, dpi) )
+    
+    return prepared
+
+
+def _prepare_images(paths, n_threads):
+    
+    # Prepare images in a thread pool, yielding results in order. Only a bounded number of results is held ahead of the consumer, to limit the memory taken by decoded pixels.
+    
+    if n_threads is None:
+        n_threads = os.cpu_count() or 1
+    
+    with ThreadPoolExecutor(n_threads) as pool:
+        window = collections.deque()
+        for path in paths:
+            window.append( pool.submit(_prepare_image, path) )
+            if len(window) > n_threads * 2:
+                yield from window.popleft().result()
+        while window:
+            yield from window.popleft().result()
+
+
+def _build_pdf(infos, dpi, default_dpi, inline, max_open_files):
+    
+    handle_pool = _FileHandlePool(max_open_files)
+    pdf = PdfDocument.new()
+    pdf._data_closer.append(handle_pool)
+    
+    for info in infos:
+        
+        if dpi is not None:
+            x_dpi, y_dpi = dpi, dpi
+        elif info.dpi is not None:
+            x_dpi, y_dpi = info.dpi
+        else:
+            x_dpi, y_dpi = default_dpi, default_dpi
+        width, height = info.width * 72 / x_dpi, info.height * 72 / y_dpi
+        
+        image = PdfImageObject.new(pdf)
+        if isinstance(info, _RawImage):
+            buffer = ctypes.cast(ctypes.c_char_p(info.data), ctypes.POINTER(ctypes.c_ubyte))
+            image._set_bitmap_buffer(buffer, info.width, info.height, info.width * len(info.cl_format), info.cl_format)
+        elif inline:
+            image.load_jpeg(open(info.path, "rb"), inline=True, autoclose=True)
+        else:
+            image.load_jpeg(_PooledFile(info.path, handle_pool), inline=False, autoclose=True)
+        image.set_matrix( PdfMatrix(width, 0, 0, height, 0, 0) )
+        
+        page = pdf.new_page(width, height)
+        page.insert_object(image)
+        page.generate_content()
+        page.close()
+    
+    return pdf
+
+
+def jpegs_to_pdf(paths, dpi=None, default_dpi=72, inline=False, max_open_files=32, n_threads=None):
+    """
+    Create a document with one page per JPEG file. Pages are sized according to the resolution of the images.
+    
+    Headers are read concurrently beforehand (see :func:`.read_jpeg_infos`).
+    Unless *inline* is :data:`True`, image data is not loaded into memory, but read from the files when the document is saved or rendered.
+    Files are then accessed through a pool of at most *max_open_files* handles, so large batches do not run out of file descriptors.
+    
+    Parameters:
+        paths (typing.Sequence[str]):
+            Paths of the JPEG files.
+        dpi (float | None):
+            Resolution to use for all images. If :data:`None`, the resolution of each image's JFIF header is used.
+        default_dpi (float):
+            Resolution to use for images that do not specify one.
+        inline (bool):
+            Whether to load the image data into memory rather than referencing the files.
+        max_open_files (int):
+            Maximum number of file handles to keep open at a time (if not *inline*).
+        n_threads (int | None):
+            Number of threads to read headers with.
+    Returns:
+        PdfDocument: The new document. The files must not be changed or removed until the document is closed.
+    """
+    infos = read_jpeg_infos(paths, n_threads=n_threads)
+    return _build_pdf(infos, dpi, default_dpi, inline, max_open_files)
+
+
+def images_to_pdf(paths, dpi=None, default_dpi=72, inline=False, max_open_files=32, n_threads=None):
+    """
+    *Requires* :mod:`PIL` for non-JPEG images.
+    
+    Create a document from image files of any format supported by :mod:`PIL`, with one page per image frame (e. g. for multi-page TIFFs).
+    
+    JPEG files are embedded without re-encoding, as in :func:`.jpegs_to_pdf`.
+    Other images are decoded concurrently in a thread pool and set as raw bitmaps (see :meth:`.PdfImageObject.set_bitmap`),
+    while pages are being added for the images decoded so far.
+    
+    Parameters:
+        paths (typing.Sequence[str]):
+            Paths of the image files.
+        dpi (float | None):
+            Resolution to use for all images. If :data:`None`, the resolution stored in each image is used.
+        default_dpi (float):
+            Resolution to use for images that do not specify one.
+        inline (bool):
+            Whether to load JPEG data into memory rather than referencing the files.
+        max_open_files (int):
+            Maximum number of JPEG file handles to keep open at a time (if not *inline*).
+        n_threads (int | None):
+            Number of threads to prepare images with. If :data:`None`, the number of CPUs is used.
+    Returns:
+        PdfDocument: The new document. Referenced JPEG files must not be changed or removed until the document is closed.
+    """
+    infos = _prepare_images(paths, n_threads)
+    return _build_pdf(infos, dpi, default_dpi, inline, max_open_files)
@@ -0,0 +1,292 @@
+# SPDX-FileCopyrightText: 2022 geisserml <geisserml@gmail.com>
+# SPDX-License-Identifier: Apache-2.0 OR BSD-3-Clause
+
+import ctypes
+import pypdfium2._pypdfium as pdfium
+from pypdfium2._helpers.misc import PdfiumError
+from pypdfium2._helpers.matrix import PdfMatrix
+from pypdfium2._helpers.document import PdfDocument
+
+
+class PdfPlacement:
+    """
+    Placement of a source page in a cell of a sheet.
+    
+    Attributes:
+        index (int | None):
+            Zero-based index of the source page, or :data:`None` to leave the cell blank.
+        box (typing.Tuple[float, float, float, float]):
+            The cell on the sheet (left, bottom, right, top). The trim box of the source page is scaled uniformly to fit the cell, and centered.
+        rotation (int):
+            Clockwise rotation of the page in the cell, in degrees (0, 90, 180, 270). Added to the rotation of the source page itself.
+        bleed (float):
+            Width of the margin around the source trim box that is shown beyond the cell, in units of the source page (limited to the media box).
+            Other content is clipped. Bleeds are not clipped against neighbouring cells, so they overlap if they exceed half the gutter.
+    """
+    
+    __slots__ = ("index", "box", "rotation", "bleed")
+    
+    def __init__(self, index, box, rotation=0, bleed=0):
+        if rotation not in (0, 90, 180, 270):
+            raise ValueError("Invalid rotation %s (must be 0, 90, 180 or 270)." % rotation)
+        self.index = index
+        self.box = box
+        self.rotation = rotation
+        self.bleed = bleed
+
+
+class PdfSheet:
+    """
+    An output page of an imposition.
+    
+    Attributes:
+        width (float): Sheet width.
+        height (float): Sheet height.
+        placements (typing.List[PdfPlacement]): The source pages on the sheet.
+    """
+    
+    __slots__ = ("width", "height", "placements")
+    
+    def __init__(self, width, height, placements):
+        self.width = width
+        self.height = height
+        self.placements = placements
+
+
+def _get_cells(sheet_size, rows, cols, margin, gutter):
+    # cell boxes in reading order (row by row, starting at the top left corner)
+    width, height = sheet_size
+    cell_w = (width - 2*margin - (cols-1)*gutter) / cols
+    cell_h = (height - 2*margin - (rows-1)*gutter) / rows
+    if cell_w <= 0 or cell_h <= 0:
+        raise ValueError("Margin and gutter exceed the sheet size.")
+    cells = []
+    for row in range(rows):
+        top = height - margin - row * (cell_h + gutter)
+        for col in range(cols):
+            left = margin + col * (cell_w + gutter)
+            cells.append( (left, top - cell_h, left + cell_w, top) )
+    return cells
+
+
+def _get_rotations(rotations, n_cells):
+    if isinstance(rotations, int):
+        return [rotations] * n_cells
+    if len(rotations) != n_cells:
+        raise ValueError("Got %s rotations for %s cells." % (len(rotations), n_cells))
+    return list(rotations)
+
+
+def grid_layout(n_pages, sheet_size, rows, cols, margin=0, gutter=0, rotations=0, bleed=0):
+    """
+    Place consecutive pages in a grid (N-up), like :func:`FPDF_ImportNPagesToOne`, but with margins, bleeds and rotation.
+    
+    Parameters:
+        n_pages (int):
+            Number of source pages.
+        sheet_size (typing.Tuple[float, float]):
+            Width and height of the sheets.
+        rows (int):
+            Number of rows per sheet.
+        cols (int):
+            Number of columns per sheet.
+        margin (float):
+            Distance between the cells and the sheet edges.
+        gutter (float):
+            Distance between adjacent cells.
+        rotations (int | typing.Sequence[int]):
+            Rotation for all cells, or one rotation per cell in reading order (e. g. for head-to-head layouts).
+        bleed (float):
+            Bleed to show around each page (see :class:`.PdfPlacement`).
+    Yields:
+        :class:`.PdfSheet`: The sheets, filled in reading order.
+    """
+    cells = _get_cells(sheet_size, rows, cols, margin, gutter)
+    rotations = _get_rotations(rotations, len(cells))
+    for start in range(0, n_pages, len(cells)):
+        placements = [
+            PdfPlacement(index, box, rotation, bleed)
+            for index, box, rotation in zip(range(start, min(start+len(cells), n_pages)), cells, rotations)
+        ]
+        yield PdfSheet(*sheet_size, placements)
+
+
+def step_repeat_layout(n_pages, sheet_size, rows, cols, margin=0, gutter=0, rotations=0, bleed=0):
+    """
+    Fill one sheet per source page with copies of the page (step and repeat, e. g. for labels or business cards).
+    Parameters are the same as for :func:`.grid_layout`.
+    
+    Yields:
+        :class:`.PdfSheet`: The sheets, in order of the source pages.
+    """
+    cells = _get_cells(sheet_size, rows, cols, margin, gutter)
+    rotations = _get_rotations(rotations, len(cells))
+    for index in range(n_pages):
+        placements = [PdfPlacement(index, box, rotation, bleed) for box, rotation in zip(cells, rotations)]
+        yield PdfSheet(*sheet_size, placements)
+
+
+def booklet_layout(n_pages, sheet_size, signature_size=None, margin=0, gutter=0, bleed=0):
+    """
+    Arrange pages for saddle-stitched booklets: two pages side by side on each sheet, so that the printed sheets can be folded in the middle and nested.
+    Each physical sheet takes two sheets of output (front and back), to be printed duplex, flipped on the short edge.
+    Missing pages are left blank.
+    
+    Parameters:
+        n_pages (int):
+            Number of source pages.
+        sheet_size (typing.Tuple[float, float]):
+            Width and height of the (unfolded) sheets.
+        signature_size (int | None):
+            If given, split the document into signatures of this many pages (multiple of 4), each of which is folded separately and bound in order.
+            Otherwise, the whole document is one signature.
+        margin (float):
+            Distance between the pages and the sheet edges.
+        gutter (float):
+            Distance between the pages at the fold.
+        bleed (float):
+            Bleed to show around each page (see :class:`.PdfPlacement`).
+    Yields:
+        :class:`.PdfSheet`: The sheets, alternating between front and back.
+    """
+    
+    total = n_pages + (-n_pages % 4)
+    if signature_size is None:
+        signature_size = total
+    elif signature_size <= 0 or signature_size % 4 != 0:
+        raise ValueError("Signature size must be a positive multiple of 4.")
+    
+    left, right = _get_cells(sheet_size, 1, 2, margin, gutter)
+    indices = list(range(n_pages)) + [None] * (total - n_pages)
+    
+    for offset in range(0, total, signature_size):
+        size = min(signature_size, total - offset)
+        last = offset + size - 1
+        for s in range(size // 4):
+            yield PdfSheet(*sheet_size, [
+                PdfPlacement(indices[last - 2*s], left, bleed=bleed),
+                PdfPlacement(indices[offset + 2*s], right, bleed=bleed),
+            ])
+            yield PdfSheet(*sheet_size, [
+                PdfPlacement(indices[offset + 2*s + 1], left, bleed=bleed),
+                PdfPlacement(indices[last - 2*s - 1], right, bleed=bleed),
+            ])
+
+
+def _import_page(src_pdf, index, scratch_pdf, scratch_pages):
+    
+    # Copy a source page into the scratch document once, and remember its properties before any crop box is changed.
+    # This way, the source document is never modified.
+    
+    index = src_pdf._handle_index(index)
+    if index not in scratch_pages:
+        scratch_index = len(scratch_pdf)
+        success = pdfium.FPDF_ImportPagesByIndex(scratch_pdf.raw, src_pdf.raw, (ctypes.c_int * 1)(index), 1, scratch_index)
+        if not success:
+            raise PdfiumError("Failed to import page %s." % index)
+        page = scratch_pdf.get_page(scratch_index)
+        scratch_pages[index] = (scratch_index, page.get_rotation(), page.get_mediabox(), page.get_trimbox())
+        page.close()
+    
+    return scratch_pages[index]
+
+
+def _capture_page(src_pdf, index, bleed, dest_pdf, scratch_pdf, scratch_pages):
+    
+    # Capture a page as XObject, clipped to its trim box plus bleed. PDFium uses the crop box of the source page as bounding box of the XObject,
+    # with the origin at the bottom left corner of the crop box, so the crop box of the copy in the scratch document is set to the area in question.
+    
+    scratch_index, rotation, mediabox, trimbox = _import_page(src_pdf, index, scratch_pdf, scratch_pages)
+    media_l, media_b, media_r, media_t = mediabox
+    trim_l, trim_b, trim_r, trim_t = trimbox
+    crop = (
+        max(trim_l - bleed, media_l),
+        max(trim_b - bleed, media_b),
+        min(trim_r + bleed, media_r),
+        min(trim_t + bleed, media_t),
+    )
+    page = scratch_pdf.get_page(scratch_index)
+    try:
+        page.set_cropbox(*crop)
+    finally:
+        page.close()
+    xobject = scratch_pdf.page_as_xobject(scratch_index, dest_pdf)
+    
+    # trim box relative to the origin of the XObject
+    trim_box = (trim_l - crop[0], trim_b - crop[1], trim_r - crop[0], trim_t - crop[1])
+    return xobject, trim_box, rotation
+
+
+def _get_placement_matrix(placement, trim_box, src_rotation):
+    
+    trim_l, trim_b, trim_r, trim_t = trim_box
+    trim_w, trim_h = trim_r - trim_l, trim_t - trim_b
+    rotation = (placement.rotation + src_rotation) % 360
+    if rotation in (90, 270):
+        trim_w, trim_h = trim_h, trim_w
+    
+    cell_l, cell_b, cell_r, cell_t = placement.box
+    scale = min( (cell_r - cell_l) / trim_w, (cell_t - cell_b) / trim_h )
+    
+    # move the center of the trim box to the origin, then rotate and scale around it, and move it to the center of the cell
+    matrix = PdfMatrix()
+    matrix.translate(-(trim_l + trim_r) / 2, -(trim_b + trim_t) / 2)
+    matrix.rotate(rotation)
+    matrix.scale(scale, scale)
+    matrix.translate((cell_l + cell_r) / 2, (cell_b + cell_t) / 2)
+    return matrix
+
+
+def impose(src_pdf, sheets, dest_pdf=None):
+    """
+    Compose pages of a document onto sheets, using Form XObjects.
+    
+    Each source page is captured once per bleed, even if it is placed many times, so its content is stored only once in the output.
+    The source document is not modified: pages are copied into a temporary document, where their crop box is set to the trim box plus bleed for capturing.
+    
+    Sheets are consumed one at a time and their pages are closed after generating the content,
+    so lazy layouts like :func:`.grid_layout` do not cause page helpers to pile up.
+    
+    Note:
+        The output is not streamed to disk: the destination document, including all sheets and captured pages, stays in memory until it is saved,
+        as PDFium cannot write a document incrementally. The temporary document additionally holds one copy of each placed source page.
+        For very large impositions, consider splitting the layout into several calls with separate destination documents.
+    
+    Parameters:
+        src_pdf (PdfDocument):
+            The document to impose.
+        sheets (typing.Iterable[PdfSheet]):
+            The layout, e. g. from :func:`.grid_layout`, :func:`.step_repeat_layout` or :func:`.booklet_layout`.
+        dest_pdf (PdfDocument | None):
+            The document to add the sheets to. If :data:`None`, a new document is created.
+    Returns:
+        PdfDocument: The document with the sheets.
+    """
+    
+    if dest_pdf is None:
+        dest_pdf = PdfDocument.new()
+    
+    scratch_pdf = PdfDocument.new()
+    scratch_pages = {}
+    captures = {}
+    try:
+        for sheet in sheets:
+            page = dest_pdf.new_page(sheet.width, sheet.height)
+            for placement in sheet.placements:
+                if placement.index is None:
+                    continue
+                key = (placement.index, placement.bleed)
+                if key not in captures:
+                    captures[key] = _capture_page(src_pdf, placement.index, placement.bleed, dest_pdf, scratch_pdf, scratch_pages)
+                xobject, trim_box, src_rotation = captures[key]
+                pageobj = xobject.as_pageobject()
+                pageobj.set_matrix( _get_placement_matrix(placement, trim_box, src_rotation) )
+                page.insert_object(pageobj)
+            page.generate_content()
+            page.close()
+    finally:
+        for xobject, _, _ in captures.values():
+            xobject.close()
+        scratch_pdf.close()
+    
+    return dest_pdf
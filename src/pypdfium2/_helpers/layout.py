@@ -0,0 +1,346 @@
+# SPDX-FileCopyrightText: 2022 geisserml <geisserml@gmail.com>
+# SPDX-License-Identifier: Apache-2.0 OR BSD-3-Clause
+
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+#: Codepoints that separate words and are not part of the layout.
+WhitespaceCodepoints = (0x09, 0x0A, 0x0B, 0x0C, 0x0D, 0x20, 0xA0, 0x2002, 0x2003, 0x2009, 0x200B, 0x3000, 0xFFFE)
+
+
+class TextLayout:
+    """
+    Spatial grouping of the characters on a text page into words, lines, blocks and columns.
+    Use :meth:`.PdfTextPage.get_layout` to create a layout.
+    
+    Each level is stored as NumPy structured array with a ``box`` field (left, bottom, right, top),
+    and fields that reference the previous level as contiguous span.
+    
+    Attributes:
+        words (numpy.ndarray):
+            Fields ``index`` and ``count`` (character span on the text page), ``box``, and ``line``.
+        lines (numpy.ndarray):
+            Fields ``word_index`` and ``n_words`` (span in :attr:`.words`), ``box``, and ``block``.
+        blocks (numpy.ndarray):
+            Fields ``line_index`` and ``n_lines`` (span in :attr:`.lines`), ``box``, and ``column``.
+        columns (numpy.ndarray):
+            Field ``box``. Columns are sorted from left to right.
+    """
+    
+    def __init__(self, chars, words, lines, blocks, columns):
+        self._chars = chars
+        self.words = words
+        self.lines = lines
+        self.blocks = blocks
+        self.columns = columns
+    
+    def get_word_text(self, index):
+        """
+        Returns:
+            str: The text of the word at *index*.
+        """
+        word = self.words[index]
+        start = word["index"]
+        return "".join( chr(c) for c in self._chars["unicode"][start:start+word["count"]] )
+    
+    def get_line_text(self, index):
+        """
+        Returns:
+            str: The text of the line at *index*, with words separated by a single space.
+        """
+        line = self.lines[index]
+        start = line["word_index"]
+        return " ".join( self.get_word_text(i) for i in range(start, start+line["n_words"]) )
+
+
+def _group_boxes(boxes, starts):
+    # Merge boxes (left, bottom, right, top) of consecutive groups beginning at *starts*.
+    merged = numpy.empty((len(starts), 4), dtype=numpy.float64)
+    merged[:, 0] = numpy.minimum.reduceat(boxes[:, 0], starts)
+    merged[:, 1] = numpy.minimum.reduceat(boxes[:, 1], starts)
+    merged[:, 2] = numpy.maximum.reduceat(boxes[:, 2], starts)
+    merged[:, 3] = numpy.maximum.reduceat(boxes[:, 3], starts)
+    return merged
+
+
+def _starts_from_breaks(breaks):
+    # *breaks* tells for each item except the first whether it opens a new group
+    return numpy.concatenate( ([0], numpy.flatnonzero(breaks) + 1) )
+
+
+def _group_ids(starts, n_items):
+    ids = numpy.zeros(n_items, dtype=numpy.int32)
+    ids[starts[1:]] = 1
+    return numpy.cumsum(ids, dtype=numpy.int32)
+
+
+def _vertical_overlap(boxes):
+    # overlap of consecutive boxes, relative to the smaller height
+    heights = boxes[:, 3] - boxes[:, 1]
+    overlap = numpy.minimum(boxes[1:, 3], boxes[:-1, 3]) - numpy.maximum(boxes[1:, 1], boxes[:-1, 1])
+    min_height = numpy.maximum(numpy.minimum(heights[1:], heights[:-1]), 1e-6)
+    return overlap / min_height, heights
+
+
+def build_layout(chars, word_gap=0.25, line_gap=1.5, block_gap=0.8):
+    """
+    Group characters into words, lines, blocks and columns.
+    
+    Grouping follows the character order of the text page and compares neighbours only, so the runtime is linear in the number of characters,
+    except for sorting blocks into columns.
+    
+    Parameters:
+        chars (numpy.ndarray):
+            Character array as returned by :meth:`.PdfTextPage.get_chars_array`.
+        word_gap (float):
+            Horizontal gap between two characters, relative to their height, above which a new word is started.
+        line_gap (float):
+            Horizontal gap between two words, relative to their height, above which a new line is started (e. g. at column boundaries).
+        block_gap (float):
+            Vertical gap between two lines, relative to their height, above which a new block is started.
+    Returns:
+        TextLayout: The layout.
+    """
+    
+    if numpy is None:
+        raise RuntimeError("NumPy library needs to be installed for text layout analysis.")
+    
+    word_dtype = [("index", numpy.int32), ("count", numpy.int32), ("box", numpy.float64, (4, )), ("line", numpy.int32)]
+    line_dtype = [("word_index", numpy.int32), ("n_words", numpy.int32), ("box", numpy.float64, (4, )), ("block", numpy.int32)]
+    block_dtype = [("line_index", numpy.int32), ("n_lines", numpy.int32), ("box", numpy.float64, (4, )), ("column", numpy.int32)]
+    column_dtype = [("box", numpy.float64, (4, ))]
+    
+    boxes = chars["loose_box"]
+    is_content = ~numpy.isin(chars["unicode"], WhitespaceCodepoints)
+    is_content &= ~numpy.isnan(boxes).any(axis=1)
+    char_indices = numpy.flatnonzero(is_content)
+    
+    if len(char_indices) == 0:
+        return TextLayout(
+            chars,
+            numpy.empty(0, dtype=word_dtype),
+            numpy.empty(0, dtype=line_dtype),
+            numpy.empty(0, dtype=block_dtype),
+            numpy.empty(0, dtype=column_dtype),
+        )
+    
+    # words: break at whitespace, at large horizontal gaps and where the vertical position changes
+    c_boxes = boxes[char_indices]
+    overlap, heights = _vertical_overlap(c_boxes)
+    gap = c_boxes[1:, 0] - c_boxes[:-1, 2]
+    max_height = numpy.maximum(heights[1:], heights[:-1])
+    # (comparing left edges for backward movement, as the characters of a ligature share one box)
+    backwards = c_boxes[1:, 0] < c_boxes[:-1, 0] - 0.5 * max_height
+    word_breaks = (
+        (char_indices[1:] != char_indices[:-1] + 1) |
+        (overlap < 0.5) |
+        (gap > word_gap * max_height) |
+        backwards
+    )
+    word_starts = _starts_from_breaks(word_breaks)
+    word_ends = numpy.append(word_starts[1:], len(char_indices)) - 1
+    w_boxes = _group_boxes(c_boxes, word_starts)
+    
+    # lines: break where the vertical position changes, where text runs backwards, or at large horizontal gaps
+    overlap, heights = _vertical_overlap(w_boxes)
+    gap = w_boxes[1:, 0] - w_boxes[:-1, 2]
+    max_height = numpy.maximum(heights[1:], heights[:-1])
+    backwards = w_boxes[1:, 0] < w_boxes[:-1, 0] - 0.5 * max_height
+    line_breaks = (overlap < 0.5) | backwards | (gap > line_gap * max_height)
+    line_starts = _starts_from_breaks(line_breaks)
+    l_boxes = _group_boxes(w_boxes, line_starts)
+    
+    # blocks: break at large vertical gaps, when moving upwards, or if lines do not overlap horizontally
+    heights = l_boxes[:, 3] - l_boxes[:, 1]
+    v_gap = l_boxes[:-1, 1] - l_boxes[1:, 3]
+    h_overlap = numpy.minimum(l_boxes[1:, 2], l_boxes[:-1, 2]) - numpy.maximum(l_boxes[1:, 0], l_boxes[:-1, 0])
+    max_height = numpy.maximum(heights[1:], heights[:-1])
+    block_breaks = (v_gap > block_gap * max_height) | (v_gap < -0.5 * max_height) | (h_overlap <= 0)
+    block_starts = _starts_from_breaks(block_breaks)
+    b_boxes = _group_boxes(l_boxes, block_starts)
+    
+    # columns: sweep over blocks sorted by left edge and merge horizontally overlapping ones
+    order = numpy.argsort(b_boxes[:, 0], kind="stable")
+    sorted_boxes = b_boxes[order]
+    reach = numpy.maximum.accumulate(sorted_boxes[:, 2])
+    column_starts = _starts_from_breaks(sorted_boxes[1:, 0] > reach[:-1])
+    col_boxes = _group_boxes(sorted_boxes, column_starts)
+    block_columns = numpy.empty(len(b_boxes), dtype=numpy.int32)
+    block_columns[order] = _group_ids(column_starts, len(b_boxes))
+    
+    words = numpy.empty(len(word_starts), dtype=word_dtype)
+    words["index"] = char_indices[word_starts]
+    words["count"] = char_indices[word_ends] - char_indices[word_starts] + 1
+    words["box"] = w_boxes
+    words["line"] = _group_ids(line_starts, len(word_starts))
+    
+    lines = numpy.empty(len(line_starts), dtype=line_dtype)
+    lines["word_index"] = line_starts
+    lines["n_words"] = numpy.diff( numpy.append(line_starts, len(word_starts)) )
+    lines["box"] = l_boxes
+    lines["block"] = _group_ids(block_starts, len(line_starts))
+    
+    blocks = numpy.empty(len(block_starts), dtype=block_dtype)
+    blocks["line_index"] = block_starts
+    blocks["n_lines"] = numpy.diff( numpy.append(block_starts, len(line_starts)) )
+    blocks["box"] = b_boxes
+    blocks["column"] = block_columns
+    
+    columns = numpy.empty(len(column_starts), dtype=column_dtype)
+    columns["box"] = col_boxes
+    
+    return TextLayout(chars, words, lines, blocks, columns)
+
+
+class CharSpatialIndex:
+    """
+    Uniform grid index over the character boxes of a text page, for fast point, region and nearest-neighbour queries.
+    Use :meth:`.PdfTextPage.get_spatial_index` to create an index.
+    
+    Whitespace characters and characters without box are not indexed.
+    Queries return sorted NumPy arrays of character indices, which may be turned into spans with :meth:`.to_spans`.
+    
+    Parameters:
+        chars (numpy.ndarray):
+            Character array as returned by :meth:`.PdfTextPage.get_chars_array`.
+        loose (bool):
+            Whether to index loose rather than tight character boxes.
+        cell_size (float | None):
+            Edge length of grid cells in PDF canvas units. Defaults to the median character height.
+    """
+    
+    def __init__(self, chars, loose=True, cell_size=None):
+        
+        if numpy is None:
+            raise RuntimeError("NumPy library needs to be installed for the spatial character index.")
+        
+        boxes = chars["loose_box" if loose else "box"]
+        is_content = ~numpy.isin(chars["unicode"], WhitespaceCodepoints)
+        is_content &= ~numpy.isnan(boxes).any(axis=1)
+        self._indices = numpy.flatnonzero(is_content)
+        self._boxes = boxes[self._indices]
+        
+        n_items = len(self._indices)
+        if n_items == 0:
+            self._n_cols, self._n_rows = 0, 0
+            return
+        
+        if cell_size is None:
+            cell_size = float( numpy.median(self._boxes[:, 3] - self._boxes[:, 1]) )
+        self._cell_size = max(cell_size, 1.0)
+        self._origin = (self._boxes[:, 0].min(), self._boxes[:, 1].min())
+        
+        x0, y0, x1, y1 = self._cell_range(self._boxes[:, 0], self._boxes[:, 1], self._boxes[:, 2], self._boxes[:, 3])
+        self._n_cols = int(x1.max()) + 1
+        self._n_rows = int(y1.max()) + 1
+        
+        # expand each character to the cells it covers, then sort by cell to get a compressed cell -> characters mapping
+        widths = x1 - x0 + 1
+        counts = widths * (y1 - y0 + 1)
+        owners = numpy.repeat(numpy.arange(n_items), counts)
+        offsets = numpy.arange(len(owners)) - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+        cells = (y0[owners] + offsets // widths[owners]) * self._n_cols + (x0[owners] + offsets % widths[owners])
+        
+        order = numpy.argsort(cells, kind="stable")
+        self._cell_items = owners[order]
+        self._cell_starts = numpy.searchsorted(cells[order], numpy.arange(self._n_cols * self._n_rows + 1))
+    
+    def __len__(self):
+        return len(self._indices)
+    
+    def _cell_range(self, left, bottom, right, top):
+        x0 = numpy.floor( (left - self._origin[0]) / self._cell_size ).astype(numpy.int64)
+        y0 = numpy.floor( (bottom - self._origin[1]) / self._cell_size ).astype(numpy.int64)
+        x1 = numpy.floor( (right - self._origin[0]) / self._cell_size ).astype(numpy.int64)
+        y1 = numpy.floor( (top - self._origin[1]) / self._cell_size ).astype(numpy.int64)
+        return x0, y0, x1, y1
+    
+    def _candidates(self, left, bottom, right, top):
+        
+        # scalar arithmetic is considerably faster than NumPy for single values
+        origin_x, origin_y = self._origin
+        x0 = max(math.floor( (left - origin_x) / self._cell_size ), 0)
+        y0 = max(math.floor( (bottom - origin_y) / self._cell_size ), 0)
+        x1 = min(math.floor( (right - origin_x) / self._cell_size ), self._n_cols-1)
+        y1 = min(math.floor( (top - origin_y) / self._cell_size ), self._n_rows-1)
+        if x0 > x1 or y0 > y1:
+            return numpy.empty(0, dtype=numpy.int64)
+        
+        # cells of a row are adjacent in the compressed mapping
+        starts = self._cell_starts
+        if y0 == y1:
+            candidates = self._cell_items[ starts[y0*self._n_cols + x0] : starts[y0*self._n_cols + x1 + 1] ]
+            if x0 == x1:
+                return candidates
+        else:
+            candidates = numpy.concatenate([
+                self._cell_items[ starts[row*self._n_cols + x0] : starts[row*self._n_cols + x1 + 1] ]
+                for row in range(y0, y1+1)
+            ])
+        return numpy.unique(candidates)
+    
+    def in_rect(self, left, bottom, right, top, contained=False):
+        """
+        Parameters:
+            contained (bool):
+                If :data:`True`, only include characters that lie completely inside the rectangle.
+                Otherwise, include all characters that intersect with it.
+        Returns:
+            numpy.ndarray: Indices of the characters in the rectangle (left, bottom, right, top).
+        """
+        if len(self) == 0:
+            return numpy.empty(0, dtype=numpy.int64)
+        candidates = self._candidates(left, bottom, right, top)
+        boxes = self._boxes[candidates]
+        if contained:
+            mask = (boxes[:, 0] >= left) & (boxes[:, 1] >= bottom) & (boxes[:, 2] <= right) & (boxes[:, 3] <= top)
+        else:
+            mask = (boxes[:, 0] <= right) & (boxes[:, 1] <= top) & (boxes[:, 2] >= left) & (boxes[:, 3] >= bottom)
+        return self._indices[ candidates[mask] ]
+    
+    def at_point(self, x, y, tolerance=0):
+        """
+        Returns:
+            numpy.ndarray: Indices of the characters whose box contains the point (x, y), with the box enlarged by *tolerance* on each side.
+        """
+        return self.in_rect(x-tolerance, y-tolerance, x+tolerance, y+tolerance)
+    
+    def nearest(self, x, y, k=1):
+        """
+        Returns:
+            numpy.ndarray: Indices of the *k* characters closest to the point (x, y), ordered by distance to their box.
+        """
+        
+        k = min(k, len(self))
+        if k < 1:
+            return numpy.empty(0, dtype=numpy.int64)
+        
+        dx = numpy.maximum( numpy.maximum(self._boxes[:, 0] - x, x - self._boxes[:, 2]), 0 )
+        dy = numpy.maximum( numpy.maximum(self._boxes[:, 1] - y, y - self._boxes[:, 3]), 0 )
+        distances = dx*dx + dy*dy
+        
+        if k < len(distances):
+            selection = numpy.argpartition(distances, k-1)[:k]
+        else:
+            selection = numpy.arange(len(distances))
+        selection = selection[ numpy.argsort(distances[selection], kind="stable") ]
+        return self._indices[selection]
+    
+    @staticmethod
+    def to_spans(indices):
+        """
+        Parameters:
+            indices (numpy.ndarray): Sorted character indices, as returned by the query methods.
+        Returns:
+            typing.List[typing.Tuple[int, int]]: Spans of consecutive indices, given as (index, count).
+        """
+        if len(indices) == 0:
+            return []
+        starts = _starts_from_breaks( numpy.diff(indices) != 1 )
+        ends = numpy.append(starts[1:], len(indices))
+        return [(int(indices[s]), int(e - s)) for s, e in zip(starts, ends)]
@@ -3,6 +3,12 @@
 
 import math
 import pypdfium2._pypdfium as pdfium
+from pypdfium2._helpers.misc import _lean_helpers
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 class PdfMatrix:
@@ -26,6 +32,9 @@ class PdfMatrix:
     
     # The effect of applying the matrix on a vector (x, y) is (ax+cy+e, bx+dy+f)
     
+    if _lean_helpers:
+        __slots__ = ("a", "b", "c", "d", "e", "f")
+    
     def __init__(self, a=1, b=0, c=0, d=1, e=0, f=0):
         self.set(a, b, c, d, e, f)
     
@@ -147,3 +156,184 @@ class PdfMatrix:
         tan_a = math.tan((x_angle/180) * math.pi)
         tan_b = math.tan((y_angle/180) * math.pi)
         self.multiply( PdfMatrix(1, tan_a, tan_b, 1) )
+
+
+class PdfMatrixArray:
+    """
+    *Requires* :mod:`numpy`
+    
+    Array of PDF transformation matrices, to compose and apply many transformations at once.
+    Methods correspond to :class:`.PdfMatrix`, but are vectorised: parameters may be scalars, which apply to all matrices,
+    or arrays with one value per matrix. A single-matrix array is broadcast against multiple values.
+    
+    Parameters:
+        array (numpy.ndarray | typing.Sequence):
+            Matrix values of shape ``(n, 6)`` (or ``(6, )`` for a single matrix), with rows of the form (a, b, c, d, e, f). The values are copied.
+    Attributes:
+        array (numpy.ndarray): The matrix values, as ``float64`` array of shape ``(n, 6)``.
+    """
+    
+    __slots__ = ("array", )
+    
+    def __init__(self, array):
+        if numpy is None:
+            raise RuntimeError("NumPy library needs to be installed for PdfMatrixArray.")
+        array = numpy.array(array, dtype=numpy.float64)
+        if array.ndim == 1:
+            array = array[numpy.newaxis]
+        if array.ndim != 2 or array.shape[1] != 6:
+            raise ValueError("Matrix array must be of shape (n, 6), got %s." % (array.shape, ))
+        self.array = array
+    
+    def __len__(self):
+        return len(self.array)
+    
+    def __getitem__(self, index):
+        return PdfMatrix( *self.array[index].tolist() )
+    
+    def __repr__(self):
+        return "PdfMatrixArray(n=%s)" % len(self)
+    
+    @classmethod
+    def identity(cls, n):
+        """
+        Returns:
+            PdfMatrixArray: *n* identity matrices.
+        """
+        return cls( numpy.tile([1., 0., 0., 1., 0., 0.], (n, 1)) )
+    
+    @classmethod
+    def from_matrices(cls, matrices):
+        """
+        Parameters:
+            matrices (typing.Iterable[PdfMatrix]): The matrices to combine.
+        Returns:
+            PdfMatrixArray: An array of the matrices' values.
+        """
+        return cls([m.get() for m in matrices])
+    
+    def to_matrices(self):
+        """
+        Returns:
+            typing.List[PdfMatrix]: The matrices as individual :class:`.PdfMatrix` objects.
+        """
+        return [PdfMatrix(*values) for values in self.array.tolist()]
+    
+    def copy(self):
+        """
+        Returns:
+            An independent copy of the matrix array.
+        """
+        return PdfMatrixArray(self.array)
+    
+    def _multiply_values(self, a, b, c, d, e, f):
+        # same as PdfMatrix.multiply(), on columns, broadcasting the result to (n, 6)
+        a1, b1, c1, d1, e1, f1 = self.array.T
+        columns = numpy.broadcast_arrays(
+            a1*a + b1*c,
+            a1*b + b1*d,
+            c1*a + d1*c,
+            c1*b + d1*d,
+            e1*a + f1*c + e,
+            e1*b + f1*d + f,
+        )
+        self.array = numpy.stack(columns, axis=1)
+    
+    def multiply(self, other):
+        """
+        Multiply these matrices by other matrices, to concatenate transformations.
+        
+        Parameters:
+            other (PdfMatrix | PdfMatrixArray):
+                A single matrix to apply to all matrices, or an array with one matrix per matrix of this array.
+        """
+        if isinstance(other, PdfMatrix):
+            self._multiply_values(*other.get())
+        else:
+            self._multiply_values(*other.array.T)
+    
+    def translate(self, x, y):
+        """
+        See :meth:`.PdfMatrix.translate`.
+        """
+        self._multiply_values(1, 0, 0, 1, numpy.asarray(x), numpy.asarray(y))
+    
+    def scale(self, x, y):
+        """
+        See :meth:`.PdfMatrix.scale`.
+        """
+        self._multiply_values(numpy.asarray(x), 0, 0, numpy.asarray(y), 0, 0)
+    
+    def rotate(self, angle):
+        """
+        See :meth:`.PdfMatrix.rotate`.
+        """
+        angle = numpy.radians(angle)
+        c, s = numpy.cos(angle), numpy.sin(angle)
+        self._multiply_values(c, -s, s, c, 0, 0)
+    
+    def mirror(self, vertical, horizontal):
+        """
+        See :meth:`.PdfMatrix.mirror`.
+        """
+        s_x = numpy.where(vertical, -1, 1)
+        s_y = numpy.where(horizontal, -1, 1)
+        self.scale(s_x, s_y)
+    
+    def skew(self, x_angle, y_angle):
+        """
+        See :meth:`.PdfMatrix.skew`.
+        """
+        tan_a = numpy.tan( numpy.radians(x_angle) )
+        tan_b = numpy.tan( numpy.radians(y_angle) )
+        self._multiply_values(1, tan_a, tan_b, 1, 0, 0)
+    
+    def inverse(self):
+        """
+        Returns:
+            PdfMatrixArray: The inverse matrices. Rows of matrices that are not invertible are NaN.
+        """
+        a, b, c, d, e, f = self.array.T
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            det = a*d - b*c
+            det = numpy.where(det == 0, numpy.nan, det)
+            inverse = numpy.stack([d, -b, -c, a, c*f - d*e, b*e - a*f], axis=1) / det[:, numpy.newaxis]
+        return PdfMatrixArray(inverse)
+    
+    def transform_points(self, points):
+        """
+        Parameters:
+            points (numpy.ndarray | typing.Sequence):
+                Coordinates of shape ``(..., 2)``. If the array holds more than one matrix, the first dimension must correspond to the matrices,
+                e. g. ``(n, 2)`` for one point per matrix or ``(n, k, 2)`` for *k* points per matrix.
+        Returns:
+            numpy.ndarray: The transformed coordinates.
+        """
+        points = numpy.asarray(points, dtype=numpy.float64)
+        x, y = points[..., 0], points[..., 1]
+        if len(self) == 1:
+            a, b, c, d, e, f = self.array[0]
+        else:
+            a, b, c, d, e, f = self.array.T.reshape( (6, len(self)) + (1, ) * max(x.ndim-1, 0) )
+        return numpy.stack([a*x + c*y + e, b*x + d*y + f], axis=-1)
+    
+    def transform_boxes(self, boxes):
+        """
+        Parameters:
+            boxes (numpy.ndarray | typing.Sequence):
+                Rectangles of shape ``(..., 4)`` with left, bottom, right and top coordinates. The first dimension corresponds to the matrices as for :meth:`.transform_points`.
+        Returns:
+            numpy.ndarray: The enclosing axis-aligned rectangles of the transformed boxes.
+        """
+        boxes = numpy.asarray(boxes, dtype=numpy.float64)
+        if boxes.ndim == 1 and len(self) > 1:
+            boxes = numpy.broadcast_to(boxes, (len(self), 4))
+        l, b, r, t = boxes[..., 0], boxes[..., 1], boxes[..., 2], boxes[..., 3]
+        corners = numpy.stack([
+            numpy.stack([l, b], axis=-1),
+            numpy.stack([l, t], axis=-1),
+            numpy.stack([r, b], axis=-1),
+            numpy.stack([r, t], axis=-1),
+        ], axis=-2)
+        corners = self.transform_points(corners)
+        return numpy.concatenate([corners.min(axis=-2), corners.max(axis=-2)], axis=-1)
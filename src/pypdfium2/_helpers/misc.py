@@ -1,11 +1,18 @@
 # SPDX-FileCopyrightText: 2022 geisserml <geisserml@gmail.com>
 # SPDX-License-Identifier: Apache-2.0 OR BSD-3-Clause
 
+import os
 import enum
 import ctypes
 import pypdfium2._pypdfium as pdfium
 
 
+# Lean mode: if the environment variable PYPDFIUM_LEAN_HELPERS is set to a value other than "0" when pypdfium2 is imported,
+# helper classes of which many instances tend to be created are declared with __slots__, which lowers allocation cost and memory use.
+# Arbitrary attributes cannot be set on instances of these classes in lean mode, so it is opt-in.
+_lean_helpers = os.environ.get("PYPDFIUM_LEAN_HELPERS", "0") not in ("", "0")
+
+
 class PdfiumError (RuntimeError):
     """ An exception from the PDFium library, detected by function return code. """
     pass
@@ -70,6 +77,9 @@ class OutlineItem:
             Depending on *view_mode*, it can contain between 0 and 4 coordinates.
     """
     
+    if _lean_helpers:
+        __slots__ = ("level", "title", "is_closed", "n_kids", "page_index", "view_mode", "view_pos")
+    
     def __init__(
             self,
             level,
@@ -89,6 +99,66 @@ class OutlineItem:
         self.view_pos = view_pos
 
 
+class DocumentInfo:
+    """
+    Class to store summary information about a document, as gathered by :meth:`.PdfDocument.probe`.
+    
+    Parameters:
+        n_pages (int):
+            Number of pages.
+        page_sizes (typing.Sequence[typing.Tuple[float, float]]):
+            Width and height of each page in PDF canvas units.
+        version (int | None):
+            The PDF version (see :meth:`.PdfDocument.get_version`).
+        is_encrypted (bool):
+            Whether the document is protected by a security handler.
+        metadata (typing.Dict[str, str]):
+            Values of the document information dictionary (see :meth:`.PdfDocument.get_metadata_dict`).
+    """
+    
+    if _lean_helpers:
+        __slots__ = ("n_pages", "page_sizes", "version", "is_encrypted", "metadata")
+    
+    def __init__(
+            self,
+            n_pages,
+            page_sizes,
+            version,
+            is_encrypted,
+            metadata,
+        ):
+        self.n_pages = n_pages
+        self.page_sizes = page_sizes
+        self.version = version
+        self.is_encrypted = is_encrypted
+        self.metadata = metadata
+
+
+class WebLink:
+    """
+    Class to store information about a web link detected in the text of a page, as returned by :meth:`.PdfTextPage.get_weblinks`.
+    
+    Parameters:
+        url (str):
+            The URL of the link.
+        index (int):
+            Index of the first character of the link text on the text page.
+        count (int):
+            Number of characters of the link text.
+        rects (typing.Sequence[typing.Tuple[float, float, float, float]]):
+            Bounding boxes (left, bottom, right, top) of the text rectangles covered by the link.
+    """
+    
+    if _lean_helpers:
+        __slots__ = ("url", "index", "count", "rects")
+    
+    def __init__(self, url, index, count, rects):
+        self.url = url
+        self.index = index
+        self.count = count
+        self.rects = rects
+
+
 def colour_tohex(colour, rev_byteorder):
     """
     Convert an RGBA colour specified by 4 integers ranging from 0 to 255 to a single 32-bit integer as required by PDFium.
@@ -196,6 +266,9 @@ BitmapTypeToStr = {
     pdfium.FPDFBitmap_BGRx: "BGRX",
 }
 
+#: Convert a pixel format string in regular byte order to a PDFium pixel format constant.
+BitmapStrToType = _invert_dict(BitmapTypeToStr)
+
 #: Convert a reverse pixel format string to its regular counterpart.
 BitmapStrReverseToRegular = {
     "BGR":  "RGB",
@@ -248,6 +321,9 @@ ObjectTypeToStr = {
 #: Convert an object type string to a PDFium constant. Inversion of :data:`.ObjectTypeToStr`.
 ObjectTypeToConst = _invert_dict(ObjectTypeToStr)
 
+#: Keys of the document information dictionary that may be read with :meth:`.PdfDocument.get_metadata_value`.
+MetadataKeys = ("Title", "Author", "Subject", "Keywords", "Creator", "Producer", "CreationDate", "ModDate")
+
 #: Convert a rotation value in degrees to a PDFium constant.
 RotationToConst = {
     0:   0,
@@ -16,9 +16,11 @@ from pypdfium2._helpers.misc import (
     RotationToDegrees,
     BitmapTypeToStr,
     BitmapTypeToStrReverse,
+    _lean_helpers,
 )
 from pypdfium2._helpers.pageobject import (
     PdfPageObject,
+    PdfPageObjectInventory,
 )
 from pypdfium2._helpers.converters import (
     BitmapConvBase,
@@ -31,9 +33,28 @@ try:
 except ImportError:
     harfbuzz = None
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 logger = logging.getLogger(__name__)
 
 
+def _inverse_transform_bbox(bbox, m):
+    # map a rectangle through the inverse of a matrix, returning the enclosing axis-aligned rectangle (None if not invertible)
+    det = m.a*m.d - m.b*m.c
+    if det == 0:
+        return None
+    l, b, r, t = bbox
+    xs, ys = [], []
+    for x, y in ((l, b), (l, t), (r, b), (r, t)):
+        x, y = x - m.e, y - m.f
+        xs.append( (m.d*x - m.c*y) / det )
+        ys.append( (m.a*y - m.b*x) / det )
+    return (min(xs), min(ys), max(xs), max(ys))
+
+
 class PdfPage (BitmapConvAliases):
     """
     Page helper class.
@@ -43,14 +64,21 @@ class PdfPage (BitmapConvAliases):
         pdf (PdfDocument): Reference to the document this page belongs to.
     """
     
+    if _lean_helpers:
+        __slots__ = ("raw", "pdf", "_finalizer", "__weakref__")
+    
     def __init__(self, raw, pdf):
         self.raw = raw
         self.pdf = pdf
         # if the form env of the parent document is initialised, we could call FORM_OnAfterLoadPage() here
-        self._finalizer = weakref.finalize(
-            self, self._static_close,
-            self.raw, self.pdf,
-        )
+        if pdf._arena is None:
+            self._finalizer = weakref.finalize(
+                self, self._static_close,
+                self.raw, self.pdf,
+            )
+        else:
+            self._finalizer = None
+            pdf._arena.append(self)
     
     def _tree_closed(self):
         if self.raw is None:
@@ -73,7 +101,10 @@ class PdfPage (BitmapConvAliases):
         if self.raw is None:
             logger.warning("Duplicate close call suppressed on page %s" % self)
             return
-        self._finalizer()
+        if self._finalizer is None:
+            self._static_close(self.raw, self.pdf)
+        else:
+            self._finalizer()
         self.raw = None
     
     
@@ -108,6 +139,7 @@ class PdfPage (BitmapConvAliases):
     def set_rotation(self, rotation):
         """ Define the absolute, clockwise page rotation (0, 90, 180, or 270 degrees). """
         pdfium.FPDFPage_SetRotation(self.raw, RotationToConst[rotation])
+        self.pdf._generation += 1
     
     
     def _get_box(self, box_func, fallback_func):
@@ -122,6 +154,7 @@ class PdfPage (BitmapConvAliases):
         if not all(isinstance(val, (int, float)) for val in (l, b, r, t)):
             raise ValueError("Box values must be int or float.")
         box_func(self.raw, l, b, r, t)
+        self.pdf._generation += 1
     
     def get_mediabox(self):
         """
@@ -228,6 +261,7 @@ class PdfPage (BitmapConvAliases):
         success = pdfium.FPDFPage_GenerateContent(self.raw)
         if not success:
             raise PdfiumError("Generating page content failed.")
+        self.pdf._generation += 1
     
     
     def insert_text(
@@ -285,54 +319,161 @@ class PdfPage (BitmapConvAliases):
             start_point += (pos.x_advance / hb_font.scale) * font_size
     
     
-    def get_objects(self, max_depth=2, form=None, level=0):
+    def _walk_objects(self, max_depth, form, level, bbox):
+        
+        # Non-recursive pre-order traversal, using an explicit stack of [parent handle, object count, next index, parent position, level, bbox].
+        # Yields raw handle, type, level and position of the parent among the yielded objects (-1 for objects without yielded parent).
+        # If a bounding box is given, objects not intersecting it are skipped, including the contents of Form XObjects.
+        # Bounds of nested objects are relative to their Form XObject, so the box is mapped into the form's space when descending.
+        
+        if form is None:
+            n_objects = pdfium.FPDFPage_CountObjects(self.raw)
+        else:
+            n_objects = pdfium.FPDFFormObj_CountObjects(form)
+        if n_objects < 0:
+            raise PdfiumError("Failed to get number of page objects.")
+        
+        left, bottom, right, top = c_float(), c_float(), c_float(), c_float()
+        fs_matrix = pdfium.FS_MATRIX()
+        stack = [ [form, n_objects, 0, -1, level, bbox] ]
+        n_yielded = 0
+        
+        while stack:
+            
+            frame = stack[-1]
+            parent, n_objects, i, parent_pos, level, bbox = frame
+            if i >= n_objects:
+                stack.pop()
+                continue
+            frame[2] += 1
+            
+            if parent is None:
+                raw_obj = pdfium.FPDFPage_GetObject(self.raw, i)
+            else:
+                raw_obj = pdfium.FPDFFormObj_GetObject(parent, i)
+            if raw_obj is None:
+                raise PdfiumError("Failed to get page object.")
+            
+            if bbox is not None:
+                if not pdfium.FPDFPageObj_GetBounds(raw_obj, left, bottom, right, top):
+                    continue
+                if left.value > bbox[2] or right.value < bbox[0] or bottom.value > bbox[3] or top.value < bbox[1]:
+                    continue
+            
+            type = pdfium.FPDFPageObj_GetType(raw_obj)
+            yield raw_obj, type, level, parent_pos
+            
+            if level < max_depth-1 and type == pdfium.FPDF_PAGEOBJ_FORM:
+                n_kids = pdfium.FPDFFormObj_CountObjects(raw_obj)
+                if n_kids < 0:
+                    raise PdfiumError("Failed to get number of page objects.")
+                form_bbox = bbox
+                if bbox is not None:
+                    if not pdfium.FPDFPageObj_GetMatrix(raw_obj, fs_matrix):
+                        raise PdfiumError("Failed to get matrix of pageobject.")
+                    form_bbox = _inverse_transform_bbox(bbox, fs_matrix)
+                if form_bbox is not None or bbox is None:
+                    stack.append( [raw_obj, n_kids, 0, n_yielded, level+1, form_bbox] )
+            n_yielded += 1
+    
+    
+    def get_objects(self, max_depth=2, form=None, level=0, types=None, bbox=None, predicate=None):
         """
         Iterate through the page objects on this page.
+        Filters are applied during the traversal, so helper objects are only created for matching page objects.
         
         Parameters:
             max_depth (int):
                 Maximum recursion depth to consider when descending into Form XObjects.
+            types (typing.Collection[int] | None):
+                If given, only yield objects of these types (:data:`FPDF_PAGEOBJ_*`).
+                Form XObjects are still descended into if their type is not included.
+            bbox (typing.Tuple[float, float, float, float] | None):
+                If given, only yield objects whose bounding box intersects this rectangle (left, bottom, right, top in page coordinates).
+                Form XObjects outside the rectangle are not descended into.
+                As nested objects are positioned relative to their Form XObject, the rectangle is mapped into the form's coordinate space for them.
+            predicate (typing.Callable[[FPDF_PAGEOBJECT], bool] | None):
+                If given, only yield objects for whose raw handle this function returns :data:`True`.
+                It is called after the other filters.
         
         Yields:
             :class:`.PdfPageObject`: The page object.
         """
         
-        if form is None:
-            count_objects = pdfium.FPDFPage_CountObjects
-            get_object = pdfium.FPDFPage_GetObject
-            parent = self.raw
-        else:
-            count_objects = pdfium.FPDFFormObj_CountObjects
-            get_object = pdfium.FPDFFormObj_GetObject
-            parent = form
-        
-        n_objects = count_objects(parent)
-        if n_objects == 0:
-            return
-        elif n_objects < 0:
-            raise PdfiumError("Failed to get number of page objects.")
+        if types is not None:
+            types = frozenset(types)
         
-        for i in range(n_objects):
-            
-            raw_obj = get_object(parent, i)
-            if raw_obj is None:
-                raise PdfiumError("Failed to get page object.")
-            
-            type = pdfium.FPDFPageObj_GetType(raw_obj)
+        for raw_obj, type, obj_level, _ in self._walk_objects(max_depth, form, level, bbox):
+            if types is not None and type not in types:
+                continue
+            if predicate is not None and not predicate(raw_obj):
+                continue
             yield PdfPageObject(
                 raw = raw_obj,
                 type = type,
                 page = self,
                 pdf = self.pdf,
-                level = level,
+                level = obj_level,
             )
-            
-            if level < max_depth-1 and type == pdfium.FPDF_PAGEOBJ_FORM:
-                yield from self.get_objects(
-                    max_depth = max_depth,
-                    form = raw_obj,
-                    level = level + 1,
-                )
+    
+    
+    def get_objects_inventory(self, max_depth=2, matrices=False):
+        """
+        *Requires* :mod:`numpy`
+        
+        Gather the page objects on this page in a single traversal, without creating a helper object for each.
+        
+        Parameters:
+            max_depth (int):
+                Maximum recursion depth to consider when descending into Form XObjects (as in :meth:`.get_objects`).
+            matrices (bool):
+                Whether to include the transform matrix of each object.
+        Returns:
+            PdfPageObjectInventory: Types, nesting levels, parent indices, bounding boxes and optionally matrices of the objects.
+        """
+        
+        if numpy is None:
+            raise RuntimeError("NumPy library needs to be installed for get_objects_inventory().")
+        
+        handles, types, levels, parents, boxes, matrix_values = [], [], [], [], [], []
+        left, bottom, right, top = c_float(), c_float(), c_float(), c_float()
+        fs_matrix = pdfium.FS_MATRIX()
+        nan_box = (math.nan, ) * 4
+        
+        for raw_obj, type, level, parent_index in self._walk_objects(max_depth, None, 0, None):
+            handles.append(raw_obj)
+            types.append(type)
+            levels.append(level)
+            parents.append(parent_index)
+            if pdfium.FPDFPageObj_GetBounds(raw_obj, left, bottom, right, top):
+                boxes.append( (left.value, bottom.value, right.value, top.value) )
+            else:
+                boxes.append(nan_box)
+            if matrices:
+                if pdfium.FPDFPageObj_GetMatrix(raw_obj, fs_matrix):
+                    matrix_values.append( (fs_matrix.a, fs_matrix.b, fs_matrix.c, fs_matrix.d, fs_matrix.e, fs_matrix.f) )
+                else:
+                    matrix_values.append( (math.nan, ) * 6 )
+        
+        dtype = [
+            ("type", numpy.int32),
+            ("level", numpy.int32),
+            ("parent", numpy.int32),
+            ("box", numpy.float32, (4, )),
+        ]
+        if matrices:
+            dtype.append( ("matrix", numpy.float32, (6, )) )
+        
+        array = numpy.empty(len(handles), dtype=dtype)
+        if len(handles) > 0:
+            array["type"] = types
+            array["level"] = levels
+            array["parent"] = parents
+            array["box"] = boxes
+            if matrices:
+                array["matrix"] = matrix_values
+        
+        return PdfPageObjectInventory(array, handles, self)
     
     
     def render_to(self, converter, **renderer_kws):
@@ -1,14 +1,48 @@
 # SPDX-FileCopyrightText: 2022 geisserml <geisserml@gmail.com>
 # SPDX-License-Identifier: Apache-2.0 OR BSD-3-Clause
 
+import ctypes
+import hashlib
+import itertools
+import collections
 from ctypes import c_float
 import pypdfium2._pypdfium as pdfium
 from pypdfium2._helpers.misc import (
     PdfiumError,
+    BitmapTypeToStr,
+    BitmapStrToType,
+    BitmapStrReverseToRegular,
     get_fileaccess,
     is_input_buffer,
+    _lean_helpers,
 )
-from pypdfium2._helpers.matrix import PdfMatrix
+from pypdfium2._helpers.matrix import PdfMatrix, PdfMatrixArray
+from pypdfium2._helpers.converters import BitmapConv
+
+try:
+    import numpy.ctypeslib
+except ImportError:
+    numpy = None
+
+try:
+    import PIL.Image
+except ImportError:
+    PIL = None
+
+
+# PIL modes that map to a PDFium pixel format, and the raw mode to get the pixel data in PDFium's byte order
+_PilModeToRaw = {
+    "L":    "L",
+    "RGB":  "BGR",
+    "RGBA": "BGRA",
+    "RGBX": "BGRX",
+}
+
+# reverse pixel formats accepted by PdfImageObject.set_bitmap(), mapped to their regular counterpart
+_BitmapStrRegularToReverse = {v: k for k, v in BitmapStrReverseToRegular.items()}
+
+#: Image filters that are applied by :meth:`.PdfImageObject.get_data` with *decode_simple*.
+ImageSimpleFilters = ("ASCIIHexDecode", "ASCII85Decode", "RunLengthDecode", "FlateDecode", "LZWDecode")
 
 
 class PdfPageObject:
@@ -37,6 +71,9 @@ class PdfPageObject:
             Zero if the object is not nested in a Form XObject.
     """
     
+    if _lean_helpers:
+        __slots__ = ("raw", "type", "page", "pdf", "level")
+    
     
     def __new__(cls, raw, type, *args, **kwargs):
         # Allow to create a more specific helper depending on the type
@@ -117,6 +154,8 @@ class PdfImageObject (PdfPageObject):
     Image object helper class (specific kind of page object).
     """
     
+    __slots__ = ()
+    
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
     
@@ -199,6 +238,81 @@ class PdfImageObject (PdfPageObject):
         return (metadata.width, metadata.height)
     
     
+    def _set_bitmap_buffer(self, buffer, width, height, stride, cl_format, pages=None):
+        
+        # create a bitmap that references the caller's buffer - PDFium copies the pixels into the image stream
+        bitmap = pdfium.FPDFBitmap_CreateEx(width, height, BitmapStrToType[cl_format], buffer, stride)
+        if not bitmap:
+            raise PdfiumError("Failed to create bitmap.")
+        
+        c_pages = None
+        page_count = 0
+        if pages:
+            page_count = len(pages)
+            c_pages = (pdfium.FPDF_PAGE * page_count)(*[p.raw for p in pages])
+        
+        try:
+            success = pdfium.FPDFImageObj_SetBitmap(c_pages, page_count, self.raw, bitmap)
+        finally:
+            pdfium.FPDFBitmap_Destroy(bitmap)
+        if not success:
+            raise PdfiumError("Setting bitmap of image object failed.")
+        
+        return (width, height)
+    
+    
+    def set_bitmap(self, source, cl_format=None, pages=None):
+        """
+        Set the pixels of the image object from a raw bitmap, without encoding to JPEG.
+        Position and size of the image are defined by its matrix, as for :meth:`.load_jpeg`.
+        
+        Pixel buffers in one of PDFium's formats (``L``, ``BGR``, ``BGRA``, ``BGRX``) are passed to PDFium without an intermediate copy.
+        PDFium stores the pixels uncompressed, and an alpha channel as soft mask. Compressed streams can only be passed through for JPEG (see :meth:`.load_jpeg`).
+        
+        Parameters:
+            source (numpy.ndarray | PIL.Image.Image):
+                A NumPy array of shape ``(height, width)`` or ``(height, width, n_channels)`` with data type ``uint8``, or a PIL image.
+                PIL images of other modes than ``L``, ``RGB``, ``RGBA`` and ``RGBX`` are converted to ``RGBA`` if they have transparency, to ``L`` if they are bilevel or greyscale, or to ``RGB`` otherwise.
+            cl_format (str | None):
+                The colour format of a NumPy array. One of ``L``, ``BGR``, ``BGRA``, ``BGRX``, or the reversed ``RGB``, ``RGBA``, ``RGBX`` (which require a copy).
+                If :data:`None`, it is inferred from the number of channels, assuming ``L``, ``BGR`` or ``BGRA``. Ignored for PIL images.
+            pages (typing.Sequence[PdfPage] | None):
+                If replacing an image, a list of loaded pages that might contain it, to update their cache (see :meth:`.load_jpeg`).
+        Returns:
+            (int, int): Image width and height in pixels.
+        """
+        
+        if PIL is not None and isinstance(source, PIL.Image.Image):
+            data, width, height, cl_format = _pil_to_raw(source)
+            buffer = ctypes.cast(ctypes.c_char_p(data), ctypes.POINTER(ctypes.c_ubyte))
+            return self._set_bitmap_buffer(buffer, width, height, width * len(cl_format), cl_format, pages)
+        
+        if numpy is None or not isinstance(source, numpy.ndarray):
+            raise ValueError("Unsupported bitmap source: %s" % type(source))
+        
+        np_array = source
+        if np_array.ndim == 2:
+            np_array = np_array[..., numpy.newaxis]
+        if np_array.ndim != 3 or np_array.dtype != numpy.uint8:
+            raise ValueError("Array must be of shape (height, width[, n_channels]) and type uint8, got %s %s." % (np_array.shape, np_array.dtype))
+        height, width, n_channels = np_array.shape
+        
+        if cl_format is None:
+            cl_format = {1: "L", 3: "BGR", 4: "BGRA"}.get(n_channels)
+        if cl_format in _BitmapStrRegularToReverse:
+            np_array = np_array[..., [2, 1, 0, 3][:n_channels]]
+            cl_format = _BitmapStrRegularToReverse[cl_format]
+        if cl_format not in BitmapStrToType or len(cl_format) != n_channels:
+            raise ValueError("Colour format %s does not match array with %s channels." % (cl_format, n_channels))
+        
+        # PDFium needs contiguous pixels within each line, while lines may be spaced by any positive stride
+        if np_array.strides[1:] != (n_channels, 1) or np_array.strides[0] < width * n_channels:
+            np_array = numpy.ascontiguousarray(np_array)
+        buffer = np_array.ctypes.data_as(ctypes.POINTER(ctypes.c_ubyte))
+        
+        return self._set_bitmap_buffer(buffer, width, height, np_array.strides[0], cl_format, pages)
+    
+    
     def get_info(self):
         """
         Returns:
@@ -215,3 +329,375 @@ class PdfImageObject (PdfPageObject):
             raise PdfiumError("Failed to retrieve image metadata.")
         
         return metadata
+    
+    
+    def get_filters(self, skip_simple=False):
+        """
+        Parameters:
+            skip_simple (bool):
+                If :data:`True`, exclude simple filters that are removed by :meth:`.get_data` with *decode_simple* (see :data:`.ImageSimpleFilters`).
+        Returns:
+            typing.List[str]: The names of the filters applied to the image stream, in the order of decoding.
+        """
+        
+        filters = []
+        for i in range( pdfium.FPDFImageObj_GetImageFilterCount(self.raw) ):
+            n_bytes = pdfium.FPDFImageObj_GetImageFilter(self.raw, i, None, 0)
+            buffer = ctypes.create_string_buffer(n_bytes)
+            pdfium.FPDFImageObj_GetImageFilter(self.raw, i, buffer, n_bytes)
+            name = buffer.value.decode("utf-8")
+            if skip_simple and name in ImageSimpleFilters:
+                continue
+            filters.append(name)
+        
+        return filters
+    
+    
+    def get_data(self, decode_simple=False):
+        """
+        Get the data of the image stream, without re-encoding.
+        
+        Parameters:
+            decode_simple (bool):
+                If :data:`True`, apply simple filters (see :data:`.ImageSimpleFilters`), leaving complex ones such as ``DCTDecode`` in place.
+                Otherwise, return the raw stream data as stored in the PDF.
+        Returns:
+            bytes: The image data.
+        """
+        
+        if decode_simple:
+            get_func = pdfium.FPDFImageObj_GetImageDataDecoded
+        else:
+            get_func = pdfium.FPDFImageObj_GetImageDataRaw
+        
+        n_bytes = get_func(self.raw, None, 0)
+        buffer = ctypes.create_string_buffer(n_bytes)
+        get_func(self.raw, buffer, n_bytes)
+        return buffer.raw
+    
+    
+    def get_bitmap(self, render=False):
+        """
+        *Requires* :mod:`numpy`
+        
+        Get the image as decoded bitmap.
+        
+        Parameters:
+            render (bool):
+                If :data:`True`, get the image as rendered by PDFium, taking into account the matrix and image mask (requires the object to be on a page).
+                Otherwise, get the decoded pixels of the image stream as they are.
+        Returns:
+            (numpy.ndarray, str): An independent NumPy array of shape ``(height, width, n_channels)``, and the colour format (as for :class:`.BitmapConv.numpy_ndarray`).
+        """
+        
+        if numpy is None:
+            raise RuntimeError("NumPy library needs to be installed for get_bitmap().")
+        
+        if render:
+            if self.page is None:
+                raise RuntimeError("Cannot get rendered bitmap of loose pageobject.")
+            bitmap = pdfium.FPDFImageObj_GetRenderedBitmap(self.pdf.raw, self.page.raw, self.raw)
+        else:
+            bitmap = pdfium.FPDFImageObj_GetBitmap(self.raw)
+        if bitmap is None:
+            raise PdfiumError("Failed to get bitmap of image object.")
+        
+        try:
+            width = pdfium.FPDFBitmap_GetWidth(bitmap)
+            height = pdfium.FPDFBitmap_GetHeight(bitmap)
+            stride = pdfium.FPDFBitmap_GetStride(bitmap)
+            bitmap_type = pdfium.FPDFBitmap_GetFormat(bitmap)
+            if bitmap_type not in BitmapTypeToStr:
+                raise PdfiumError("Unsupported bitmap format %s." % bitmap_type)
+            cl_format = BitmapTypeToStr[bitmap_type]
+            n_channels = len(cl_format)
+            c_array = (ctypes.c_ubyte * (stride*height)).from_address( pdfium.FPDFBitmap_GetBuffer(bitmap).value )
+            # copy the pixels into an array owned by numpy, dropping any padding at the end of the lines
+            np_array = numpy.ctypeslib.as_array(c_array).reshape(height, stride)[:, :width*n_channels]
+            np_array = np_array.reshape(height, width, n_channels).copy()
+        finally:
+            pdfium.FPDFBitmap_Destroy(bitmap)
+        
+        return np_array, cl_format
+    
+    
+    def get_hash(self, algorithm="sha256"):
+        """
+        Get a hash of the raw image stream and its filters, which identifies duplicate images (e. g. a logo repeated on every page).
+        
+        Parameters:
+            algorithm (str): Name of a :mod:`hashlib` algorithm.
+        Returns:
+            str: The hexadecimal digest.
+        """
+        hasher = hashlib.new(algorithm, self.get_data())
+        hasher.update( "/".join(self.get_filters()).encode("utf-8") )
+        return hasher.hexdigest()
+    
+    
+    def get_perceptual_hash(self, hash_size=8, render=False):
+        """
+        *Requires* :mod:`numpy`
+        
+        Get a difference hash of the decoded image, which is similar for visually similar images, regardless of encoding or resolution.
+        Use :func:`.perceptual_hash_distance` to compare hashes.
+        
+        Parameters:
+            hash_size (int):
+                Width and height of the grid of brightness gradients. The hash has ``hash_size**2`` bits.
+            render (bool):
+                Whether to hash the rendered rather than the decoded bitmap (see :meth:`.get_bitmap`).
+        Returns:
+            int: The hash.
+        """
+        
+        np_array, cl_format = self.get_bitmap(render=render)
+        if cl_format == "L":
+            grey = np_array[..., 0].astype(numpy.float64)
+        else:
+            # BGR(A/X) channel order
+            grey = np_array[..., :3] @ numpy.array([0.114, 0.587, 0.299])
+        
+        small = _area_resample(grey, hash_size, hash_size+1)
+        bits = (small[:, 1:] > small[:, :-1]).ravel()
+        return int( "".join("1" if b else "0" for b in bits), 2 )
+    
+    
+    def extract(self, dest, fb_render=False):
+        """
+        Write the image to a file, choosing the format depending on the image's filters.
+        JPEG (``DCTDecode``) and JPEG 2000 (``JPXDecode``) streams are copied without re-encoding.
+        Other images are decoded and saved as PNG, which *requires* :mod:`numpy` and :mod:`PIL`.
+        
+        Parameters:
+            dest (str):
+                Output path without file extension, which is added according to the format.
+            fb_render (bool):
+                If the image needs to be re-encoded, whether to use the rendered rather than the decoded bitmap (see :meth:`.get_bitmap`).
+        Returns:
+            str: The path of the written file.
+        """
+        
+        filters = self.get_filters(skip_simple=True)
+        if filters in (["DCTDecode"], ["JPXDecode"]):
+            path = dest + (".jpg" if filters[0] == "DCTDecode" else ".jp2")
+            with open(path, "wb") as fh:
+                fh.write( self.get_data(decode_simple=True) )
+            return path
+        
+        np_array, cl_format = self.get_bitmap(render=fb_render)
+        height, width, _ = np_array.shape
+        pil_image = BitmapConv.pil_image.run((np_array, cl_format, (width, height)), {})
+        path = dest + ".png"
+        pil_image.save(path)
+        return path
+
+
+def _pil_to_raw(pil_image):
+    # get the pixels of a PIL image in a PDFium pixel format, converting the image if necessary
+    if pil_image.mode not in _PilModeToRaw:
+        if pil_image.mode in ("LA", "La", "PA", "RGBa") or "transparency" in pil_image.info:
+            pil_image = pil_image.convert("RGBA")
+        elif pil_image.mode in ("1", "I", "I;16", "F"):
+            pil_image = pil_image.convert("L")
+        else:
+            pil_image = pil_image.convert("RGB")
+    cl_format = _PilModeToRaw[pil_image.mode]
+    return pil_image.tobytes("raw", cl_format), pil_image.width, pil_image.height, cl_format
+
+
+def _transform_handles(handles, matrices, replace):
+    
+    n_objects = len(handles)
+    
+    if isinstance(matrices, PdfMatrix):
+        fs_matrices = itertools.repeat( matrices.to_pdfium() )
+        rows = itertools.repeat( matrices.get() )
+    elif isinstance(matrices, PdfMatrixArray):
+        if len(matrices) not in (1, n_objects):
+            raise ValueError("Got %s matrices for %s objects." % (len(matrices), n_objects))
+        array = numpy.broadcast_to(matrices.array, (n_objects, 6))
+        if replace:
+            # an FS_MATRIX is a struct of six floats, so a float32 array can be shared with PDFium as a whole
+            fs_matrices = (pdfium.FS_MATRIX * n_objects).from_buffer( numpy.array(array, dtype=numpy.float32, order="C") )
+        else:
+            rows = array.tolist()
+    else:
+        raise ValueError("*matrices* must be a PdfMatrix or PdfMatrixArray object.")
+    
+    if replace:
+        set_matrix = pdfium.FPDFPageObj_SetMatrix
+        for raw, fs_matrix in zip(handles, fs_matrices):
+            if not set_matrix(raw, fs_matrix):
+                raise PdfiumError("Failed to set matrix of pageobject.")
+    else:
+        transform = pdfium.FPDFPageObj_Transform
+        for raw, row in zip(handles, rows):
+            transform(raw, *row)
+
+
+def transform_objects(pageobjects, matrices, replace=False):
+    """
+    Transform many page objects in one call, avoiding per-object conversion of matrices.
+    Matrices of nested objects are relative to their parent Form XObject.
+    
+    Parameters:
+        pageobjects (typing.Sequence[PdfPageObject]):
+            The page objects to transform.
+        matrices (PdfMatrix | PdfMatrixArray):
+            A single matrix for all objects, or an array with one matrix per object (*requires* :mod:`numpy`).
+        replace (bool):
+            If :data:`True`, set the matrices as the objects' transform matrices (like :meth:`.PdfPageObject.set_matrix`).
+            Otherwise, apply them on top of the current matrices (like :meth:`.PdfPageObject.transform`).
+    """
+    _transform_handles([o.raw for o in pageobjects], matrices, replace)
+
+
+def _area_resample(np_array, height, width):
+    # downscale a 2D array by averaging the areas that map to each output cell
+    rows = numpy.linspace(0, np_array.shape[0], height+1).astype(numpy.intp)
+    cols = numpy.linspace(0, np_array.shape[1], width+1).astype(numpy.intp)
+    # reduceat() sums up to the next start index, or to the end of the array for the last one, so the counts follow from the unclamped edges
+    # when upscaling, empty areas yield the element at their start index, which therefore must be valid and is counted once
+    row_starts = numpy.minimum(rows[:-1], np_array.shape[0]-1)
+    col_starts = numpy.minimum(cols[:-1], np_array.shape[1]-1)
+    sums = numpy.add.reduceat( numpy.add.reduceat(np_array, row_starts, axis=0), col_starts, axis=1 )
+    counts = numpy.outer( numpy.maximum(numpy.diff(rows), 1), numpy.maximum(numpy.diff(cols), 1) )
+    return sums / counts
+
+
+def perceptual_hash_distance(hash_a, hash_b):
+    """
+    Returns:
+        int: The number of differing bits between two hashes of :meth:`.PdfImageObject.get_perceptual_hash`. Small values indicate similar images.
+    """
+    return bin(hash_a ^ hash_b).count("1")
+
+
+class PdfImageCache:
+    """
+    Cache of results derived from image objects, keyed by the stream hash (see :meth:`.PdfImageObject.get_hash`).
+    Duplicate image objects map to the result computed for the first one, so repeated images are decoded only once.
+    
+    Parameters:
+        max_entries (int | None):
+            Maximum number of results to keep. If exceeded, the least recently used entry is dropped. If :data:`None`, the cache is unbounded.
+    
+    Attributes:
+        n_hits (int): Number of requests answered from the cache.
+        n_misses (int): Number of requests that had to compute the result.
+    """
+    
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries
+        self.n_hits = 0
+        self.n_misses = 0
+        self._entries = collections.OrderedDict()
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def get(self, image, func=PdfImageObject.get_bitmap):
+        """
+        Parameters:
+            image (PdfImageObject):
+                The image object.
+            func (typing.Callable[[PdfImageObject], typing.Any]):
+                Function to compute the result for an image that is not cached yet (defaults to decoding the bitmap).
+                Results are cached per function object, so pass the same function for all requests that shall share entries.
+        Returns:
+            typing.Any: The result for *image*, or for a previous image with the same stream.
+        """
+        
+        key = (image.get_hash(), func)
+        if key in self._entries:
+            self.n_hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        
+        self.n_misses += 1
+        result = func(image)
+        self._entries[key] = result
+        if self.max_entries is not None and len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        
+        return result
+    
+    def clear(self):
+        """
+        Remove all entries.
+        """
+        self._entries.clear()
+
+
+class PdfPageObjectInventory:
+    """
+    Columnar overview of the page objects on a page, as returned by :meth:`.PdfPage.get_objects_inventory`.
+    Helper objects are only created on request with :meth:`.get_object`, so large pages can be analysed cheaply.
+    
+    Attributes:
+        array (numpy.ndarray):
+            Structured array with one record per object, in the same order as :meth:`.PdfPage.get_objects`. Fields:
+            
+            * ``type``: Type of the object (:data:`FPDF_PAGEOBJ_*`).
+            * ``level``: Nesting level (number of parent Form XObjects).
+            * ``parent``: Index of the parent Form XObject in this inventory, or -1 for top-level objects.
+            * ``box``: Bounding box (left, bottom, right, top), or NaN if the object could not be located.
+            * ``matrix``: Transform matrix (a, b, c, d, e, f), only present if requested. NaN if the matrix could not be retrieved.
+        page (PdfPage):
+            The page the objects belong to.
+    """
+    
+    def __init__(self, array, handles, page):
+        self.array = array
+        self.page = page
+        self._handles = handles
+    
+    def __len__(self):
+        return len(self.array)
+    
+    def get_object(self, index):
+        """
+        Parameters:
+            index (int): Index of the object in the inventory.
+        Returns:
+            PdfPageObject: A helper object for the page object in question.
+        """
+        record = self.array[index]
+        return PdfPageObject(
+            raw = self._handles[index],
+            type = int(record["type"]),
+            page = self.page,
+            pdf = self.page.pdf,
+            level = int(record["level"]),
+        )
+    
+    def get_objects(self, indices):
+        """
+        Parameters:
+            indices (typing.Iterable[int] | numpy.ndarray):
+                Indices of the objects to materialise, e. g. ``numpy.flatnonzero(mask)`` for a boolean mask over :attr:`.array`.
+        Yields:
+            :class:`.PdfPageObject`: A helper object for each index.
+        """
+        for index in indices:
+            yield self.get_object(int(index))
+    
+    def transform(self, matrices, indices=None, replace=False):
+        """
+        Transform objects of the inventory without creating helper objects (see :func:`.transform_objects`).
+        The inventory itself is not updated, so its boxes and matrices reflect the state before the transformation.
+        
+        Parameters:
+            matrices (PdfMatrix | PdfMatrixArray):
+                A single matrix for all objects in question, or an array with one matrix per object.
+            indices (typing.Iterable[int] | numpy.ndarray | None):
+                Indices of the objects to transform. If :data:`None`, all objects are transformed.
+            replace (bool):
+                Whether to replace rather than concatenate the objects' matrices.
+        """
+        if indices is None:
+            handles = self._handles
+        else:
+            handles = [self._handles[int(i)] for i in indices]
+        _transform_handles(handles, matrices, replace)
@@ -0,0 +1,310 @@
+# SPDX-FileCopyrightText: 2022 geisserml <geisserml@gmail.com>
+# SPDX-License-Identifier: Apache-2.0 OR BSD-3-Clause
+
+import re
+import json
+import collections
+import pypdfium2._pypdfium as pdfium
+
+
+_TermPattern = re.compile(r"\w+")
+
+
+def _get_char_text(textpage):
+    
+    # Get the text of a text page, and the character index of each string position (plus the character count at the end).
+    # PDFium reports characters outside the basic multilingual plane as two characters (a surrogate pair), and get_text_range() drops undecodable units,
+    # so if the text does not have one string position per character, it is built per character, combining surrogate pairs.
+    
+    n_chars = textpage.n_chars
+    text = textpage.get_text_range()
+    if len(text) == n_chars:
+        return text, range(n_chars+1)
+    
+    chars, offsets = [], []
+    index = 0
+    while index < n_chars:
+        unicode = pdfium.FPDFText_GetUnicode(textpage.raw, index)
+        if 0xD800 <= unicode < 0xDC00 and index+1 < n_chars:
+            low = pdfium.FPDFText_GetUnicode(textpage.raw, index+1)
+            if 0xDC00 <= low < 0xE000:
+                chars.append( chr(0x10000 + ((unicode - 0xD800) << 10) + (low - 0xDC00)) )
+                offsets.append(index)
+                index += 2
+                continue
+        chars.append( chr(unicode) )
+        offsets.append(index)
+        index += 1
+    offsets.append(n_chars)
+    
+    return "".join(chars), offsets
+
+
+def _get_page_char_text(page, index):
+    textpage = page.get_textpage()
+    try:
+        return _get_char_text(textpage)
+    finally:
+        textpage.close()
+
+
+class TextMatcher:
+    """
+    Multi-term matcher (Aho-Corasick automaton) to find all occurrences of many terms on text pages in a single pass.
+    The matcher may be re-used for any number of pages.
+    
+    Parameters:
+        terms (typing.Sequence[str]):
+            The strings to search for.
+        match_case (bool):
+            If :data:`True`, the search will be case-specific (like :data:`FPDF_MATCHCASE`).
+        match_whole_word (bool):
+            If :data:`True`, occurrences adjacent to other letters or digits will be ignored (like :data:`FPDF_MATCHWHOLEWORD`).
+    """
+    
+    def __init__(self, terms, match_case=False, match_whole_word=False):
+        
+        if any(len(t) == 0 for t in terms):
+            raise ValueError("Text length must be >0.")
+        
+        self.terms = list(terms)
+        self.match_case = match_case
+        self.match_whole_word = match_whole_word
+        
+        self._goto = [{}]
+        self._output = [[]]
+        for term_index, term in enumerate(self.terms):
+            node = 0
+            for char in self._normalise(term):
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._output.append([])
+                node = next_node
+            self._output[node].append(term_index)
+        
+        # breadth-first construction of failure links, merging outputs of suffix states
+        self._fail = [0] * len(self._goto)
+        queue = collections.deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._output[child] = self._output[child] + self._output[ self._fail[child] ]
+                queue.append(child)
+        
+        self._lengths = [len(self._normalise(t)) for t in self.terms]
+    
+    def _normalise(self, text):
+        if self.match_case:
+            return text
+        lowered = text.lower()
+        if len(lowered) == len(text):
+            return lowered
+        # some characters change length when lowered - keep them unchanged so that indices stay valid
+        return "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+    
+    def find(self, text):
+        """
+        Find occurrences in a string.
+        
+        Parameters:
+            text (str): The text to search.
+        Returns:
+            typing.List[typing.Tuple[int, int, int]]: Term index, start index and length of each occurrence, ordered by start index.
+        """
+        
+        goto, fail, output, lengths = self._goto, self._fail, self._output, self._lengths
+        hits = []
+        node = 0
+        
+        for pos, char in enumerate( self._normalise(text) ):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for term_index in output[node]:
+                length = lengths[term_index]
+                start = pos - length + 1
+                if self.match_whole_word:
+                    if start > 0 and text[start-1].isalnum():
+                        continue
+                    if pos+1 < len(text) and text[pos+1].isalnum():
+                        continue
+                hits.append( (term_index, start, length) )
+        
+        hits.sort(key=lambda h: (h[1], h[0]))
+        return hits
+    
+    def search(self, textpage, rects=True):
+        """
+        Find occurrences on a text page.
+        
+        Parameters:
+            textpage (PdfTextPage):
+                The text page to search.
+            rects (bool):
+                Whether to include the text rectangles of each occurrence.
+        Returns:
+            typing.List[tuple]:
+            Term, character index and character count of each occurrence, ordered by character index.
+            If *rects* is :data:`True`, a list of bounding boxes is added as fourth item.
+        """
+        
+        text, offsets = _get_char_text(textpage)
+        
+        results = []
+        for term_index, start, length in self.find(text):
+            index = offsets[start]
+            count = offsets[start+length] - index
+            result = (self.terms[term_index], index, count)
+            if rects:
+                result += ( list(textpage.get_rectboxes(index, count)), )
+            results.append(result)
+        
+        return results
+
+
+class PdfTextIndex:
+    """
+    Inverted index mapping the words of a document to their occurrences, for repeated searches without re-loading text pages.
+    Use :meth:`.build` to create an index, or :meth:`.load` to read one from disk.
+    
+    Words are sequences of alphanumeric characters (``\\w+``).
+    Occurrences are stored as tuples of page index, character index and character count,
+    which may be passed to :meth:`.PdfTextPage.get_rectboxes` or resolved with :meth:`.resolve`.
+    
+    Attributes:
+        terms (typing.Dict[str, typing.List[typing.Tuple[int, int, int]]]):
+            Mapping of terms to occurrences. Terms are case-folded unless the index is case-sensitive.
+        n_pages (int):
+            Number of pages in the document at the time of indexing.
+        case_sensitive (bool):
+            Whether terms are stored as they appear in the text.
+    """
+    
+    def __init__(self, terms, n_pages, case_sensitive=False):
+        self.terms = terms
+        self.n_pages = n_pages
+        self.case_sensitive = case_sensitive
+    
+    def __len__(self):
+        return len(self.terms)
+    
+    def _normalise(self, term):
+        return term if self.case_sensitive else term.casefold()
+    
+    @classmethod
+    def build(cls, pdf, case_sensitive=False, n_processes=1):
+        """
+        Index the text of all pages in a single pass.
+        
+        Parameters:
+            pdf (PdfDocument):
+                The document to index.
+            case_sensitive (bool):
+                Whether terms shall be stored as they are, rather than case-folded.
+            n_processes (int):
+                Number of processes to use for text extraction (as for :meth:`.PdfDocument.extract_text`).
+        Returns:
+            PdfTextIndex: The index.
+        """
+        
+        index = cls({}, len(pdf), case_sensitive=case_sensitive)
+        terms = collections.defaultdict(list)
+        
+        page_indices = list( range(len(pdf)) )
+        for page_index, (text, offsets) in pdf._map_pages(page_indices, _get_page_char_text, n_processes, None):
+            for match in _TermPattern.finditer(text):
+                start, end = match.span()
+                terms[ index._normalise(match.group()) ].append( (page_index, offsets[start], offsets[end] - offsets[start]) )
+        
+        index.terms = dict(terms)
+        return index
+    
+    def lookup(self, term):
+        """
+        Parameters:
+            term (str): The word to look up.
+        Returns:
+            typing.List[typing.Tuple[int, int, int]]: Page index, character index and character count of each occurrence, in document order.
+        """
+        return self.terms.get(self._normalise(term), [])
+    
+    def _check_document(self, pdf):
+        if len(pdf) != self.n_pages:
+            raise ValueError("Index was built from a document with %s pages, but the given document has %s pages." % (self.n_pages, len(pdf)))
+    
+    def resolve(self, pdf, hits):
+        """
+        Get the text rectangles of occurrences. Each page is loaded only once, and only if it contains a hit.
+        Pages are closed when the next one is loaded, or when the generator is finished or discarded.
+        
+        Parameters:
+            pdf (PdfDocument):
+                The document the index was built from.
+            hits (typing.Iterable[typing.Tuple[int, int, int]]):
+                Occurrences as returned by :meth:`.lookup`.
+        Yields:
+            (typing.Tuple[int, int, int], typing.List[typing.Tuple[float, float, float, float]]):
+            The occurrence, and the bounding boxes of its text rectangles.
+        Raises:
+            ValueError: If the page count of the document does not match the index.
+        """
+        
+        self._check_document(pdf)
+        
+        page_index, page, textpage = None, None, None
+        try:
+            for hit in sorted(hits):
+                if hit[0] != page_index:
+                    if page is not None:
+                        textpage.close()
+                        page.close()
+                    page_index = hit[0]
+                    page = pdf.get_page(page_index)
+                    textpage = page.get_textpage()
+                yield hit, list( textpage.get_rectboxes(hit[1], hit[2]) )
+        finally:
+            if page is not None:
+                textpage.close()
+                page.close()
+    
+    def save(self, path):
+        """
+        Write the index to a JSON file.
+        """
+        data = dict(
+            n_pages = self.n_pages,
+            case_sensitive = self.case_sensitive,
+            terms = self.terms,
+        )
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(data, fh, ensure_ascii=False, separators=(",", ":"))
+    
+    @classmethod
+    def load(cls, path, pdf=None):
+        """
+        Read an index written by :meth:`.save`.
+        
+        Parameters:
+            path (str):
+                Path of the index file.
+            pdf (PdfDocument | None):
+                If given, check that the index matches this document (by page count).
+        Returns:
+            PdfTextIndex: The index.
+        Raises:
+            ValueError: If *pdf* was given and its page count does not match the index.
+        """
+        with open(path, "r", encoding="utf-8") as fh:
+            data = json.load(fh)
+        terms = {term: [tuple(hit) for hit in hits] for term, hits in data["terms"].items()}
+        index = cls(terms, data["n_pages"], case_sensitive=data["case_sensitive"])
+        if pdf is not None:
+            index._check_document(pdf)
+        return index
@@ -0,0 +1,247 @@
+# SPDX-FileCopyrightText: 2022 geisserml <geisserml@gmail.com>
+# SPDX-License-Identifier: Apache-2.0 OR BSD-3-Clause
+
+import json
+import ctypes
+from xml.sax.saxutils import escape, quoteattr
+import pypdfium2._pypdfium as pdfium
+
+
+#: Formats supported by :func:`.export_page` (JSON lines, hOCR and ALTO XML).
+TextExportFormats = ("json", "hocr", "alto")
+
+# ALTO measurement unit inch1200, in PDF canvas units (1/72 inch)
+_AltoScale = 1200 / 72
+
+
+def _get_font_name(textpage, index):
+    n_bytes = pdfium.FPDFText_GetFontInfo(textpage.raw, index, None, 0, None)
+    if n_bytes == 0:
+        return ""
+    buffer = ctypes.create_string_buffer(n_bytes)
+    pdfium.FPDFText_GetFontInfo(textpage.raw, index, buffer, n_bytes, None)
+    return buffer.value.decode("utf-8", errors="replace")
+
+
+def _round_box(box):
+    return [round(float(v), 2) for v in box]
+
+
+def get_page_structure(page, chars=False):
+    """
+    *Requires* :mod:`numpy`
+    
+    Get the text structure of a page, as determined by :meth:`.PdfTextPage.get_layout`.
+    
+    Parameters:
+        page (PdfPage):
+            The page to analyse.
+        chars (bool):
+            Whether to include the individual characters of each word.
+    Returns:
+        dict:
+        A JSON-serialisable mapping with the page ``box`` (crop box), and a list of ``blocks``, each holding a list of ``lines``,
+        each holding a list of ``words``. Words provide ``text``, ``font`` name and font ``size``, and optionally ``chars`` with ``text`` and ``box``.
+        All boxes are given in PDF canvas units as left, bottom, right and top coordinates.
+    """
+    
+    textpage = page.get_textpage()
+    try:
+        all_chars = textpage._get_cached_chars()
+        layout = textpage.get_layout()
+        
+        blocks = []
+        for block in layout.blocks:
+            lines = []
+            for line_index in range(block["line_index"], block["line_index"] + block["n_lines"]):
+                line = layout.lines[line_index]
+                words = []
+                for word_index in range(line["word_index"], line["word_index"] + line["n_words"]):
+                    word = layout.words[word_index]
+                    start, count = int(word["index"]), int(word["count"])
+                    word_data = dict(
+                        text = layout.get_word_text(word_index),
+                        box = _round_box(word["box"]),
+                        font = _get_font_name(textpage, start),
+                        size = round(float(all_chars["font_size"][start]), 2),
+                    )
+                    if chars:
+                        word_data["chars"] = [
+                            dict(text=chr(c["unicode"]), box=_round_box(c["box"]))
+                            for c in all_chars[start:start+count]
+                        ]
+                    words.append(word_data)
+                lines.append( dict(box=_round_box(line["box"]), words=words) )
+            blocks.append( dict(box=_round_box(block["box"]), lines=lines) )
+    
+    finally:
+        textpage.close()
+    
+    return dict(
+        box = _round_box(page.get_cropbox()),
+        blocks = blocks,
+    )
+
+
+def _to_top_left(box, page_box):
+    # convert a PDF box (origin bottom left) to left, top, right, bottom relative to the top left corner of the page
+    return (box[0] - page_box[0], page_box[3] - box[3], box[2] - page_box[0], page_box[3] - box[1])
+
+
+def _hocr_font(name):
+    # hOCR properties are separated by semicolons, and the title attribute is double-quoted
+    return (name or "").replace(";", "").replace('"', "") or "unknown"
+
+
+def _hocr_bbox(box, page_box):
+    return "bbox %d %d %d %d" % tuple( round(v) for v in _to_top_left(box, page_box) )
+
+
+def _alto_pos(box, page_box):
+    l, t, r, b = _to_top_left(box, page_box)
+    return 'HPOS="%d" VPOS="%d" WIDTH="%d" HEIGHT="%d"' % (
+        round(l * _AltoScale), round(t * _AltoScale), round((r-l) * _AltoScale), round((b-t) * _AltoScale)
+    )
+
+
+def _format_hocr(data, index):
+    
+    page_box = data["box"]
+    n = index + 1
+    parts = ['<div class="ocr_page" id="page_%d" title="%s; ppageno %d; scan_res 72 72">\n' % (n, _hocr_bbox(page_box, page_box), index)]
+    
+    for b, block in enumerate(data["blocks"]):
+        parts.append(' <div class="ocr_carea" id="block_%d_%d" title="%s">\n' % (n, b+1, _hocr_bbox(block["box"], page_box)))
+        parts.append('  <p class="ocr_par" id="par_%d_%d" title="%s">\n' % (n, b+1, _hocr_bbox(block["box"], page_box)))
+        for l, line in enumerate(block["lines"]):
+            parts.append('   <span class="ocr_line" id="line_%d_%d_%d" title="%s">' % (n, b+1, l+1, _hocr_bbox(line["box"], page_box)))
+            for w, word in enumerate(line["words"]):
+                title = "%s; x_font %s; x_fsize %s" % (_hocr_bbox(word["box"], page_box), _hocr_font(word["font"]), word["size"])
+                if "chars" in word:
+                    title += "; x_bboxes " + " ".join( _hocr_bbox(c["box"], page_box)[5:] for c in word["chars"] )
+                parts.append('%s<span class="ocrx_word" id="word_%d_%d_%d_%d" title=%s>%s</span>' % (
+                    " " if w > 0 else "", n, b+1, l+1, w+1, quoteattr(title), escape(word["text"])
+                ))
+            parts.append('</span>\n')
+        parts.append('  </p>\n </div>\n')
+    
+    parts.append('</div>\n')
+    return "".join(parts)
+
+
+def _format_alto(data, index):
+    
+    page_box = data["box"]
+    n = index + 1
+    width, height = page_box[2] - page_box[0], page_box[3] - page_box[1]
+    parts = [
+        '<Page ID="page_%d" PHYSICAL_IMG_NR="%d" WIDTH="%d" HEIGHT="%d">\n' % (n, n, round(width * _AltoScale), round(height * _AltoScale)),
+        '<PrintSpace %s>\n' % _alto_pos(page_box, page_box),
+    ]
+    
+    for b, block in enumerate(data["blocks"]):
+        parts.append('<TextBlock ID="block_%d_%d" %s>\n' % (n, b+1, _alto_pos(block["box"], page_box)))
+        for l, line in enumerate(block["lines"]):
+            parts.append('<TextLine ID="line_%d_%d_%d" %s>' % (n, b+1, l+1, _alto_pos(line["box"], page_box)))
+            for w, word in enumerate(line["words"]):
+                if w > 0:
+                    parts.append('<SP/>')
+                attrs = 'ID="word_%d_%d_%d_%d" CONTENT=%s %s' % (n, b+1, l+1, w+1, quoteattr(word["text"]), _alto_pos(word["box"], page_box))
+                if "chars" in word:
+                    glyphs = "".join(
+                        '<Glyph CONTENT=%s %s/>' % (quoteattr(c["text"]), _alto_pos(c["box"], page_box))
+                        for c in word["chars"]
+                    )
+                    parts.append('<String %s>%s</String>' % (attrs, glyphs))
+                else:
+                    parts.append('<String %s/>' % attrs)
+            parts.append('</TextLine>\n')
+        parts.append('</TextBlock>\n')
+    
+    parts.append('</PrintSpace>\n</Page>\n')
+    return "".join(parts)
+
+
+def export_page(page, index, format, chars=False):
+    """
+    Get the text structure of a page (see :func:`.get_page_structure`) formatted as self-contained fragment.
+    JSON fragments are single lines with an additional ``page`` key. hOCR and ALTO fragments are page elements in coordinates relative to the top left corner of the crop box,
+    using 72 DPI pixels for hOCR and the ALTO unit ``inch1200``.
+    Font names and sizes are only included in JSON and hOCR, since ALTO would require styles to be declared before the layout, which is not possible when streaming.
+    
+    Parameters:
+        page (PdfPage):
+            The page to export.
+        index (int):
+            Zero-based index of the page, used for page numbers and element identifiers.
+        format (str):
+            One of :data:`.TextExportFormats`.
+        chars (bool):
+            Whether to include the individual characters of each word.
+    Returns:
+        str: The page fragment, terminated by a line break.
+    """
+    
+    if format not in TextExportFormats:
+        raise ValueError("Invalid text export format '%s'" % format)
+    
+    data = get_page_structure(page, chars=chars)
+    if format == "json":
+        return json.dumps(dict(page=index, **data), ensure_ascii=False, separators=(",", ":")) + "\n"
+    elif format == "hocr":
+        return _format_hocr(data, index)
+    else:
+        return _format_alto(data, index)
+
+
+def get_export_header(format, title=""):
+    """
+    Parameters:
+        format (str): One of :data:`.TextExportFormats`.
+        title (str): Document title to include in hOCR output.
+    Returns:
+        str: The text to write before the page fragments of :func:`.export_page` (empty for JSON lines).
+    """
+    if format == "json":
+        return ""
+    elif format == "hocr":
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Transitional//EN" "http://www.w3.org/TR/xhtml1/DTD/xhtml1-transitional.dtd">\n'
+            '<html xmlns="http://www.w3.org/1999/xhtml" xml:lang="en" lang="en">\n'
+            '<head>\n'
+            '<title>%s</title>\n'
+            '<meta http-equiv="Content-Type" content="text/html;charset=utf-8"/>\n'
+            '<meta name="ocr-system" content="pypdfium2"/>\n'
+            '<meta name="ocr-capabilities" content="ocr_page ocr_carea ocr_par ocr_line ocrx_word ocrp_font"/>\n'
+            '</head>\n'
+            '<body>\n'
+        ) % escape(title)
+    elif format == "alto":
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<alto xmlns="http://www.loc.gov/standards/alto/ns-v4#" '
+            'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+            'xsi:schemaLocation="http://www.loc.gov/standards/alto/ns-v4# http://www.loc.gov/standards/alto/v4/alto-4-2.xsd">\n'
+            '<Description>\n'
+            '<MeasurementUnit>inch1200</MeasurementUnit>\n'
+            '</Description>\n'
+            '<Layout>\n'
+        )
+    raise ValueError("Invalid text export format '%s'" % format)
+
+
+def get_export_footer(format):
+    """
+    Parameters:
+        format (str): One of :data:`.TextExportFormats`.
+    Returns:
+        str: The text to write after the page fragments of :func:`.export_page` (empty for JSON lines).
+    """
+    if format == "json":
+        return ""
+    elif format == "hocr":
+        return '</body>\n</html>\n'
+    elif format == "alto":
+        return '</Layout>\n</alto>\n'
+    raise ValueError("Invalid text export format '%s'" % format)
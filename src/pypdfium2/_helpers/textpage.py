@@ -1,16 +1,52 @@
 # SPDX-FileCopyrightText: 2022 geisserml <geisserml@gmail.com>
 # SPDX-License-Identifier: Apache-2.0 OR BSD-3-Clause
 
+import math
 import ctypes
 import weakref
 import logging
+import threading
 from ctypes import c_double
 import pypdfium2._pypdfium as pdfium
-from pypdfium2._helpers.misc import PdfiumError
+from pypdfium2._helpers.misc import PdfiumError, WebLink, _lean_helpers
+from pypdfium2._helpers.layout import build_layout, CharSpatialIndex
+from pypdfium2._helpers.search import TextMatcher
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 logger = logging.getLogger(__name__)
 
 
+class _Utf16Scratch (threading.local):
+    
+    # Per-thread UTF-16 buffer that is re-used across text extraction calls, and only grown if too small.
+    # Buffers grown beyond max_retained units are dropped after decoding, so that a single huge page does not pin the memory for the lifetime of the thread.
+    
+    initial_size = 4096
+    max_retained = 1 << 20
+    
+    def __init__(self):
+        self.buffer = (ctypes.c_ushort * self.initial_size)()
+    
+    def get(self, n_units):
+        if len(self.buffer) < n_units:
+            self.buffer = (ctypes.c_ushort * max(n_units, 2*len(self.buffer)))()
+        return self.buffer
+    
+    def decode(self, n_units, errors):
+        # decode directly from the ctypes buffer, without creating an intermediate bytes object
+        text = str(memoryview(self.buffer).cast("B")[:n_units*2], "utf-16-le", errors)
+        if len(self.buffer) > self.max_retained:
+            self.buffer = (ctypes.c_ushort * self.initial_size)()
+        return text
+
+
+_utf16_scratch = _Utf16Scratch()
+
+
 class PdfTextPage:
     """
     Text page helper class.
@@ -21,14 +57,31 @@ class PdfTextPage:
         n_chars (int): Number of characters on the page, at the time of initialisation.
     """
     
+    if _lean_helpers:
+        __slots__ = (
+            "raw", "page", "n_chars", "_finalizer", "_weblinks_handle",
+            "_chars_array", "_layouts", "_spatial_indices", "_weblinks", "__weakref__",
+        )
+    
     def __init__(self, raw, page):
         self.raw = raw
         self.page = page
-        self._finalizer = weakref.finalize(
-            self, self._static_close,
-            self.raw, self.page,
-        )
+        # the weblinks handle is loaded on demand and must be released before the text page, so the finalizer gets a mutable container
+        self._weblinks_handle = []
+        arena = page.pdf._arena
+        if arena is None:
+            self._finalizer = weakref.finalize(
+                self, self._static_close,
+                self.raw, self.page, self._weblinks_handle,
+            )
+        else:
+            self._finalizer = None
+            arena.append(self)
         self.n_chars = pdfium.FPDFText_CountChars(self.raw)
+        self._chars_array = None
+        self._layouts = {}
+        self._spatial_indices = {}
+        self._weblinks = None
     
     def _tree_closed(self):
         if self.raw is None:
@@ -36,10 +89,12 @@ class PdfTextPage:
         return self.page._tree_closed()
     
     @staticmethod
-    def _static_close(raw, parent):
+    def _static_close(raw, parent, weblinks_handle):
         # logger.debug("Closing text page")
         if parent._tree_closed():
             logger.critical("Some parent closed before text page (this is illegal). Direct parent: %s" % parent)
+        if weblinks_handle:
+            pdfium.FPDFLink_CloseWebLinks(weblinks_handle.pop())
         pdfium.FPDFText_ClosePage(raw)
     
     def close(self):
@@ -50,7 +105,10 @@ class PdfTextPage:
         if self.raw is None:
             logger.warning("Duplicate close call suppressed on text page %s" % self)
             return
-        self._finalizer()
+        if self._finalizer is None:
+            self._static_close(self.raw, self.page, self._weblinks_handle)
+        else:
+            self._finalizer()
         self.raw = None
     
     
@@ -87,11 +145,11 @@ class PdfTextPage:
             count = self.n_chars - index
         self._check_span(self.n_chars, index, count)
         
-        n_bytes = count * 2
-        buffer = ctypes.create_string_buffer(n_bytes+2)
-        buffer_ptr = ctypes.cast(buffer, ctypes.POINTER(ctypes.c_ushort))
-        pdfium.FPDFText_GetText(self.raw, index, count, buffer_ptr)
-        return buffer.raw[:n_bytes].decode("utf-16-le", errors=errors)
+        buffer = _utf16_scratch.get(count+1)
+        # The scratch buffer is not cleared between calls, so only decode what PDFium actually wrote (the count includes the null terminator).
+        # This may be less than count, as text indices do not necessarily match character indices.
+        n_written = pdfium.FPDFText_GetText(self.raw, index, count, buffer)
+        return _utf16_scratch.decode(max(0, n_written-1), errors)
     
     
     def get_text_bounded(self, left=None, bottom=None, right=None, top=None, errors="ignore"):
@@ -119,15 +177,23 @@ class PdfTextPage:
             top = cropbox[3]
         
         args = (self.raw, left, top, right, bottom)
-        n_chars = pdfium.FPDFText_GetBoundedText(*args, None, 0)
+        
+        # Try with a buffer that will usually be large enough, so PDFium need not be asked for the text length first.
+        # Bounded text may contain line breaks that are not in the character list, hence the margin.
+        # If the buffer is large enough, PDFium also writes a null terminator, which is included in the returned count.
+        capacity = 2 * self.n_chars + 2
+        buffer = _utf16_scratch.get(capacity)
+        n_written = pdfium.FPDFText_GetBoundedText(*args, buffer, capacity)
+        if n_written < capacity:
+            n_chars = n_written - 1
+        else:
+            n_chars = pdfium.FPDFText_GetBoundedText(*args, None, 0)
+            buffer = _utf16_scratch.get(n_chars)
+            pdfium.FPDFText_GetBoundedText(*args, buffer, n_chars)
         if n_chars <= 0:
             return ""
         
-        n_bytes = 2 * n_chars
-        buffer = ctypes.create_string_buffer(n_bytes)
-        buffer_ptr = ctypes.cast(buffer, ctypes.POINTER(ctypes.c_ushort))
-        pdfium.FPDFText_GetBoundedText(*args, buffer_ptr, n_chars)
-        return buffer.raw.decode("utf-16-le", errors=errors)
+        return _utf16_scratch.decode(n_chars, errors)
     
     
     def get_text(self, *args, **kwargs):
@@ -206,6 +272,116 @@ class PdfTextPage:
         return left, bottom, right, top
     
     
+    def get_chars_array(self):
+        """
+        *Requires* :mod:`numpy`
+        
+        Get geometry and properties of all characters on the page at once.
+        
+        Returns:
+            numpy.ndarray:
+            A structured array with one record per character and the following fields:
+            
+            * ``unicode``: Unicode codepoint (:class:`numpy.uint32`).
+            * ``box``: Tight bounding box (left, bottom, right, top), as in :meth:`.get_charbox`.
+            * ``loose_box``: Loose bounding box (left, bottom, right, top), as in :meth:`.get_charbox` with *loose* set.
+            * ``origin``: Origin (x, y) of the character.
+            * ``font_size``: Font size in PDF canvas units.
+            * ``angle``: Rotation angle in radians, or -1 on failure.
+            
+            Box or origin values of characters for which PDFium reports failure are set to NaN.
+        """
+        
+        if numpy is None:
+            raise RuntimeError("NumPy library needs to be installed for get_chars_array().")
+        
+        raw = self.raw
+        n_chars = self.n_chars
+        chars = numpy.empty(n_chars, dtype=[
+            ("unicode", numpy.uint32),
+            ("box", numpy.float64, (4, )),
+            ("loose_box", numpy.float64, (4, )),
+            ("origin", numpy.float64, (2, )),
+            ("font_size", numpy.float64),
+            ("angle", numpy.float32),
+        ])
+        if n_chars == 0:
+            return chars
+        
+        # re-use the same ctypes objects for all characters, and collect values in lists to transfer them to numpy at once
+        left, bottom, right, top = c_double(), c_double(), c_double(), c_double()
+        x, y = c_double(), c_double()
+        rect = pdfium.FS_RECTF()
+        nan_box = (math.nan, ) * 4
+        unicodes, boxes, loose_boxes, origins, font_sizes, angles = [], [], [], [], [], []
+        
+        for i in range(n_chars):
+            unicodes.append( pdfium.FPDFText_GetUnicode(raw, i) )
+            if pdfium.FPDFText_GetCharBox(raw, i, left, right, bottom, top):
+                boxes.append( (left.value, bottom.value, right.value, top.value) )
+            else:
+                boxes.append(nan_box)
+            if pdfium.FPDFText_GetLooseCharBox(raw, i, rect):
+                loose_boxes.append( (rect.left, rect.bottom, rect.right, rect.top) )
+            else:
+                loose_boxes.append(nan_box)
+            if pdfium.FPDFText_GetCharOrigin(raw, i, x, y):
+                origins.append( (x.value, y.value) )
+            else:
+                origins.append( (math.nan, math.nan) )
+            font_sizes.append( pdfium.FPDFText_GetFontSize(raw, i) )
+            angles.append( pdfium.FPDFText_GetCharAngle(raw, i) )
+        
+        chars["unicode"] = unicodes
+        chars["box"] = boxes
+        chars["loose_box"] = loose_boxes
+        chars["origin"] = origins
+        chars["font_size"] = font_sizes
+        chars["angle"] = angles
+        
+        return chars
+    
+    
+    def _get_cached_chars(self):
+        if self._chars_array is None:
+            self._chars_array = self.get_chars_array()
+        return self._chars_array
+    
+    
+    def get_layout(self, word_gap=0.25, line_gap=1.5, block_gap=0.8):
+        """
+        *Requires* :mod:`numpy`
+        
+        Group the characters on the page into words, lines, blocks and columns.
+        The result is cached on the text page, so repeated calls with the same parameters are free.
+        See :func:`.build_layout` for a description of the parameters.
+        
+        Returns:
+            TextLayout: The layout of the page.
+        """
+        key = (word_gap, line_gap, block_gap)
+        if key not in self._layouts:
+            self._layouts[key] = build_layout(self._get_cached_chars(), *key)
+        return self._layouts[key]
+    
+    
+    def get_spatial_index(self, loose=True):
+        """
+        *Requires* :mod:`numpy`
+        
+        Get a spatial index over the character boxes of the page, for fast point, region and nearest-neighbour queries.
+        The index is built once and cached on the text page.
+        
+        Parameters:
+            loose (bool): Whether to index loose rather than tight character boxes.
+        Returns:
+            CharSpatialIndex: The index.
+        """
+        if loose not in self._spatial_indices:
+            self._spatial_indices[loose] = CharSpatialIndex(self._get_cached_chars(), loose=loose)
+        return self._spatial_indices[loose]
+    
+    
     def get_rectboxes(self, index=0, count=0):
         """
         Get the bounding boxes of text rectangles in the requested scope.
@@ -214,32 +390,123 @@ class PdfTextPage:
             Coordinates for left, bottom, right, and top (as :class:`float` values).
         """
         n_rects = self.count_rects(index, count)
+        left, top, right, bottom = c_double(), c_double(), c_double(), c_double()
         for index in range(n_rects):
-            left, top, right, bottom = c_double(), c_double(), c_double(), c_double()
             pdfium.FPDFText_GetRect(self.raw, index, left, top, right, bottom)
             yield (left.value, bottom.value, right.value, top.value)
     
     
-    def get_links(self):
+    def _get_rect_values(self, n_rects, values):
+        # FPDFText_GetRect() refers to the rectangles computed by the latest FPDFText_CountRects() call
+        raw = self.raw
+        left, top, right, bottom = c_double(), c_double(), c_double(), c_double()
+        for i in range(n_rects):
+            pdfium.FPDFText_GetRect(raw, i, left, top, right, bottom)
+            values.append( (left.value, bottom.value, right.value, top.value) )
+    
+    
+    def get_rectboxes_array(self, index=0, count=0):
         """
-        Iterate through web links on the page.
+        *Requires* :mod:`numpy`
         
-        Yields:
-            :class:`str`: A web link string.
+        Get the bounding boxes of text rectangles in the requested scope at once.
+        
+        Returns:
+            numpy.ndarray: Array of shape ``(n_rects, 4)`` holding left, bottom, right and top coordinates.
         """
         
-        links = pdfium.FPDFLink_LoadWebLinks(self.raw)
+        if numpy is None:
+            raise RuntimeError("NumPy library needs to be installed for get_rectboxes_array().")
+        
+        values = []
+        self._get_rect_values(self.count_rects(index, count), values)
+        return numpy.array(values, dtype=numpy.float64).reshape(-1, 4)
+    
+    
+    def get_rectboxes_multi(self, spans):
+        """
+        *Requires* :mod:`numpy`
+        
+        Get the text rectangles of many character spans at once, e. g. of all search hits on the page.
+        
+        Parameters:
+            spans (typing.Iterable[typing.Tuple[int, int]]):
+                Character index and count of each span.
+        Returns:
+            (numpy.ndarray, numpy.ndarray):
+            An array of shape ``(n_rects, 4)`` with the rectangles of all spans, and an array of ``n_spans+1`` offsets,
+            so that the rectangles of span ``i`` are ``boxes[offsets[i]:offsets[i+1]]``.
+        """
+        
+        if numpy is None:
+            raise RuntimeError("NumPy library needs to be installed for get_rectboxes_multi().")
+        
+        values = []
+        offsets = [0]
+        for index, count in spans:
+            self._get_rect_values(self.count_rects(index, count), values)
+            offsets.append( len(values) )
+        
+        boxes = numpy.array(values, dtype=numpy.float64).reshape(-1, 4)
+        return boxes, numpy.array(offsets, dtype=numpy.intp)
+    
+    
+    def _get_weblinks_handle(self):
+        if not self._weblinks_handle:
+            self._weblinks_handle.append( pdfium.FPDFLink_LoadWebLinks(self.raw) )
+        return self._weblinks_handle[0]
+    
+    
+    def get_weblinks(self):
+        """
+        Detect web links in the text of the page.
+        The PDFium weblinks handle and the result are cached on the text page, so repeated calls are cheap.
+        Each call returns a new list, so callers may modify it without affecting the cache.
+        
+        Returns:
+            typing.List[WebLink]: URL, character range and text rectangles of each link.
+        """
+        
+        if self._weblinks is not None:
+            return list(self._weblinks)
+        
+        links = self._get_weblinks_handle()
         n_links = pdfium.FPDFLink_CountWebLinks(links)
+        start, count = ctypes.c_int(), ctypes.c_int()
+        left, top, right, bottom = c_double(), c_double(), c_double(), c_double()
         
+        weblinks = []
         for i in range(n_links):
-            n_chars = pdfium.FPDFLink_GetURL(links, i, None, 0)
-            n_bytes = n_chars * 2
-            buffer = ctypes.create_string_buffer(n_bytes)
-            buffer_ptr = ctypes.cast(buffer, ctypes.POINTER(ctypes.c_ushort))
-            pdfium.FPDFLink_GetURL(links, i, buffer_ptr, n_chars)
-            yield buffer.raw[:n_bytes-2].decode("utf-16-le")
+            
+            n_units = pdfium.FPDFLink_GetURL(links, i, None, 0)
+            buffer = _utf16_scratch.get(n_units)
+            pdfium.FPDFLink_GetURL(links, i, buffer, n_units)
+            url = _utf16_scratch.decode(max(0, n_units-1), "ignore")
+            
+            if not pdfium.FPDFLink_GetTextRange(links, i, start, count):
+                start.value, count.value = -1, 0
+            
+            rects = []
+            for r in range( pdfium.FPDFLink_CountRects(links, i) ):
+                pdfium.FPDFLink_GetRect(links, i, r, left, top, right, bottom)
+                rects.append( (left.value, bottom.value, right.value, top.value) )
+            
+            weblinks.append( WebLink(url, start.value, count.value, rects) )
+        
+        self._weblinks = tuple(weblinks)
+        return weblinks
+    
+    
+    def get_links(self):
+        """
+        Iterate through web links on the page.
+        See :meth:`.get_weblinks` to also get the character range and rectangles of each link.
         
-        pdfium.FPDFLink_CloseWebLinks(links)
+        Yields:
+            :class:`str`: A web link string.
+        """
+        for link in self.get_weblinks():
+            yield link.url
     
     
     def search(self, text, index=0, match_case=False, match_whole_word=False):
@@ -273,6 +540,27 @@ class PdfTextPage:
         enc_text_ptr = ctypes.cast(enc_text, ctypes.POINTER(ctypes.c_ushort))
         search = pdfium.FPDFText_FindStart(self.raw, enc_text_ptr, flags, index)
         return PdfTextSearcher(search, self)
+    
+    
+    def search_many(self, terms, match_case=False, match_whole_word=False, rects=True):
+        """
+        Locate all occurrences of several strings on the page in a single pass over the text.
+        To search many pages for the same terms, create a :class:`.TextMatcher` once and call its :meth:`~.TextMatcher.search` method instead.
+        
+        Parameters:
+            terms (typing.Sequence[str]):
+                The strings to search for.
+            match_case (bool):
+                See :meth:`.search`.
+            match_whole_word (bool):
+                See :meth:`.search`.
+            rects (bool):
+                Whether to include the text rectangles of each occurrence.
+        Returns:
+            typing.List[tuple]: Occurrences as returned by :meth:`.TextMatcher.search`.
+        """
+        matcher = TextMatcher(terms, match_case=match_case, match_whole_word=match_whole_word)
+        return matcher.search(self, rects=rects)
 
 
 class PdfTextSearcher:
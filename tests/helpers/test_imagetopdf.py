@@ -0,0 +1,107 @@
+# SPDX-FileCopyrightText: 2022 geisserml <geisserml@gmail.com>
+# SPDX-License-Identifier: Apache-2.0 OR BSD-3-Clause
+
+import os
+import re
+import shutil
+import numpy
+import pytest
+import PIL.Image
+import pypdfium2 as pdfium
+from ..conftest import TestFiles
+
+
+def test_read_jpeg_info(tmp_path):
+    
+    info = pdfium.read_jpeg_info(TestFiles.mona_lisa)
+    assert (info.width, info.height, info.n_components) == (120, 120, 3)
+    assert info.dpi == (100, 100)
+    assert info.path == TestFiles.mona_lisa
+    
+    infos = pdfium.read_jpeg_infos([TestFiles.mona_lisa]*3, n_threads=2)
+    assert [i.width for i in infos] == [120] * 3
+    
+    with pytest.raises(ValueError, match="Not a JPEG file"):
+        pdfium.read_jpeg_info(TestFiles.empty)
+    
+    with open(TestFiles.mona_lisa, "rb") as fh:
+        data = fh.read()
+    for n_bytes in (5, 12):
+        truncated = str(tmp_path / ("truncated_%s.jpg" % n_bytes))
+        with open(truncated, "wb") as fh:
+            fh.write(data[:n_bytes])
+        with pytest.raises(ValueError, match=re.escape("Truncated JPEG file: '%s'" % truncated)):
+            pdfium.read_jpeg_info(truncated)
+    
+    garbage = str(tmp_path / "garbage.jpg")
+    with open(garbage, "wb") as fh:
+        fh.write(b"\xff\xd8\xff\xe0\x00\x01")
+    with pytest.raises(ValueError, match="Invalid segment length"):
+        pdfium.read_jpeg_info(garbage)
+
+
+@pytest.mark.parametrize("inline", [False, True])
+def test_jpegs_to_pdf(tmp_path, inline):
+    
+    paths = []
+    for i in range(10):
+        path = str(tmp_path / ("%s.jpg" % i))
+        shutil.copyfile(TestFiles.mona_lisa, path)
+        paths.append(path)
+    
+    pdf = pdfium.jpegs_to_pdf(paths, inline=inline, max_open_files=3)
+    assert len(pdf) == 10
+    assert pdf.get_page_size(0) == pytest.approx((120*72/100, 120*72/100))
+    handle_pool = pdf._data_closer[0]
+    assert len(handle_pool._handles) <= 3
+    
+    output = tmp_path / "output.pdf"
+    with open(output, "wb") as buffer:
+        pdf.save(buffer)
+    assert len(handle_pool._handles) <= 3
+    pdf.close()
+    assert len(handle_pool._handles) == 0
+    
+    with open(TestFiles.mona_lisa, "rb") as fh:
+        jpeg_data = fh.read()
+    pdf = pdfium.PdfDocument(str(output))
+    for page in pdf:
+        image = next( page.get_objects() )
+        assert image.get_data() == jpeg_data
+        assert image.get_pos() == pytest.approx((0, 0, *page.get_size()))
+    
+    pdf = pdfium.jpegs_to_pdf(paths[:1], dpi=72)
+    assert pdf.get_page_size(0) == pytest.approx((120, 120))
+
+
+def test_images_to_pdf(tmp_path):
+    
+    np_rgb = numpy.random.default_rng(0).integers(0, 256, (60, 80, 3), dtype=numpy.uint8)
+    png_path = str(tmp_path / "image.png")
+    PIL.Image.fromarray(np_rgb).save(png_path, dpi=(144, 144))
+    tiff_path = str(tmp_path / "image.tiff")
+    frames = [PIL.Image.fromarray(np_rgb[..., 0]), PIL.Image.fromarray(np_rgb)]
+    frames[0].save(tiff_path, save_all=True, append_images=frames[1:])
+    
+    paths = [png_path, TestFiles.mona_lisa, tiff_path] * 3
+    pdf = pdfium.images_to_pdf(paths, n_threads=2)
+    assert len(pdf) == 12
+    
+    expected = [
+        ((40, 30), ["BGR"], np_rgb[..., ::-1]),
+        ((86.4, 86.4), ["DCTDecode"], None),
+        ((80, 60), ["L"], np_rgb[..., :1]),
+        ((80, 60), ["BGR"], np_rgb[..., ::-1]),
+    ] * 3
+    for page, (size, kind, pixels) in zip(pdf, expected):
+        assert page.get_size() == pytest.approx(size, abs=0.01)
+        image = next( page.get_objects() )
+        if kind == ["DCTDecode"]:
+            assert image.get_filters() == kind
+        else:
+            np_array, cl_format = image.get_bitmap()
+            assert [cl_format] == kind
+            assert numpy.array_equal(np_array, pixels)
+    
+    with pytest.raises(ValueError, match="Not a JPEG file"):
+        pdfium.jpegs_to_pdf([png_path])
@@ -1,6 +1,10 @@
 # SPDX-FileCopyrightText: 2022 geisserml <geisserml@gmail.com>
 # SPDX-License-Identifier: Apache-2.0 OR BSD-3-Clause
 
+import gc
+import io
+import weakref
+import numpy
 import pytest
 import pypdfium2 as pdfium
 from os.path import join
@@ -136,3 +140,194 @@ def test_pageobj_placement():
     
     with open(join(OutputDir, "pageobj_placement.pdf"), "wb") as buf:
         dest_pdf.save(buf)
+
+
+def test_matrix_array():
+    
+    rng = numpy.random.default_rng(0)
+    n = 50
+    base = rng.normal(size=(n, 6))
+    angles = rng.uniform(0, 360, n)
+    shifts = rng.normal(size=(n, 2))
+    
+    array = pdfium.PdfMatrixArray(base)
+    array.rotate(angles)
+    array.translate(shifts[:, 0], shifts[:, 1])
+    array.scale(2, 0.5)
+    array.mirror(angles > 180, False)
+    array.skew(10, angles/10)
+    array.multiply( pdfium.PdfMatrix(1, 2, 3, 4, 5, 6) )
+    
+    expected = []
+    for i in range(n):
+        matrix = pdfium.PdfMatrix(*base[i])
+        matrix.rotate(angles[i])
+        matrix.translate(*shifts[i])
+        matrix.scale(2, 0.5)
+        matrix.mirror(angles[i] > 180, False)
+        matrix.skew(10, angles[i]/10)
+        matrix.multiply( pdfium.PdfMatrix(1, 2, 3, 4, 5, 6) )
+        expected.append(matrix)
+    assert numpy.allclose(array.array, pdfium.PdfMatrixArray.from_matrices(expected).array)
+    assert len(array.to_matrices()) == n
+    
+    product = array.copy()
+    product.multiply( array.inverse() )
+    assert numpy.allclose(product.array, pdfium.PdfMatrixArray.identity(n).array)
+    assert numpy.isnan( pdfium.PdfMatrixArray([0, 0, 0, 0, 1, 1]).inverse().array ).all()
+    
+    points = rng.normal(size=(n, 2))
+    transformed = array.transform_points(points)
+    for (x, y), (tx, ty), m in zip(points, transformed, expected):
+        assert (tx, ty) == pytest.approx( (m.a*x + m.c*y + m.e, m.b*x + m.d*y + m.f) )
+    assert array.transform_points( rng.normal(size=(n, 3, 2)) ).shape == (n, 3, 2)
+    
+    # a single matrix is broadcast against any number of values
+    rotation = pdfium.PdfMatrixArray.identity(1)
+    rotation.rotate(90)
+    assert numpy.allclose(rotation.transform_boxes([[0, 0, 2, 1], [1, 1, 2, 2]]), [[0, -2, 1, 0], [1, -2, 2, -1]])
+    rotation.translate([0, 10, 20], 0)
+    assert len(rotation) == 3
+
+
+def test_transform_objects():
+    
+    pdf = pdfium.PdfDocument.new()
+    page = pdf.new_page(500, 500)
+    objects = []
+    for _ in range(20):
+        pageobj = pdfium.PdfPageObject(pdfium.FPDFPageObj_CreateNewRect(0, 0, 10, 10), pdfium.FPDF_PAGEOBJ_PATH, pdf=pdf)
+        page.insert_object(pageobj)
+        objects.append(pageobj)
+    
+    matrices = pdfium.PdfMatrixArray.identity(len(objects))
+    matrices.translate(numpy.arange(20) * 20, 100)
+    pdfium.transform_objects(objects, matrices, replace=True)
+    assert [o.get_matrix() for o in objects] == matrices.to_matrices()
+    
+    pdfium.transform_objects(objects, pdfium.PdfMatrix(1, 0, 0, 1, 5, 5))
+    assert objects[3].get_pos() == pytest.approx( (65, 105, 75, 115) )
+    
+    inventory = page.get_objects_inventory()
+    inventory.transform(pdfium.PdfMatrixArray([2, 0, 0, 2, 0, 0]), indices=[0, 1])
+    assert objects[1].get_matrix() == pdfium.PdfMatrix(2, 0, 0, 2, 50, 210)
+    assert objects[2].get_matrix() == pdfium.PdfMatrix(1, 0, 0, 1, 45, 105)
+    
+    with pytest.raises(ValueError):
+        pdfium.transform_objects(objects, pdfium.PdfMatrixArray.identity(3))
+
+
+def _make_source(colours):
+    # pages of 100x100 units with a trim box inset by 10 units, filled with a colour (including the bleed area)
+    pdf = pdfium.PdfDocument.new()
+    for colour in colours:
+        page = pdf.new_page(100, 100)
+        rect = pdfium.PdfPageObject(pdfium.FPDFPageObj_CreateNewRect(0, 0, 100, 100), pdfium.FPDF_PAGEOBJ_PATH, pdf=pdf)
+        pdfium.FPDFPageObj_SetFillColor(rect.raw, *colour, 255)
+        pdfium.FPDFPath_SetDrawMode(rect.raw, pdfium.FPDF_FILLMODE_ALTERNATE, False)
+        page.insert_object(rect)
+        page.generate_content()
+        page.set_trimbox(10, 10, 90, 90)
+    return pdf
+
+
+def _get_coloured_box(page, colour):
+    # bounding box of pixels in the given colour, in PDF coordinates (1 pixel per unit)
+    np_array, _ = page.render_to(pdfium.BitmapConv.numpy_ndarray, scale=1)
+    ys, xs = numpy.nonzero( numpy.all(np_array[..., 2::-1] == colour, axis=-1) )
+    height = np_array.shape[0]
+    return (xs.min(), height - ys.max() - 1, xs.max() + 1, height - ys.min())
+
+
+def test_booklet_layout():
+    
+    sheets = list( pdfium.booklet_layout(10, (200, 100)) )
+    assert [[p.index for p in s.placements] for s in sheets] == [[None, 0], [1, None], [9, 2], [3, 8], [7, 4], [5, 6]]
+    sheets = list( pdfium.booklet_layout(10, (200, 100), signature_size=8) )
+    assert [[p.index for p in s.placements] for s in sheets] == [[7, 0], [1, 6], [5, 2], [3, 4], [None, 8], [9, None]]
+    assert sheets[0].placements[0].box == (0, 0, 100, 100)
+    with pytest.raises(ValueError):
+        list( pdfium.booklet_layout(10, (200, 100), signature_size=6) )
+
+
+def test_impose():
+    
+    red, blue = (255, 0, 0), (0, 0, 255)
+    src_pdf = _make_source([red, blue])
+    src_pdf.get_page(1).set_rotation(90)
+    src_data = src_pdf.save_to_bytes()
+    
+    sheets = pdfium.grid_layout(2, (200, 120), 1, 2, margin=10, gutter=20, rotations=[0, 90])
+    dest_pdf = pdfium.impose(src_pdf, sheets)
+    assert len(dest_pdf) == 1
+    page = dest_pdf.get_page(0)
+    # trim boxes are fitted to the cells (80x100 units), and content outside is clipped
+    assert _get_coloured_box(page, red) == (10, 20, 90, 100)
+    assert _get_coloured_box(page, blue) == (110, 20, 190, 100)
+    
+    # the source document is left untouched, and pages without crop box do not get one
+    assert src_pdf.save_to_bytes() == src_data
+    assert b"/CropBox" not in src_data
+    
+    dest_pdf = pdfium.impose(src_pdf, pdfium.grid_layout(1, (120, 120), 1, 1, margin=20, bleed=5))
+    assert _get_coloured_box(dest_pdf.get_page(0), red) == (15, 15, 105, 105)
+    
+    # each source page is captured once, however often it is placed
+    dest_pdf = pdfium.impose(src_pdf, pdfium.step_repeat_layout(2, (400, 400), 4, 4))
+    assert len(dest_pdf) == 2
+    assert len( list(dest_pdf.get_page(1).get_objects(max_depth=1)) ) == 16
+    buffer = io.BytesIO()
+    dest_pdf.save(buffer)
+    assert buffer.getvalue().count(b"/Subtype/Form") == 2
+
+
+def test_xobject_cache():
+    
+    src_pdf = _make_source([(255, 0, 0), (0, 0, 255)])
+    
+    def compose(cache):
+        dest_pdf = pdfium.PdfDocument.new()
+        for _ in range(5):
+            xobject = src_pdf.page_as_xobject(0, dest_pdf, cache=cache)
+            page = dest_pdf.new_page(100, 100)
+            page.insert_object( xobject.as_pageobject() )
+            page.generate_content()
+        buffer = io.BytesIO()
+        dest_pdf.save(buffer)
+        return dest_pdf, buffer.getvalue()
+    
+    _, uncached_data = compose(False)
+    dest_pdf, cached_data = compose(True)
+    assert uncached_data.count(b"/Subtype/Form") == 5
+    assert cached_data.count(b"/Subtype/Form") == 1
+    assert len(cached_data) < len(uncached_data)
+    
+    xobject_a = src_pdf.page_as_xobject(0, dest_pdf, cache=True)
+    xobject_b = src_pdf.page_as_xobject(-2, dest_pdf, cache=True)
+    xobject_c = src_pdf.page_as_xobject(1, dest_pdf, cache=True)
+    assert xobject_a is xobject_b
+    assert xobject_a is not xobject_c
+    assert src_pdf.page_as_xobject(0, dest_pdf) is not xobject_a
+    
+    # the XObject is closed with its last reference (five from composing, and two above)
+    for _ in range(7):
+        assert xobject_a.raw is not None
+        xobject_a.close()
+    assert xobject_a.raw is None
+    assert src_pdf.page_as_xobject(0, dest_pdf, cache=True) is not xobject_a
+    
+    # remaining cached XObjects are closed with the document
+    dest_pdf.close()
+    assert xobject_c.raw is None
+    
+    # the cache does not form a reference cycle with the target document, so it is freed without the cyclic garbage collector
+    gc.disable()
+    try:
+        dest_pdf = pdfium.PdfDocument.new()
+        xobject = src_pdf.page_as_xobject(0, dest_pdf, cache=True)
+        dest_ref = weakref.ref(dest_pdf)
+        del dest_pdf
+        assert dest_ref() is None
+        assert xobject.raw is None and xobject.pdf is None
+    finally:
+        gc.enable()
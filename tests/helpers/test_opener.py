@@ -3,11 +3,14 @@
 
 import os
 import io
+import sys
 import re
 import shutil
 import logging
 import weakref
+import timeit
 import tempfile
+import subprocess
 import traceback
 import pytest
 import PIL.Image
@@ -285,3 +288,180 @@ def test_doc_extras():
         del pdf[-len(pdf)]
         page = pdf[-len(pdf)]
         assert page.get_size() == pdf.get_page_size(-len(pdf)) == (150, 200)
+
+
+def test_arena():
+    
+    pdf = pdfium.PdfDocument(TestFiles.multipage)
+    
+    with pdf.arena():
+        page = pdf.get_page(0)
+        textpage = page.get_textpage()
+        assert page._finalizer is None and textpage._finalizer is None
+        assert pdf._arena == [page, textpage]
+        closed_page = pdf.get_page(1)
+        closed_page.close()
+        with pdf.arena():
+            inner_page = pdf.get_page(2)
+        assert inner_page.raw is None
+        assert pdf._arena == [page, textpage, closed_page]
+        assert textpage.get_text_range() == page.get_textpage().get_text_range()
+    
+    assert pdf._arena is None
+    
+    # all children of the arena were closed and cannot be used anymore
+    for child in (page, textpage, closed_page, inner_page):
+        assert child.raw is None
+        assert child._tree_closed()
+    with pytest.raises(pdfium.PdfiumError, match="Loading the text page failed"):
+        page.get_textpage()
+    
+    # closing the document within the block closes the children of all open arenas first
+    with pdf.arena():
+        outer_page = pdf.get_page(0)
+        with pdf.arena():
+            inner_page = pdf.get_page(1)
+            inner_textpage = inner_page.get_textpage()
+            pdf.close()
+            for child in (outer_page, inner_page, inner_textpage):
+                assert child.raw is None
+    assert pdf._arena is None and pdf._arenas == []
+    
+    # helpers have instance dictionaries unless lean mode was enabled (see test_lean_helpers())
+    pdf = pdfium.PdfDocument(TestFiles.multipage)
+    if not pdfium._helpers.misc._lean_helpers:
+        page = pdf.get_page(0)
+        for obj in (page, page.get_textpage(), next(page.get_objects()), pdfium.PdfMatrix()):
+            obj.custom_attribute = True
+
+
+def test_arena_benchmark():
+    
+    pdf = pdfium.PdfDocument.new()
+    for _ in range(100):
+        pdf.new_page(100, 100).close()
+    
+    def load_regular():
+        for i in range(len(pdf)):
+            page = pdf.get_page(i)
+            page.get_textpage().close()
+            page.close()
+    
+    def load_arena():
+        with pdf.arena():
+            for i in range(len(pdf)):
+                pdf.get_page(i).get_textpage()
+    
+    # without individual finalizers, loading cheap pages and text pages should be faster (about 0.7x here)
+    time_regular = min( timeit.repeat(load_regular, number=20, repeat=7) )
+    time_arena = min( timeit.repeat(load_arena, number=20, repeat=7) )
+    assert time_arena < time_regular
+
+
+def test_lean_helpers():
+    
+    # lean mode is chosen at import time, so check it in a separate interpreter
+    code = """
+import pypdfium2 as pdfium
+pdf = pdfium.PdfDocument(%r)
+with pdf.arena():
+    page = pdf.get_page(0)
+    objects = [page, page.get_textpage(), next(page.get_objects()), pdfium.PdfMatrix(), pdfium.OutlineItem(0, "", False, 0, None, 0, [])]
+    for obj in objects:
+        assert not hasattr(obj, "__dict__"), obj
+        try:
+            obj.custom_attribute = True
+        except AttributeError:
+            pass
+        else:
+            raise AssertionError(obj)
+""" % TestFiles.multipage
+    env = dict(os.environ, PYPDFIUM_LEAN_HELPERS="1")
+    subprocess.run([sys.executable, "-c", code], env=env, check=True)
+
+
+def test_document_cache():
+    
+    cache = pdfium.PdfDocumentCache(max_handles=2)
+    pdf_a = cache.get(TestFiles.multipage)
+    assert isinstance(pdf_a, pdfium.PdfDocument)
+    assert cache.get(TestFiles.multipage) is pdf_a
+    assert len(cache) == 1
+    
+    page = pdf_a.get_page(0)
+    pdf_b = cache.get(TestFiles.render)
+    pdf_c = cache.get(TestFiles.text)
+    assert len(cache) == 2
+    
+    # the evicted document stays usable while its pages are alive
+    assert pdf_a.raw is not None
+    assert page.get_size() == pdf_a.get_page_size(0)
+    assert cache.get(TestFiles.multipage) is not pdf_a
+    
+    # closed documents are not handed out again
+    pdf_c.close()
+    assert cache.get(TestFiles.text) is not pdf_c
+    
+    # evicted documents without other references are finalised
+    finalizer = cache.get(TestFiles.render)._finalizer
+    cache.clear()
+    assert len(cache) == 0
+    assert not finalizer.alive
+
+
+def test_document_cache_keys():
+    
+    cache = pdfium.PdfDocumentCache()
+    pdf_owner = cache.get(TestFiles.encrypted, password="test_owner")
+    pdf_user = cache.get(TestFiles.encrypted, password="test_user")
+    pdf_buffer = cache.get(TestFiles.encrypted, password="test_owner", file_access=pdfium.FileAccess.BUFFER)
+    assert len({id(pdf_owner), id(pdf_user), id(pdf_buffer)}) == 3
+    
+    # entries for other passwords or access modes are not treated as outdated
+    assert len(cache) == 3
+    assert cache.get(TestFiles.encrypted, password=b"test_owner") is pdf_owner
+    
+    assert isinstance(pdfium.default_document_cache, pdfium.PdfDocumentCache)
+
+
+def test_probe():
+    
+    info = pdfium.PdfDocument.probe(TestFiles.multipage)
+    assert isinstance(info, pdfium.DocumentInfo)
+    assert info.n_pages == 3
+    assert len(info.page_sizes) == 3
+    assert info.is_encrypted is False
+    assert info.metadata["Producer"] == "Scribus PDF Library 1.5.7"
+    assert info.metadata["Title"] == ""
+    assert tuple(info.metadata.keys()) == pdfium.MetadataKeys
+    
+    info = pdfium.PdfDocument.probe(TestFiles.encrypted, password="test_user")
+    assert info.is_encrypted is True
+    
+    inputs = [TestFiles.multipage, TestFiles.render, TestFiles.text]
+    exp_infos = [pdfium.PdfDocument.probe(path) for path in inputs]
+    infos = list( pdfium.PdfDocument.probe_many(inputs, n_processes=2) )
+    assert [i.n_pages for i in infos] == [i.n_pages for i in exp_infos]
+    assert [i.page_sizes for i in infos] == [i.page_sizes for i in exp_infos]
+    infos = list( pdfium.PdfDocument.probe_many((path for path in inputs), n_processes=2) )
+    assert [i.n_pages for i in infos] == [i.n_pages for i in exp_infos]
+    
+    pdf = pdfium.PdfDocument(TestFiles.multipage)
+    assert exp_infos[0].page_sizes == [tuple(s) for s in pdf.get_page_sizes()[["width", "height"]].tolist()]
+
+
+def test_probe_closes(monkeypatch):
+    
+    closed = []
+    orig_close = pdfium.PdfDocument.close
+    def close(pdf):
+        closed.append(pdf)
+        orig_close(pdf)
+    def get_metadata_dict(pdf, *args, **kwargs):
+        raise RuntimeError("metadata failure")
+    
+    monkeypatch.setattr(pdfium.PdfDocument, "close", close)
+    monkeypatch.setattr(pdfium.PdfDocument, "get_metadata_dict", get_metadata_dict)
+    with pytest.raises(RuntimeError, match="metadata failure"):
+        pdfium.PdfDocument.probe(TestFiles.multipage)
+    assert len(closed) == 1 and closed[0].raw is None
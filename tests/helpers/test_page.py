@@ -5,7 +5,12 @@ from os.path import (
     join,
     exists,
 )
+import io
+import os
+import ctypes
+import numpy
 import pytest
+import PIL.Image
 import pypdfium2 as pdfium
 from ..conftest import TestFiles, OutputDir
 
@@ -34,6 +39,52 @@ def test_boxes():
         assert pytest.approx(box) == exp_box
 
 
+def test_page_sizes():
+    
+    pdf = pdfium.PdfDocument(TestFiles.multipage)
+    sizes = pdf.get_page_sizes()
+    assert sizes.dtype.names == ("width", "height")
+    assert len(sizes) == len(pdf)
+    for i, (width, height) in enumerate(sizes):
+        assert (width, height) == pytest.approx(pdf.get_page_size(i))
+    
+    page = pdf.get_page(1)
+    page.set_rotation(90)
+    page.set_cropbox(10, 10, 100, 200)
+    sizes = pdf.get_page_sizes(rotations=True, cropboxes=True)
+    assert list(sizes["rotation"]) == [0, 90, 0]
+    assert tuple(sizes["cropbox"][1]) == (10, 10, 100, 200)
+    assert tuple(sizes["cropbox"][0]) == pytest.approx(pdf.get_page(0).get_cropbox())
+    
+    pdf = pdfium.PdfDocument(TestFiles.box_fallback)
+    sizes = pdf.get_page_sizes(cropboxes=True)
+    assert tuple(sizes["cropbox"][0]) == (0, 0, 612, 792)
+
+
+def test_page_sizes_errors(monkeypatch):
+    
+    pdf = pdfium.PdfDocument(TestFiles.multipage)
+    closed = []
+    orig_close = pdfium.FPDF_ClosePage
+    def close_page(raw_page):
+        closed.append(raw_page)
+        orig_close(raw_page)
+    monkeypatch.setattr(pdfium._pypdfium, "FPDF_ClosePage", close_page)
+    
+    # the transient page is closed even if reading its properties fails
+    with monkeypatch.context() as m:
+        m.setattr(pdfium._pypdfium, "FPDFPage_GetRotation", lambda raw_page: 42)
+        with pytest.raises(KeyError):
+            pdf.get_page_sizes(rotations=True)
+    assert len(closed) == 1
+    
+    with monkeypatch.context() as m:
+        m.setattr(pdfium._pypdfium, "FPDF_LoadPage", lambda raw_pdf, index: None)
+        with pytest.raises(pdfium.PdfiumError, match="Failed to load page 0."):
+            pdf.get_page_sizes(cropboxes=True)
+    assert len(closed) == 1
+
+
 def test_mediabox_fallback():
     pdf = pdfium.PdfDocument(TestFiles.box_fallback)
     page = pdf.get_page(0)
@@ -93,6 +144,191 @@ def test_misc_objects():
         assert len(pos) == 4
 
 
+def test_objects_inventory():
+    
+    pdf = pdfium.PdfDocument(TestFiles.render)
+    page = pdf.get_page(0)
+    
+    objects = list( page.get_objects() )
+    inventory = page.get_objects_inventory(matrices=True)
+    assert len(inventory) == len(objects)
+    assert inventory.array["type"].tolist() == [o.type for o in objects]
+    assert (inventory.array["level"] == 0).all() and (inventory.array["parent"] == -1).all()
+    for box, obj in zip(inventory.array["box"], objects):
+        assert pytest.approx(tuple(box), abs=1e-3) == obj.get_pos()
+    for matrix, obj in zip(inventory.array["matrix"], objects):
+        assert pytest.approx(tuple(matrix), abs=1e-3) == obj.get_matrix().get()
+    
+    obj = inventory.get_object(1)
+    assert obj.raw is inventory._handles[1]
+    assert obj.type == objects[1].type and obj.page is page
+    
+    text_indices = numpy.flatnonzero(inventory.array["type"] == pdfium.FPDF_PAGEOBJ_TEXT)
+    assert len(text_indices) > 0
+    assert all(o.type == pdfium.FPDF_PAGEOBJ_TEXT for o in inventory.get_objects(text_indices))
+    
+    # nested objects of a Form XObject
+    dest_pdf = pdfium.PdfDocument.new()
+    dest_page = dest_pdf.new_page(*page.get_size())
+    dest_page.insert_object( pdf.page_as_xobject(0, dest_pdf).as_pageobject() )
+    dest_page.generate_content()
+    
+    for max_depth in (1, 2):
+        inventory = dest_page.get_objects_inventory(max_depth=max_depth)
+        assert inventory.array["type"].tolist() == [o.type for o in dest_page.get_objects(max_depth=max_depth)]
+        assert inventory.array["level"].tolist() == [o.level for o in dest_page.get_objects(max_depth=max_depth)]
+    assert len(inventory) == len(objects) + 1
+    assert inventory.array["type"][0] == pdfium.FPDF_PAGEOBJ_FORM
+    assert inventory.array["parent"].tolist() == [-1] + [0]*len(objects)
+
+
+def test_get_objects_filters():
+    
+    def addr(raw):
+        return ctypes.cast(raw, ctypes.c_void_p).value
+    
+    pdf = pdfium.PdfDocument(TestFiles.render)
+    page = pdf.get_page(0)
+    objects = list( page.get_objects() )
+    
+    text_objects = list( page.get_objects(types=[pdfium.FPDF_PAGEOBJ_TEXT]) )
+    assert len(text_objects) > 0
+    assert [addr(o.raw) for o in text_objects] == [addr(o.raw) for o in objects if o.type == pdfium.FPDF_PAGEOBJ_TEXT]
+    assert list( page.get_objects(types=[]) ) == []
+    
+    width, height = page.get_size()
+    bbox = (0, height/2, width/2, height)
+    def intersects(pos):
+        return not (pos[0] > bbox[2] or pos[2] < bbox[0] or pos[1] > bbox[3] or pos[3] < bbox[1])
+    in_bbox = list( page.get_objects(bbox=bbox) )
+    assert 0 < len(in_bbox) < len(objects)
+    assert [addr(o.raw) for o in in_bbox] == [addr(o.raw) for o in objects if intersects(o.get_pos())]
+    
+    calls = []
+    def predicate(raw):
+        calls.append(raw)
+        return len(calls) % 2 == 0
+    filtered = list( page.get_objects(types=[pdfium.FPDF_PAGEOBJ_PATH], predicate=predicate) )
+    assert len(calls) == len([o for o in objects if o.type == pdfium.FPDF_PAGEOBJ_PATH])
+    assert [addr(o.raw) for o in filtered] == [addr(raw) for raw in calls[1::2]]
+    
+    # nested objects: forms are descended into even if not yielded, unless outside the bounding box
+    dest_pdf = pdfium.PdfDocument.new()
+    dest_page = dest_pdf.new_page(width, height)
+    form = pdf.page_as_xobject(0, dest_pdf).as_pageobject()
+    matrix = pdfium.PdfMatrix()
+    matrix.translate(width, 0)
+    form.set_matrix(matrix)
+    dest_page.insert_object(form)
+    dest_page.generate_content()
+    
+    nested = list( dest_page.get_objects(types=[pdfium.FPDF_PAGEOBJ_TEXT]) )
+    assert len(nested) == len(text_objects) and all(o.level == 1 for o in nested)
+    assert list( dest_page.get_objects(bbox=(0, 0, width/2, height)) ) == []
+    assert len( list(dest_page.get_objects(bbox=(width, 0, 2*width, height))) ) == len(objects) + 1
+
+
+def test_image_extraction(tmp_path):
+    
+    pdf = pdfium.PdfDocument(TestFiles.images)
+    page = pdf.get_page(0)
+    image = next( page.get_objects(types=[pdfium.FPDF_PAGEOBJ_IMAGE]) )
+    metadata = image.get_info()
+    
+    assert image.get_filters() == ["CCITTFaxDecode"]
+    assert image.get_filters(skip_simple=True) == ["CCITTFaxDecode"]
+    assert len(image.get_data()) > 0
+    
+    bitmap, cl_format = image.get_bitmap()
+    assert cl_format == "L"
+    assert bitmap.shape == (metadata.height, metadata.width, 1)
+    rendered, cl_format = image.get_bitmap(render=True)
+    assert cl_format == "BGRA" and rendered.shape[2] == 4
+    
+    path = image.extract(str(tmp_path / "ccitt"))
+    assert path.endswith(".png") and exists(path)
+    
+    # JPEG streams are written as they are
+    jpeg_pdf = pdfium.PdfDocument.new()
+    jpeg_page = jpeg_pdf.new_page(100, 100)
+    jpeg_image = pdfium.PdfImageObject.new(jpeg_pdf)
+    jpeg_image.load_jpeg(open(TestFiles.mona_lisa, "rb"), inline=True)
+    jpeg_page.insert_object(jpeg_image)
+    assert jpeg_image.get_filters() == ["DCTDecode"]
+    path = jpeg_image.extract(str(tmp_path / "mona_lisa"))
+    assert path.endswith(".jpg")
+    with open(path, "rb") as fh_a, open(TestFiles.mona_lisa, "rb") as fh_b:
+        assert fh_a.read() == fh_b.read()
+
+
+@pytest.mark.parametrize("n_processes", [1, 2])
+def test_extract_images(tmp_path, n_processes):
+    
+    pdf = pdfium.PdfDocument(TestFiles.images)
+    results = list( pdf.extract_images(str(tmp_path), n_processes=n_processes, chunk_size=1) )
+    assert [index for index, _ in results] == list(range(len(pdf)))
+    
+    paths = [p for _, page_paths in results for p in page_paths]
+    assert len(paths) == 3
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(p) for p in set(paths))
+    
+    # running again re-uses the existing files
+    assert list( pdf.extract_images(str(tmp_path), n_processes=n_processes) ) == results
+
+
+def test_image_hashing():
+    
+    pdf = pdfium.PdfDocument(TestFiles.images)
+    page = pdf.get_page(0)
+    images = list( page.get_objects(types=[pdfium.FPDF_PAGEOBJ_IMAGE]) )
+    
+    hashes = [img.get_hash() for img in images]
+    assert len(set(hashes)) == 1
+    assert hashes[0] != images[0].get_hash("md5")
+    assert list( pdf.get_image_hashes(n_processes=1) ) == [(0, [(h, None) for h in hashes])]
+    
+    cache = pdfium.PdfImageCache()
+    bitmaps = [cache.get(img) for img in images]
+    assert cache.n_misses == 1 and cache.n_hits == 2 and len(cache) == 1
+    assert all(b is bitmaps[0] for b in bitmaps)
+    get_shape = lambda img: img.get_bitmap()[0].shape
+    assert [cache.get(img, func=get_shape) for img in images] == [bitmaps[0][0].shape] * 3
+    assert cache.n_misses == 2 and len(cache) == 2
+    cache = pdfium.PdfImageCache(max_entries=1)
+    cache.get(images[0])
+    cache.get(images[0], func=pdfium.PdfImageObject.get_perceptual_hash)
+    assert len(cache) == 1
+    
+    # perceptual hashes are robust to scaling
+    jpeg_pdf = pdfium.PdfDocument.new()
+    jpeg_page = jpeg_pdf.new_page(100, 100)
+    jpeg_image = pdfium.PdfImageObject.new(jpeg_pdf)
+    jpeg_image.load_jpeg(open(TestFiles.mona_lisa, "rb"), inline=True)
+    jpeg_image.set_matrix( pdfium.PdfMatrix(50, 0, 0, 75, 0, 0) )
+    jpeg_page.insert_object(jpeg_image)
+    hash_decoded = jpeg_image.get_perceptual_hash()
+    hash_rendered = jpeg_image.get_perceptual_hash(render=True)
+    hash_ccitt = images[0].get_perceptual_hash()
+    assert 0 <= hash_decoded < 2**64
+    assert pdfium.perceptual_hash_distance(hash_decoded, hash_rendered) <= 8
+    assert pdfium.perceptual_hash_distance(hash_decoded, hash_ccitt) > 16
+
+
+@pytest.mark.parametrize("shape", [(16, 18), (23, 31), (5, 7)])
+def test_perceptual_hash_uniform(shape):
+    
+    # the areas at the right and bottom edges must be averaged like all others, so a uniform image has no gradients
+    resampled = pdfium._helpers.pageobject._area_resample(numpy.ones(shape), 8, 9)
+    assert numpy.array_equal(resampled, numpy.ones((8, 9)))
+    
+    pdf = pdfium.PdfDocument.new()
+    page = pdf.new_page(100, 100)
+    image = pdfium.PdfImageObject.new(pdf)
+    image.set_bitmap( numpy.full(shape, 128, dtype=numpy.uint8) )
+    page.insert_object(image)
+    assert image.get_perceptual_hash() == 0
+
+
 def test_new_jpeg():
     
     pdf = pdfium.PdfDocument.new()
@@ -148,7 +384,46 @@ def test_new_jpeg():
     page.close()
     pdf.close()
     assert buffer.closed is True
+
+
+def test_set_bitmap():
+    
+    pdf = pdfium.PdfDocument.new()
+    page = pdf.new_page(100, 100)
+    np_bgr = numpy.random.default_rng(0).integers(0, 256, (30, 40, 3), dtype=numpy.uint8)
+    
+    sources = [
+        (np_bgr, None, np_bgr, "BGR"),
+        (np_bgr, "RGB", np_bgr[..., ::-1], "BGR"),
+        (np_bgr[:, ::2], "BGR", np_bgr[:, ::2], "BGR"),
+        (np_bgr[..., 0], None, np_bgr[..., :1], "L"),
+        (PIL.Image.fromarray(np_bgr), None, np_bgr[..., ::-1], "BGR"),
+        (PIL.Image.fromarray(np_bgr[..., 0]).convert("1"), None, None, "L"),
+    ]
+    for source, cl_format, expected, expected_format in sources:
+        image = pdfium.PdfImageObject.new(pdf)
+        width, height = image.set_bitmap(source, cl_format)
+        page.insert_object(image)
+        assert (width, height) == (source.shape[1], source.shape[0]) if isinstance(source, numpy.ndarray) else source.size
+        assert image.get_filters() == []
+        output, output_format = image.get_bitmap()
+        assert output_format == expected_format
+        if expected is not None:
+            assert numpy.array_equal(output, expected)
+    
+    # transparent images get a soft mask
+    image = pdfium.PdfImageObject.new(pdf)
+    image.set_bitmap( PIL.Image.fromarray(np_bgr).convert("RGBA") )
+    page.insert_object(image)
+    page.generate_content()
+    buffer = io.BytesIO()
+    pdf.save(buffer)
+    assert b"/SMask" in buffer.getvalue()
     
+    with pytest.raises(ValueError):
+        pdfium.PdfImageObject.new(pdf).set_bitmap(np_bgr, "BGRA")
+    with pytest.raises(ValueError):
+        pdfium.PdfImageObject.new(pdf).set_bitmap(np_bgr.astype(numpy.float32))
 
 
 def test_replace_image():
@@ -2,6 +2,7 @@
 # SPDX-License-Identifier: Apache-2.0 OR BSD-3-Clause
 
 import io
+import os
 import math
 import ctypes
 import weakref
@@ -392,7 +393,7 @@ def test_render_pdf_new(caplog):
         renderer = pdf.render_to(pdfium.BitmapConv.pil_image)
         image = next(renderer)
     
-    warning = "Cannot perform concurrent processing without input sources - saving the document implicitly to get picklable data."
+    warning = "Cannot perform concurrent processing without input sources - saving the document implicitly to get a file for the worker processes."
     assert warning in caplog.text
     
     assert isinstance(image, PIL.Image.Image)
@@ -400,6 +401,53 @@ def test_render_pdf_new(caplog):
     assert image.size == (50, 100)
     
 
+def test_update_rendering_input(monkeypatch):
+    
+    pdf = pdfium.PdfDocument(TestFiles.multipage)
+    pdf.update_rendering_input()
+    path = pdf._rendering_input
+    assert os.path.isfile(path)
+    
+    # by default, the document is always saved again
+    pdf.update_rendering_input()
+    assert pdf._rendering_input != path
+    assert not os.path.exists(path)
+    
+    # unchanged document: nothing is saved and the published file is retained
+    path = pdf._rendering_input
+    with monkeypatch.context() as m:
+        m.setattr(pdf, "save_to_bytes", lambda *args, **kwargs: pytest.fail("unchanged document was saved"))
+        pdf.update_rendering_input(skip_unchanged=True)
+    assert pdf._rendering_input == path
+    
+    pdf.del_page(0)
+    pdf.update_rendering_input(skip_unchanged=True)
+    assert pdf._rendering_input != path
+    
+    # page level changes are counted as well
+    path = pdf._rendering_input
+    page = pdf.get_page(0)
+    page.set_rotation(90)
+    page.close()
+    pdf.update_rendering_input(skip_unchanged=True)
+    assert pdf._rendering_input != path
+    
+    # changes through raw PDFium calls are not detected when skipping unchanged documents
+    path = pdf._rendering_input
+    pdfium.FPDFPage_Delete(pdf.raw, 0)
+    pdf.update_rendering_input(skip_unchanged=True)
+    assert pdf._rendering_input == path
+    pdf.update_rendering_input()
+    assert pdf._rendering_input != path
+    
+    images = [img for img in pdf.render_to(pdfium.BitmapConv.pil_image, scale=0.5)]
+    assert len(images) == len(pdf) == 1
+    
+    path = pdf._rendering_input
+    pdf.close()
+    assert not os.path.exists(path)
+    
+
 def test_render_pdfbuffer(caplog):
     
     buffer = open(TestFiles.multipage, "rb")
@@ -416,8 +464,9 @@ def test_render_pdfbuffer(caplog):
         image = next(renderer)
         assert isinstance(image, PIL.Image.Image)
     
-    assert isinstance(pdf._rendering_input, bytes)
-    warning = "Cannot perform concurrent rendering with buffer input - reading the whole buffer into memory implicitly."
+    assert os.path.isfile(pdf._rendering_input)
+    assert pdf._rendering_access is pdfium.FileAccess.NATIVE
+    warning = "Cannot perform concurrent processing with buffer input - copying the buffer to a temporary file implicitly."
     assert warning in caplog.text
 
 
@@ -436,7 +485,14 @@ def test_render_pdfbytes():
     )
     image = next(renderer)
     assert isinstance(image, PIL.Image.Image)
-    assert isinstance(pdf._rendering_input, bytes)
+    
+    # the workers get the path of a temporary file rather than the bytes
+    path = pdf._rendering_input
+    assert isinstance(path, str)
+    assert os.path.isfile(path)
+    assert pdf._rendering_access is pdfium.FileAccess.NATIVE
+    pdf.close()
+    assert not os.path.exists(path)
 
 
 def test_render_pdffile_asbuffer():
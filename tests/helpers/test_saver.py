@@ -2,6 +2,8 @@
 # SPDX-License-Identifier: Apache-2.0 OR BSD-3-Clause
 
 import io
+import os
+import pytest
 from os.path import join, isfile
 import pypdfium2 as pdfium
 from ..conftest import TestFiles, OutputDir
@@ -46,3 +48,67 @@ def test_save_withversion():
     
     reopened_pdf = pdfium.PdfDocument(buffer, autoclose=True)
     assert len(reopened_pdf) == 2
+
+
+def test_save_targets(tmp_path):
+    
+    pdf = pdfium.PdfDocument(TestFiles.multipage)
+    exp_data = pdf.save_to_bytes()
+    assert isinstance(exp_data, bytes)
+    assert exp_data.startswith(b"%PDF-")
+    
+    data = bytearray(b"prefix")
+    pdf.save(data)
+    assert data == b"prefix" + exp_data
+    
+    output_file = tmp_path / "fd_target.pdf"
+    fd = os.open(output_file, os.O_WRONLY | os.O_CREAT)
+    try:
+        pdf.save(fd)
+    finally:
+        os.close(fd)
+    assert output_file.read_bytes() == exp_data
+    
+    reopened_pdf = pdfium.PdfDocument(exp_data)
+    assert len(reopened_pdf) == len(pdf)
+
+
+@pytest.mark.parametrize("target", ["bytesio", "bytearray"])
+def test_save_large_blocks(monkeypatch, target):
+    
+    pdf = pdfium.PdfDocument(TestFiles.multipage)
+    exp_data = pdf.save_to_bytes()
+    
+    # PDFium emits blocks of up to 32 KiB, so a smaller chunk size makes blocks exceed the staging buffer
+    chunk_size = 4096
+    writer_class = pdfium._helpers.document._writer_class
+    monkeypatch.setattr(writer_class, "CHUNK_SIZE", chunk_size)
+    block_sizes = []
+    orig_call = writer_class.__call__
+    def call(self, _, data, size):
+        block_sizes.append(size)
+        return orig_call(self, _, data, size)
+    monkeypatch.setattr(writer_class, "__call__", call)
+    
+    if target == "bytesio":
+        buffer = io.BytesIO()
+        pdf.save(buffer)
+        data = buffer.getvalue()
+    else:
+        data = bytearray(b"prefix")
+        pdf.save(data)
+        assert data[:6] == b"prefix"
+        data = bytes(data[6:])
+    
+    assert max(block_sizes) > chunk_size
+    assert any(size <= chunk_size for size in block_sizes)
+    assert data == exp_data
+
+
+def test_save_invalid_target():
+    pdf = pdfium.PdfDocument(TestFiles.multipage)
+    with pytest.raises(ValueError):
+        pdf.save(object())
+    # booleans are ints, but not file descriptors
+    with pytest.raises(ValueError):
+        pdf.save(True)
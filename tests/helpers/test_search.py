@@ -0,0 +1,174 @@
+# SPDX-FileCopyrightText: 2022 geisserml <geisserml@gmail.com>
+# SPDX-License-Identifier: Apache-2.0 OR BSD-3-Clause
+
+import pytest
+from os.path import join
+import pypdfium2 as pdfium
+from ..conftest import TestFiles, OutputDir
+
+
+@pytest.fixture
+def doc():
+    doc = pdfium.PdfDocument(TestFiles.text)
+    yield doc
+
+
+@pytest.mark.parametrize("n_processes", [1, 2])
+def test_text_index(doc, n_processes):
+    
+    index = pdfium.PdfTextIndex.build(doc, n_processes=n_processes)
+    assert index.n_pages == 2
+    
+    hits = index.lookup("labor")
+    assert hits == index.lookup("LABOR")
+    assert len(hits) == 0  # whole words only
+    
+    hits = index.lookup("lorem")
+    assert hits == [(0, 0, 5)]
+    assert len(index.lookup("https")) == 4
+    
+    textpage = doc.get_page(0).get_textpage()
+    for page_index, char_index, count in index.lookup("dolor"):
+        assert textpage.get_text_range(char_index, count) == "dolor"
+    
+    resolved = list( index.resolve(doc, index.lookup("dolore")) )
+    assert len(resolved) == 2
+    (hit, rects) = resolved[0]
+    assert hit[0] == 0
+    assert len(rects) == 1
+    assert textpage.get_text_bounded(*rects[0]).strip() == "dolore"
+
+
+def test_text_index_persistence(doc):
+    
+    index = pdfium.PdfTextIndex.build(doc, case_sensitive=True)
+    assert index.lookup("Lorem") == [(0, 0, 5)]
+    assert index.lookup("lorem") == []
+    
+    path = join(OutputDir, "text_index.json")
+    index.save(path)
+    loaded = pdfium.PdfTextIndex.load(path)
+    
+    assert loaded.terms == index.terms
+    assert loaded.n_pages == index.n_pages
+    assert loaded.case_sensitive is True
+
+
+def test_text_index_resolve_closes(doc):
+    
+    index = pdfium.PdfTextIndex.build(doc, n_processes=1)
+    hits = index.lookup("dolor") + index.lookup("https")
+    assert len( set(hit[0] for hit in hits) ) == 2
+    
+    pages = []
+    def get_page(page_index):
+        page = pdfium.PdfDocument.get_page(doc, page_index)
+        pages.append(page)
+        return page
+    doc.get_page = get_page
+    
+    assert len( list(index.resolve(doc, hits)) ) == len(hits)
+    assert len(pages) == 2 and all(p.raw is None for p in pages)
+    
+    # abandoning the generator closes the current page
+    pages.clear()
+    resolver = index.resolve(doc, hits)
+    next(resolver)
+    assert len(pages) == 1 and pages[0].raw is not None
+    resolver.close()
+    assert pages[0].raw is None
+    
+    other_doc = pdfium.PdfDocument(TestFiles.multipage)
+    with pytest.raises(ValueError):
+        next( index.resolve(other_doc, hits) )
+    path = join(OutputDir, "text_index_check.json")
+    index.save(path)
+    assert pdfium.PdfTextIndex.load(path, pdf=doc).n_pages == 2
+    with pytest.raises(ValueError):
+        pdfium.PdfTextIndex.load(path, pdf=other_doc)
+
+
+def _make_nonbmp_pdf():
+    
+    # Helvetica, with a ToUnicode map that translates "A" to U+1D400 (outside the basic multilingual plane)
+    cmap = (
+        b"/CIDInit /ProcSet findresource begin 12 dict begin begincmap /CMapName /NonBMP def\n"
+        b"1 begincodespacerange <00> <FF> endcodespacerange\n"
+        b"1 beginbfchar <41> <D835DC00> endbfchar\n"
+        b"endcmap CMapName currentdict /CMap defineresource pop end end"
+    )
+    content = b"BT /F1 12 Tf 10 50 Td (foo A bar fooA baz) Tj ET"
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 300 100] /Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /ToUnicode 6 0 R >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content),
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(cmap), cmap),
+    ]
+    data = b"%PDF-1.7\n"
+    offsets = []
+    for i, obj in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += b"%d 0 obj\n%s\nendobj\n" % (i, obj)
+    xref_offset = len(data)
+    data += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects)+1)
+    data += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    data += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects)+1, xref_offset)
+    return pdfium.PdfDocument(data)
+
+
+def test_search_nonbmp():
+    
+    pdf = _make_nonbmp_pdf()
+    textpage = pdf.get_page(0).get_textpage()
+    # PDFium reports the character as surrogate pair, taking two character indices
+    assert textpage.n_chars == len("foo A bar fooA baz") + 2
+    
+    index = pdfium.PdfTextIndex.build(pdf, n_processes=1)
+    assert index.lookup("bar") == [(0, 7, 3)]
+    assert index.lookup("foo\U0001D400") == [(0, 11, 5)]
+    assert index.lookup("baz") == [(0, 17, 3)]
+    for _, char_index, count in index.lookup("bar") + index.lookup("baz"):
+        assert textpage.get_text_range(char_index, count) in ("bar", "baz")
+    
+    matcher = pdfium.TextMatcher(["\U0001D400", "baz"])
+    assert matcher.search(textpage, rects=False) == [("\U0001D400", 4, 2), ("\U0001D400", 14, 2), ("baz", 17, 3)]
+
+
+def _reference_search(textpage, term, match_case, match_whole_word):
+    searcher = textpage.search(term, match_case=match_case, match_whole_word=match_whole_word)
+    hits = []
+    while searcher.get_next() is not None:
+        hits.append( (
+            pdfium.FPDFText_GetSchResultIndex(searcher.raw),
+            pdfium.FPDFText_GetSchCount(searcher.raw),
+        ) )
+    return hits
+
+
+@pytest.mark.parametrize("match_case", [False, True])
+@pytest.mark.parametrize("match_whole_word", [False, True])
+def test_search_many(doc, match_case, match_whole_word):
+    
+    terms = ["labor", "Lorem", "dolor", "dolore", "or", "https"]
+    textpage = doc.get_page(0).get_textpage()
+    results = textpage.search_many(terms, match_case=match_case, match_whole_word=match_whole_word)
+    
+    assert results == sorted(results, key=lambda r: (r[1], terms.index(r[0])))
+    for term in terms:
+        hits = [(index, count) for t, index, count, _ in results if t == term]
+        assert hits == _reference_search(textpage, term, match_case, match_whole_word)
+    
+    for term, index, count, rects in results:
+        assert len(rects) > 0
+        assert textpage.get_text_range(index, count).lower() == term.lower()
+
+
+def test_text_matcher():
+    matcher = pdfium.TextMatcher(["he", "she", "his", "hers"])
+    assert matcher.find("ushers") == [(1, 1, 3), (0, 2, 2), (3, 2, 4)]
+    matcher = pdfium.TextMatcher(["cat"], match_whole_word=True)
+    assert matcher.find("cat category Cat.") == [(0, 0, 3), (0, 13, 3)]
+    with pytest.raises(ValueError):
+        pdfium.TextMatcher(["a", ""])
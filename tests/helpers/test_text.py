@@ -2,6 +2,11 @@
 # SPDX-License-Identifier: Apache-2.0 OR BSD-3-Clause
 
 import re
+import json
+import xml.dom.minidom
+import ctypes
+import timeit
+import numpy
 import pytest
 from os.path import join
 from importlib.util import find_spec
@@ -54,6 +59,77 @@ def test_getcharbox(textpage, loose):
         assert box[0] <= box[2] and box[1] <= box[3]
 
 
+def test_get_chars_array(textpage):
+    
+    chars = textpage.get_chars_array()
+    assert len(chars) == textpage.n_chars
+    
+    text = textpage.get_text_range()
+    assert "".join(chr(c) for c in chars["unicode"]) == text
+    
+    for index in (0, 1, textpage.n_chars-1):
+        assert tuple(chars["box"][index]) == textpage.get_charbox(index)
+        assert tuple(chars["loose_box"][index]) == pytest.approx(textpage.get_charbox(index, loose=True))
+    
+    assert chars["font_size"][0] > 0
+    assert chars["angle"][0] == 0
+    assert chars["origin"][0][0] == pytest.approx(chars["box"][0][0], abs=2)
+
+
+def test_get_layout(textpage):
+    
+    layout = textpage.get_layout()
+    assert isinstance(layout, pdfium.TextLayout)
+    assert textpage.get_layout() is layout
+    
+    assert len(layout.lines) == 10
+    assert len(layout.blocks) == 3
+    assert len(layout.columns) == 1
+    assert layout.get_line_text(0) == "Lorem ipsum dolor sit amet,"
+    assert layout.get_line_text(9) == "officia deserunt mollit anim id est laborum."
+    assert [layout.get_word_text(i) for i in range(2)] == ["Lorem", "ipsum"]
+    
+    word = layout.words[1]
+    assert textpage.get_text_range(int(word["index"]), int(word["count"])) == "ipsum"
+    assert list(layout.lines["block"]) == [0, 1] + [2]*8
+    assert sum(layout.lines["n_words"]) == len(layout.words)
+
+
+def test_build_layout_columns():
+    
+    # two columns with two lines each, given in column order, each line consisting of two letters and a line break
+    positions = [(0, 100), (0, 90), (200, 100), (200, 90)]
+    chars = numpy.zeros(len(positions)*3, dtype=[("unicode", numpy.uint32), ("loose_box", numpy.float64, (4, ))])
+    for i, (x, y) in enumerate(positions):
+        for j, char in enumerate("ab\n"):
+            chars[i*3+j] = (ord(char), (x + j*10, y, x + j*10 + 10, y + 10))
+    
+    layout = pdfium.build_layout(chars)
+    assert len(layout.words) == len(layout.lines) == 4
+    assert len(layout.blocks) == 2
+    assert len(layout.columns) == 2
+    assert list(layout.blocks["column"]) == [0, 1]
+    assert tuple(layout.columns["box"][1]) == (200, 90, 220, 110)
+
+
+def test_spatial_index(textpage):
+    
+    index = textpage.get_spatial_index()
+    assert isinstance(index, pdfium.CharSpatialIndex)
+    assert textpage.get_spatial_index() is index
+    
+    x, y = (60, textpage.page.get_height()-66)
+    assert list(index.at_point(x, y)) == [textpage.get_index(x, y, 0, 0)] == [0]
+    assert list(index.nearest(x, y, k=3)) == [0, 1, 2]
+    
+    # the first line of text
+    hits = index.in_rect(50, 765, 265, 785)
+    spans = index.to_spans(hits)
+    assert [textpage.get_text_range(i, n) for i, n in spans] == ["Lorem", "ipsum", "dolor", "sit", "amet,"]
+    assert list(index.in_rect(50, 765, 265, 785, contained=True)) == list(hits)
+    assert len(index.in_rect(0, 0, 10, 10)) == 0
+
+
 def test_getrectboxes(textpage):
     rects = textpage.get_rectboxes()
     
@@ -77,6 +153,24 @@ def test_getrectboxes(textpage):
     assert textpage.get_text_range(textpage.n_chars-len(text), 0)
 
 
+def test_getrectboxes_array(textpage):
+    
+    boxes = textpage.get_rectboxes_array()
+    assert boxes.shape == (10, 4)
+    assert [tuple(b) for b in boxes.tolist()] == list(textpage.get_rectboxes())
+    assert [tuple(b) for b in textpage.get_rectboxes_array(0, 5).tolist()] == list(textpage.get_rectboxes(0, 5))
+    
+    hits = textpage.search_many(["labor", "dolor"])
+    boxes, offsets = textpage.get_rectboxes_multi([(index, count) for _, index, count, _ in hits])
+    assert len(offsets) == len(hits) + 1
+    assert offsets[-1] == len(boxes)
+    for i, (term, index, count, rects) in enumerate(hits):
+        assert [tuple(b) for b in boxes[offsets[i]:offsets[i+1]].tolist()] == rects
+    
+    boxes, offsets = textpage.get_rectboxes_multi([])
+    assert boxes.shape == (0, 4) and offsets.tolist() == [0]
+
+
 def test_search_text(textpage):
     searcher = textpage.search("labor")
     
@@ -145,6 +239,43 @@ def test_get_links(linkpage):
         assert link == exp_links[i]
 
 
+def test_get_weblinks(linkpage):
+    
+    links = linkpage.get_weblinks()
+    assert linkpage.get_weblinks() == links
+    
+    # the result is cached, but callers get their own list
+    links.pop()
+    assert len(linkpage.get_weblinks()) == len(links) + 1
+    links = linkpage.get_weblinks()
+    assert [l.url for l in links] == list(linkpage.get_links())
+    assert len(links) == 4
+    
+    for link in links:
+        assert isinstance(link, pdfium.WebLink)
+        assert linkpage.get_text_range(link.index, link.count) in link.url
+        assert len(link.rects) > 0
+        assert link.url.startswith( linkpage.get_text_bounded(*link.rects[0]).strip() )
+    
+    linkpage.close()
+
+
+def test_get_weblinks_document(doc):
+    
+    serial = [(i, [l.url for l in links]) for i, links in doc.get_weblinks(n_processes=1)]
+    parallel = [(i, [l.url for l in links]) for i, links in doc.get_weblinks(n_processes=2, chunk_size=1)]
+    assert serial == parallel
+    assert serial[0] == (0, [])
+    assert len(serial[1][1]) == 4
+    
+    results = list( pdfium.PdfDocument.get_weblinks_many([TestFiles.text, TestFiles.empty], n_processes=2) )
+    assert len(results) == 2
+    assert [i for i, _ in results[0]] == [1]
+    assert results[1] == []
+    results = list( pdfium.PdfDocument.get_weblinks_many((p for p in [TestFiles.text, TestFiles.empty]), n_processes=2) )
+    assert len(results) == 2
+
+
 @pytest.mark.skipif(not find_spec("uharfbuzz"), reason="uharfbuzz is not installed")
 def test_insert_text():
     
@@ -194,3 +325,123 @@ def test_insert_text():
     
     with open(join(OutputDir, "text_insertion.pdf"), "wb") as buffer:
         pdf.save(buffer, version=17)
+
+
+@pytest.mark.parametrize("strategy", ["range", "bounded"])
+def test_extract_text(doc, strategy):
+    
+    exp_texts = []
+    for page in doc:
+        textpage = page.get_textpage()
+        if strategy == "range":
+            exp_texts.append( textpage.get_text_range() )
+        else:
+            exp_texts.append( textpage.get_text_bounded() )
+    
+    results = list( doc.extract_text(strategy=strategy, n_processes=2, chunk_size=1) )
+    assert results == list( enumerate(exp_texts) )
+    
+    results = list( doc.extract_text(page_indices=[1, 0], strategy=strategy, n_processes=1) )
+    assert results == [(1, exp_texts[1]), (0, exp_texts[0])]
+    
+    with pytest.raises(ValueError, match=re.escape("Invalid text extraction strategy 'invalid'")):
+        next( doc.extract_text(strategy="invalid") )
+
+
+def _get_text_range_reference(textpage, count=0):
+    # previous implementation of get_text_range(), with an intermediate bytes object
+    if count == 0:
+        count = textpage.n_chars
+    n_bytes = count * 2
+    buffer = ctypes.create_string_buffer(n_bytes+2)
+    buffer_ptr = ctypes.cast(buffer, ctypes.POINTER(ctypes.c_ushort))
+    pdfium.FPDFText_GetText(textpage.raw, 0, count, buffer_ptr)
+    return buffer.raw[:n_bytes].decode("utf-16-le", errors="ignore")
+
+
+def test_gettext_scratch_buffer(monkeypatch):
+    
+    pdf = pdfium.PdfDocument.new()
+    page = pdf.new_page(2000, 2000)
+    line = "The quick brown fox jumps over the lazy dog. " * 4
+    for i in range(190):
+        textobj = pdfium.FPDFPageObj_NewTextObj(pdf.raw, b"Helvetica", 8)
+        enc_text = (line + "\x00").encode("utf-16-le")
+        pdfium.FPDFText_SetText(textobj, ctypes.cast(enc_text, ctypes.POINTER(ctypes.c_ushort)))
+        pdfium.FPDFPageObj_Transform(textobj, 1, 0, 0, 1, 10, 1990 - i*10)
+        pdfium.FPDFPage_InsertObject(page.raw, textobj)
+    page.generate_content()
+    
+    textpage = page.get_textpage()
+    assert textpage.n_chars > 30000
+    
+    # start with a small scratch buffer, so that it has to grow
+    scratch = pdfium._helpers.textpage._utf16_scratch
+    monkeypatch.setattr(scratch, "buffer", (ctypes.c_ushort * 16)())
+    
+    short_text = textpage.get_text_range(count=10)
+    assert short_text == _get_text_range_reference(textpage, count=10)
+    assert len(scratch.buffer) == 16
+    
+    text = textpage.get_text_range()
+    assert text == _get_text_range_reference(textpage)
+    assert len(scratch.buffer) > textpage.n_chars
+    
+    # a larger buffer from a previous call must not leak stale content into shorter results
+    assert textpage.get_text_range(count=10) == short_text
+    bounded_text = textpage.get_text_bounded()
+    assert bounded_text.replace("\r\n", "") == text.replace("\r\n", "")
+    
+    # enforce the fallback of get_text_bounded() for texts exceeding the initial buffer
+    n_chars = textpage.n_chars
+    textpage.n_chars = 1
+    assert textpage.get_text_bounded() == bounded_text
+    textpage.n_chars = n_chars
+    
+    # buffers above the retention limit are dropped after use
+    monkeypatch.setattr(scratch, "max_retained", 1024)
+    assert textpage.get_text_range() == text
+    assert len(scratch.buffer) == scratch.initial_size
+    monkeypatch.undo()
+    
+    # re-using the scratch buffer should be faster than allocating a new one per call on long pages
+    time_new = min( timeit.repeat(textpage.get_text_range, number=50, repeat=7) )
+    time_ref = min( timeit.repeat(lambda: _get_text_range_reference(textpage), number=50, repeat=7) )
+    assert time_new < time_ref
+
+
+@pytest.mark.parametrize("format", pdfium.TextExportFormats)
+def test_export_text(doc, format):
+    
+    results = list( doc.export_text(format=format, chars=True, n_processes=2, chunk_size=1) )
+    assert [index for index, _ in results] == [0, 1]
+    content = pdfium.get_export_header(format) + "".join(f for _, f in results) + pdfium.get_export_footer(format)
+    
+    if format == "json":
+        pages = [json.loads(line) for line in content.splitlines()]
+        assert [p["page"] for p in pages] == [0, 1]
+        word = pages[0]["blocks"][0]["lines"][0]["words"][0]
+        assert word["text"] == "Lorem"
+        assert word["size"] == 16 and "Ubuntu" in word["font"]
+        assert "".join(c["text"] for c in word["chars"]) == "Lorem"
+        index, fragment = next( doc.export_text(page_indices=[0], chars=True) )
+        assert json.loads(fragment) == pages[0]
+    else:
+        dom = xml.dom.minidom.parseString(content)
+        tag = "span" if format == "hocr" else "String"
+        words = dom.getElementsByTagName(tag)
+        assert len(words) > 0
+        if format == "alto":
+            assert words[0].getAttribute("CONTENT") == "Lorem"
+    
+    with pytest.raises(ValueError):
+        next( doc.export_text(format="invalid") )
+
+
+def test_export_hocr_font_names():
+    
+    word = dict(text="x", box=(10, 10, 20, 20), font='Evil"; x_fsize 99', size=12)
+    data = dict(box=(0, 0, 100, 100), blocks=[dict(box=(10, 10, 20, 20), lines=[dict(box=(10, 10, 20, 20), words=[word])])])
+    fragment = pdfium._helpers.textexport._format_hocr(data, 0)
+    span = xml.dom.minidom.parseString(fragment).getElementsByTagName("span")[1]
+    assert span.getAttribute("title") == "bbox 10 80 20 90; x_font Evil x_fsize 99; x_fsize 12"